@@ -0,0 +1,14 @@
+"""Benchmarks of pyhgtmap processing stages, on synthetic DEMs.
+
+DEMs are generated with fractal terrain of configurable size, roughness and void
+fraction, as HGT or GeoTIFF files. Each stage (file loading, tiling, contours
+computation and each output writer) is timed, and results can be stored as
+baselines, later runs reporting regressions against them. Results can also
+calibrate the estimates of pyhgtmap --plan.
+
+Usage:
+    pyhgtmap-benchmark run [--size N] [--roughness R] ... [-- <pyhgtmap options>]
+    pyhgtmap-benchmark run --save-baseline ...
+    pyhgtmap-benchmark run --input <file> --calibration <file> ...
+    pyhgtmap-benchmark generate [--size N] ... <directory>
+"""
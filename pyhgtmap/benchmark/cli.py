@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+
+from pyhgtmap.benchmark.dem import DemSpec, generate_dem
+from pyhgtmap.benchmark.suite import (
+    compare,
+    load_baselines,
+    make_calibration,
+    report,
+    run_benchmark,
+    save_baseline,
+)
+from pyhgtmap.cli import parse_command_line
+from pyhgtmap.logger import configure_logging
+from pyhgtmap.output.factory import OUTPUT_FORMATS
+from pyhgtmap.planner import save_calibration
+
+DEFAULT_BASELINES_FILENAME = "benchmark_baselines.json"
+
+
+def add_dem_options(parser: argparse.ArgumentParser) -> None:
+    defaults = DemSpec()
+    parser.add_argument(
+        "--size",
+        help="number of points per row and column (1201 for SRTM3, 3601 for SRTM1)",
+        type=int,
+        default=defaults.size,
+    )
+    parser.add_argument(
+        "--roughness",
+        help="terrain roughness, from 0 (smooth hills) to 1 (very rugged)",
+        type=float,
+        default=defaults.roughness,
+    )
+    parser.add_argument(
+        "--void-fraction",
+        help="share of void points, gathered in clusters",
+        type=float,
+        default=defaults.void_fraction,
+    )
+    parser.add_argument(
+        "--epsg",
+        help="generate a GeoTIFF file in this projection (4326 or 3857), instead"
+        " of an HGT file; requires GDAL",
+        type=int,
+        default=defaults.epsg,
+    )
+    parser.add_argument(
+        "--seed",
+        help="seed of the random terrain generation",
+        type=int,
+        default=defaults.seed,
+    )
+
+
+def make_dem_spec(args: argparse.Namespace) -> DemSpec:
+    return DemSpec(
+        size=args.size,
+        roughness=args.roughness,
+        void_fraction=args.void_fraction,
+        epsg=args.epsg,
+        seed=args.seed,
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pyhgtmap-benchmark",
+        description="Time pyhgtmap processing stages on synthetic DEMs, and compare"
+        " them with stored baselines.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser(
+        "generate", help="generate a synthetic DEM file in DIRECTORY"
+    )
+    generate_parser.add_argument("directory", metavar="DIRECTORY")
+    add_dem_options(generate_parser)
+
+    run_parser = subparsers.add_parser(
+        "run", help="time processing stages on a synthetic DEM"
+    )
+    add_dem_options(run_parser)
+    run_parser.add_argument(
+        "--input",
+        help="benchmark this DEM file instead of a synthetic one (DEM options are"
+        " ignored)",
+    )
+    run_parser.add_argument(
+        "--formats",
+        help="comma separated list of output formats to time, among"
+        f" {', '.join(OUTPUT_FORMATS)}",
+        default=",".join(OUTPUT_FORMATS),
+    )
+    run_parser.add_argument(
+        "--repeat",
+        help="number of runs, keeping the best duration of each stage",
+        type=int,
+        default=3,
+    )
+    run_parser.add_argument(
+        "--name",
+        help="name of the benchmark in baselines; defaults to a description of the"
+        " DEM and pyhgtmap options",
+    )
+    run_parser.add_argument(
+        "--baselines",
+        help="file storing baselines of benchmarks",
+        default=DEFAULT_BASELINES_FILENAME,
+    )
+    run_parser.add_argument(
+        "--save-baseline",
+        help="store results as the new baseline of the benchmark",
+        action="store_true",
+    )
+    run_parser.add_argument(
+        "--tolerance",
+        help="relative slowdown of a stage above which it is reported as a"
+        " regression (exit code 1)",
+        type=float,
+        default=0.2,
+    )
+    run_parser.add_argument(
+        "--calibration",
+        help="write coefficients derived from the results to this file, to be used"
+        " by pyhgtmap --plan (see --plan-calibration)",
+    )
+    run_parser.add_argument(
+        "pyhgtmap_args",
+        nargs=argparse.REMAINDER,
+        help="pyhgtmap options, after '--'",
+    )
+    return parser
+
+
+def main_internal(sys_args: list[str]) -> None:
+    args = build_parser().parse_args(sys_args)
+    spec = make_dem_spec(args)
+    if args.command == "generate":
+        print(generate_dem(args.directory, spec))
+        return
+
+    pyhgtmap_args = args.pyhgtmap_args
+    if pyhgtmap_args[:1] == ["--"]:
+        pyhgtmap_args = pyhgtmap_args[1:]
+    output_formats = args.formats.split(",")
+    for output_format in output_formats:
+        if output_format not in OUTPUT_FORMATS:
+            sys.exit(f"Unknown output format: {output_format}")
+    dem_name = os.path.basename(args.input) if args.input else spec.name
+    name = args.name or " ".join([dem_name, *pyhgtmap_args])
+    with tempfile.TemporaryDirectory() as dem_dir:
+        filename = args.input or generate_dem(dem_dir, spec)
+        opts, _ = parse_command_line([*pyhgtmap_args, filename])
+        configure_logging(opts.logLevel)
+        result = run_benchmark(filename, opts, output_formats, args.repeat)
+    results = result.stages
+
+    baseline = load_baselines(args.baselines).get(name)
+    print(f"Benchmark: {name}")
+    print(report(results, baseline))
+    if args.calibration:
+        save_calibration(args.calibration, make_calibration(result))
+        print(f"Calibration saved in {args.calibration}")
+    if args.save_baseline:
+        save_baseline(args.baselines, name, results)
+        print(f"Baseline saved in {args.baselines}")
+    elif baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(
+                f"Regression: {regression.stage} took {regression.seconds:.3f} s,"
+                f" {regression.ratio - 1:.1%} slower than baseline"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+def main() -> None:
+    """Parameter-less entry point, required for python packaging scripts"""
+    main_internal(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    main()
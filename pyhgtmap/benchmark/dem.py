@@ -0,0 +1,168 @@
+"""Synthetic DEM generation, with fractal terrain."""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import NamedTuple
+
+import numpy
+
+from pyhgtmap.hgt.file import GEOTIFF_ERROR
+from pyhgtmap.NASASRTMUtil import makeFileNamePrefix
+
+# Elevation of void points, as in SRTM files
+VOID_VALUE = -0x8000
+
+# Radius of the sphere used by the pseudo-Mercator projection (EPSG:3857)
+EARTH_RADIUS = 6378137.0
+
+
+class DemSpec(NamedTuple):
+    """Description of a synthetic DEM, covering one square degree."""
+
+    # Number of points per row and column (1201 for SRTM3, 3601 for SRTM1)
+    size: int = 1201
+    # From 0 (smooth hills) to 1 (very rugged terrain)
+    roughness: float = 0.5
+    # Share of void points, gathered in clusters
+    void_fraction: float = 0.0
+    # Projection of GeoTIFF files; None to generate an HGT file (always EPSG:4326)
+    epsg: int | None = None
+    seed: int = 0
+    # South-west corner of the covered square degree
+    lon: int = 6
+    lat: int = 45
+    # Elevation range, in meters
+    min_elevation: int = 0
+    max_elevation: int = 3000
+
+    @property
+    def name(self) -> str:
+        """Short description, used to identify benchmarks on this DEM."""
+        file_format = f"tiff{self.epsg}" if self.epsg else "hgt"
+        return (
+            f"{file_format}-{self.size}-r{self.roughness:.2f}"
+            f"-v{self.void_fraction:.2f}-s{self.seed}"
+        )
+
+
+def fractal_surface(
+    size: int, roughness: float, rng: numpy.random.Generator
+) -> numpy.ndarray:
+    """Generate a fractional Brownian surface by spectral synthesis.
+
+    Amplitudes of spatial frequencies f decrease as f^-(H+1), H = 1 - <roughness>
+    being the Hurst exponent of the surface.
+
+    Returns:
+        numpy.ndarray: <size> x <size> values, scaled to [0, 1]
+    """
+    if not 0 <= roughness <= 1:
+        raise ValueError(f"Roughness must be between 0 and 1, not {roughness}")
+    frequencies = numpy.hypot(
+        numpy.fft.fftfreq(size)[:, numpy.newaxis],
+        numpy.fft.rfftfreq(size)[numpy.newaxis, :],
+    )
+    # No constant component
+    frequencies[0, 0] = numpy.inf
+    amplitudes = frequencies ** -(2 - roughness)
+    phases = rng.uniform(0, 2 * math.pi, amplitudes.shape)
+    surface = numpy.fft.irfft2(amplitudes * numpy.exp(1j * phases), s=(size, size))
+    surface -= surface.min()
+    return surface / surface.max()
+
+
+def make_dem(spec: DemSpec) -> numpy.ndarray:
+    """Generate elevations of a synthetic DEM, void points being set to VOID_VALUE.
+
+    Returns:
+        numpy.ndarray: int16 elevations, north-up
+    """
+    if not 0 <= spec.void_fraction < 1:
+        raise ValueError(
+            f"Void fraction must be between 0 and 1, not {spec.void_fraction}"
+        )
+    rng = numpy.random.default_rng(spec.seed)
+    surface = fractal_surface(spec.size, spec.roughness, rng)
+    elevations = (
+        spec.min_elevation + surface * (spec.max_elevation - spec.min_elevation)
+    ).astype(numpy.int16)
+    if spec.void_fraction:
+        # Voids are clusters (eg. radar shadows), rather than isolated points
+        voids_field = fractal_surface(spec.size, 0.2, rng)
+        elevations[
+            voids_field > numpy.quantile(voids_field, 1 - spec.void_fraction)
+        ] = VOID_VALUE
+    return elevations
+
+
+def write_hgt(filename: str, elevations: numpy.ndarray) -> None:
+    """Write elevations as an HGT file (big-endian int16)."""
+    elevations.astype(">i2").tofile(filename)
+
+
+def write_geotiff(
+    filename: str, elevations: numpy.ndarray, lon: int, lat: int, epsg: int
+) -> None:
+    """Write elevations as a GeoTIFF file covering the square degree at (<lon>,
+    <lat>), in EPSG:4326 or EPSG:3857 projection.
+    """
+    try:
+        from osgeo import gdal, osr
+
+        gdal.UseExceptions()
+    except ModuleNotFoundError:
+        raise ImportError(GEOTIFF_ERROR) from None
+    if epsg == 4326:
+        min_x, min_y, max_x, max_y = float(lon), float(lat), lon + 1.0, lat + 1.0
+    elif epsg == 3857:
+        min_x, max_x = (EARTH_RADIUS * math.radians(value) for value in (lon, lon + 1))
+        min_y, max_y = (
+            EARTH_RADIUS * math.log(math.tan(math.pi / 4 + math.radians(value) / 2))
+            for value in (lat, lat + 1)
+        )
+    else:
+        raise ValueError(f"Unsupported projection EPSG:{epsg}")
+    nb_rows, nb_cols = elevations.shape
+    x_increment = (max_x - min_x) / (nb_cols - 1)
+    y_increment = (max_y - min_y) / (nb_rows - 1)
+    dataset = gdal.GetDriverByName("GTiff").Create(
+        filename, nb_cols, nb_rows, 1, gdal.GDT_Int16
+    )
+    # Geo transform gives the corner of the first pixel, whose center is on the
+    # bounding box
+    dataset.SetGeoTransform(
+        (
+            min_x - x_increment / 2,
+            x_increment,
+            0,
+            max_y + y_increment / 2,
+            0,
+            -y_increment,
+        )
+    )
+    projection = osr.SpatialReference()
+    projection.ImportFromEPSG(epsg)
+    dataset.SetProjection(projection.ExportToWkt())
+    band = dataset.GetRasterBand(1)
+    band.SetNoDataValue(VOID_VALUE)
+    band.WriteArray(elevations)
+    dataset.FlushCache()
+
+
+def generate_dem(directory: str, spec: DemSpec) -> str:
+    """Generate a synthetic DEM file in <directory>.
+
+    Returns:
+        str: name of the generated file
+    """
+    elevations = make_dem(spec)
+    prefix = makeFileNamePrefix(spec.lon, spec.lat)
+    if spec.epsg is None:
+        filename = os.path.join(directory, f"{prefix}.hgt")
+        write_hgt(filename, elevations)
+    else:
+        filename = os.path.join(directory, f"{prefix}_{spec.epsg}.tif")
+        write_geotiff(filename, elevations, spec.lon, spec.lat, spec.epsg)
+    return filename
@@ -0,0 +1,298 @@
+"""Timing of processing stages on a DEM, and comparison with stored baselines."""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+import platform
+import tempfile
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import numpy
+
+import pyhgtmap
+from pyhgtmap.hgt.file import HgtFile, calc_hgt_area
+from pyhgtmap.output.factory import OUTPUT_FORMATS, get_osm_output, make_osm_filename
+from pyhgtmap.planner import DEFAULT_CALIBRATION, Calibration
+
+if TYPE_CHECKING:
+    from pyhgtmap.configuration import Configuration
+    from pyhgtmap.hgt.tile import HgtTile, TileContours
+
+# Options selecting each output format
+FORMAT_OPTIONS: dict[str, dict[str, Any]] = {
+    "osm": {"gzip": 0, "pbf": False, "o5m": False},
+    "gzip": {"gzip": 6, "pbf": False, "o5m": False},
+    "pbf": {"gzip": 0, "pbf": True, "o5m": False},
+    "o5m": {"gzip": 0, "pbf": False, "o5m": True},
+}
+
+LOAD = "load"
+MAKE_TILES = "make_tiles"
+CONTOURS = "contours"
+
+
+def write_stage_name(output_format: str) -> str:
+    return f"write {output_format}"
+
+
+class StageResult(NamedTuple):
+    """Best duration of a stage, along with the amount of data it processed."""
+
+    stage: str
+    seconds: float
+    nb_nodes: int
+    # Input DEM bytes, or output bytes for writers
+    nb_bytes: int
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nb_nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.nb_bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+
+class DemStats(NamedTuple):
+    """Figures of the processed DEM, used for calibration."""
+
+    # Number of points of all tiles
+    nb_points: int
+    # Number of nodes estimated when building tiles, and actually generated
+    estimated_nb_nodes: float
+    nb_nodes: int
+    nb_ways: int
+
+
+class BenchmarkResult(NamedTuple):
+    stages: list[StageResult]
+    stats: DemStats
+
+
+class Regression(NamedTuple):
+    stage: str
+    seconds: float
+    baseline_seconds: float
+
+    @property
+    def ratio(self) -> float:
+        return self.seconds / self.baseline_seconds
+
+
+def run_once(
+    filename: str,
+    opts: Configuration,
+    output_formats: list[str],
+    output_dir: str,
+) -> BenchmarkResult:
+    """Run all stages once on given DEM file, writing outputs to <output_dir>."""
+    results: list[StageResult] = []
+    start = time.perf_counter()
+    hgt_file = HgtFile(
+        filename,
+        opts.srtmCorrx,
+        opts.srtmCorry,
+        opts.polygon,
+        False,
+        opts.voidMax,
+        opts.contourFeet,
+        opts.smooth_ratio,
+        opts.smooth_block_size,
+        opts.nJobs,
+    )
+    input_bytes = hgt_file.zData.size * 2
+    results.append(StageResult(LOAD, time.perf_counter() - start, 0, input_bytes))
+
+    start = time.perf_counter()
+    tiles: list[HgtTile] = hgt_file.make_tiles(opts)
+    results.append(StageResult(MAKE_TILES, time.perf_counter() - start, 0, input_bytes))
+
+    start = time.perf_counter()
+    tiles_contours: list[tuple[HgtTile, TileContours]] = [
+        (
+            tile,
+            tile.get_contours(
+                step_cont=int(opts.contourStepSize),
+                max_nodes_per_way=opts.maxNodesPerWay,
+                no_zero=opts.noZero,
+                rdp_epsilon=opts.rdpEpsilon,
+            ),
+        )
+        for tile in tiles
+    ]
+    nb_nodes = sum(contours.nb_nodes for _, contours in tiles_contours)
+    results.append(
+        StageResult(CONTOURS, time.perf_counter() - start, nb_nodes, input_bytes)
+    )
+    stats = DemStats(
+        sum(tile.zData.size for tile in tiles),
+        sum(tile.estimated_nb_nodes for tile in tiles),
+        nb_nodes,
+        sum(contours.nb_ways for _, contours in tiles_contours),
+    )
+
+    for output_format in output_formats:
+        format_opts = copy.copy(opts)
+        for option, value in FORMAT_OPTIONS[output_format].items():
+            setattr(format_opts, option, value)
+        format_opts.outputPrefix = os.path.join(output_dir, output_format)
+        output_files: list[str] = []
+        start = time.perf_counter()
+        node_id, way_id = opts.startId, opts.startWayId
+        for tile, contours in tiles_contours:
+            if not contours.nb_nodes:
+                continue
+            bounding_box = tile.bbox()
+            osm_output = get_osm_output(format_opts, [filename], bounding_box)
+            node_id, ways = osm_output.write_nodes(
+                contours, osm_output.timestampString, node_id, opts.osmVersion
+            )
+            osm_output.write_ways(ways, way_id)
+            way_id += len(ways)
+            osm_output.done()
+            output_files.append(
+                make_osm_filename(bounding_box, format_opts, [filename])
+            )
+        seconds = time.perf_counter() - start
+        output_bytes = sum(os.path.getsize(name) for name in output_files)
+        for name in output_files:
+            os.remove(name)
+        results.append(
+            StageResult(
+                write_stage_name(output_format), seconds, nb_nodes, output_bytes
+            )
+        )
+    return BenchmarkResult(results, stats)
+
+
+def run_benchmark(
+    filename: str,
+    opts: Configuration,
+    output_formats: list[str],
+    repeat: int = 3,
+) -> BenchmarkResult:
+    """Time all stages on given DEM file, keeping the best of <repeat> runs."""
+    opts = copy.copy(opts)
+    opts.area = ":".join(
+        str(value)
+        for value in calc_hgt_area([(filename, False)], opts.srtmCorrx, opts.srtmCorry)
+    )
+    best: dict[str, StageResult] = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for _ in range(repeat):
+            run_result = run_once(filename, opts, output_formats, output_dir)
+            for result in run_result.stages:
+                if (
+                    result.stage not in best
+                    or result.seconds < best[result.stage].seconds
+                ):
+                    best[result.stage] = result
+    return BenchmarkResult(list(best.values()), run_result.stats)
+
+
+def make_calibration(
+    result: BenchmarkResult, defaults: Calibration = DEFAULT_CALIBRATION
+) -> Calibration:
+    """Derive the coefficients of the job planner from a benchmark result.
+
+    The contours computation cost is split between points and nodes as in
+    <defaults>, only its scale being measured; writing coefficients of formats not
+    benchmarked are kept from <defaults>.
+    """
+    stats = result.stats
+    if not stats.nb_nodes:
+        raise ValueError("Can't calibrate from a DEM without any contour")
+    stages = {stage.stage: stage for stage in result.stages}
+    default_seconds = float(
+        numpy.dot(
+            defaults.tile_cost_coefficients,
+            (stats.nb_points, stats.estimated_nb_nodes),
+        )
+    )
+    scale = stages[CONTOURS].seconds / default_seconds
+    write_seconds_per_node = dict(defaults.write_seconds_per_node)
+    bytes_per_node = dict(defaults.bytes_per_node)
+    for output_format in OUTPUT_FORMATS:
+        stage = stages.get(write_stage_name(output_format))
+        if stage is not None:
+            write_seconds_per_node[output_format] = stage.seconds / stats.nb_nodes
+            bytes_per_node[output_format] = stage.nb_bytes / stats.nb_nodes
+    return Calibration(
+        stats.nb_nodes / stats.estimated_nb_nodes,
+        stats.nb_ways / stats.nb_nodes,
+        (
+            defaults.tile_cost_coefficients[0] * scale,
+            defaults.tile_cost_coefficients[1] * scale,
+        ),
+        write_seconds_per_node,
+        bytes_per_node,
+    )
+
+
+def environment() -> dict[str, str]:
+    """Description of the environment, stored along with baselines."""
+    return {
+        "pyhgtmap": pyhgtmap.__version__,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "system": platform.system(),
+    }
+
+
+def load_baselines(filename: str) -> dict[str, Any]:
+    """Load baselines, per benchmark name; missing file means no baseline."""
+    if not os.path.exists(filename):
+        return {}
+    with open(filename) as baselines_file:
+        return json.load(baselines_file)
+
+
+def save_baseline(filename: str, name: str, results: list[StageResult]) -> None:
+    """Store (or replace) the baseline of benchmark <name> in <filename>."""
+    baselines = load_baselines(filename)
+    baselines[name] = {
+        "environment": environment(),
+        "stages": {result.stage: result.seconds for result in results},
+    }
+    with open(filename, "w") as baselines_file:
+        json.dump(baselines, baselines_file, indent=2, sort_keys=True)
+
+
+def compare(
+    results: list[StageResult], baseline: dict[str, Any], tolerance: float
+) -> list[Regression]:
+    """Return stages slower than their baseline by more than <tolerance> (ratio)."""
+    baseline_stages: dict[str, float] = baseline.get("stages", {})
+    return [
+        Regression(result.stage, result.seconds, baseline_stages[result.stage])
+        for result in results
+        if baseline_stages.get(result.stage)
+        and result.seconds > baseline_stages[result.stage] * (1 + tolerance)
+    ]
+
+
+def report(results: list[StageResult], baseline: dict[str, Any] | None = None) -> str:
+    """Return a table of stages results, compared with the baseline if any."""
+    baseline_stages: dict[str, float] = (baseline or {}).get("stages", {})
+    lines = [
+        f"{'Stage':<12} {'Time (s)':>10} {'Nodes/s':>12} {'MB/s':>9}"
+        f" {'Baseline (s)':>13} {'Change':>8}"
+    ]
+    for result in results:
+        line = (
+            f"{result.stage:<12} {result.seconds:>10.3f}"
+            f" {result.nodes_per_second:>12.0f} {result.mb_per_second:>9.2f}"
+        )
+        baseline_seconds = baseline_stages.get(result.stage)
+        if baseline_seconds:
+            line += (
+                f" {baseline_seconds:>13.3f}"
+                f" {result.seconds / baseline_seconds - 1:>+8.1%}"
+            )
+        lines.append(line)
+    return "\n".join(lines)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import multiprocessing
 import os
 import sys
 from typing import cast
@@ -7,7 +8,12 @@ from typing import cast
 from configargparse import ArgumentParser
 
 from pyhgtmap import NASASRTMUtil, __version__
-from pyhgtmap.configuration import CONFIG_FILENAME, Configuration, NestedConfig
+from pyhgtmap.configuration import (
+    CONFIG_FILENAME,
+    DEFAULT_START_METHOD,
+    Configuration,
+    NestedConfig,
+)
 from pyhgtmap.hgt.file import parse_polygons_file
 from pyhgtmap.sources import Source
 from pyhgtmap.sources.pool import Pool
@@ -147,6 +153,121 @@ def build_common_parser() -> ArgumentParser:
         type=int,
         default=1,
     )
+    parser.add_argument(
+        "--start-method",
+        help="multiprocessing start method of worker processes (see --jobs)."
+        "\nDefaults to forkserver when available, spawn otherwise.",
+        dest="start_method",
+        choices=multiprocessing.get_all_start_methods(),
+        default=DEFAULT_START_METHOD,
+    )
+    parser.add_argument(
+        "--schedule-window",
+        help="Number of tiles collected (across input files) before being dispatched"
+        "\nto worker processes, largest (estimated) first, to balance load between"
+        "\nworkers. Defaults to twice the number of jobs.",
+        dest="schedule_window",
+        action="store",
+        type=int,
+        default=0,
+        metavar="NB_TILES",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        help="Maximum estimated memory used by worker processes computing contours,"
+        "\nin MiB. Tiles are started only while the sum of their estimated peak"
+        "\nmemory (corrected with measured one) fits in the budget, at least one"
+        "\ntile being always processed. 0 (default) means no limit.",
+        dest="memory_budget",
+        action="store",
+        type=int,
+        default=0,
+        metavar="MIB",
+    )
+    parser.add_argument(
+        "--resume",
+        help="resume an interrupted run, itself started with --resume or"
+        "\n--incremental. With these options, processed tiles are recorded in a"
+        "\nmanifest (pyhgtmap_manifest.jsonl, prefixed like output files); tiles"
+        "\ncompleted by the previous run with the same options are skipped, while"
+        "\nfailed or missing ones are processed again, with the same IDs. Not"
+        "\nsupported in single output mode.",
+        dest="resume",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--incremental",
+        help="only regenerate tiles whose input file (or options) changed since the"
+        "\nprevious run, according to the manifest (see --resume). Unchanged input"
+        "\nfiles aren't even loaded. IDs of regenerated tiles are allocated after"
+        "\nthe ones of reused tiles, and outputs of previous run which are not valid"
+        "\nanymore are removed. Not supported in single output mode.",
+        dest="incremental",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--timings-file",
+        help="measure the time spent in each processing stage (file loading,"
+        "\nmasking, tiling, contours tracing, simplification, splitting, nodes and"
+        "\nways writing, finalization), and write one JSON record per file and per"
+        "\ntile to FILENAME, across all worker processes. A summary table is printed"
+        "\nto stderr at the end.",
+        dest="timings_file",
+        metavar="FILENAME",
+        action="store",
+        default=None,
+    )
+    parser.add_argument(
+        "--trace-file",
+        help="record a timeline of files, tiles and processing stages in all"
+        "\nprocesses (including waits for workers, memory and file loading), and"
+        "\nwrite it to FILENAME in Chrome trace event JSON format, viewable in"
+        "\nhttps://ui.perfetto.dev or chrome://tracing.",
+        dest="trace_file",
+        metavar="FILENAME",
+        action="store",
+        default=None,
+    )
+    parser.add_argument(
+        "--profile",
+        help="profile tiles processing (in all processes) with cProfile, and write"
+        "\nmerged statistics to FILENAME in pstats format (see python -m pstats)."
+        "\nThe top functions by cumulative time are printed to stderr at the end.",
+        dest="profile_file",
+        metavar="FILENAME",
+        action="store",
+        default=None,
+    )
+    parser.add_argument(
+        "--profile-memory",
+        help="when profiling, also trace memory allocations with tracemalloc"
+        "\n(slow), and write the largest allocation sites and the peak traced"
+        "\nmemory per tile to <FILENAME without extension>_allocations.txt.",
+        dest="profile_memory",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--plan",
+        help="dry run: load and tile input files (downloading them if needed), and"
+        "\nreport estimated tiles, nodes, ways, output size per format, peak memory"
+        "\nper worker and runtime, per file and in total, without generating any"
+        "\ncontour.",
+        dest="plan",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--plan-calibration",
+        help="coefficients used by --plan, as written by pyhgtmap-benchmark"
+        "\n--calibration (defaults to coefficients measured on a reference setup).",
+        dest="plan_calibration",
+        metavar="FILENAME",
+        action="store",
+        default=None,
+    )
     parser.add_argument(
         "--osm-version",
         help="pass a number as OSM-VERSION to"
@@ -254,6 +375,37 @@ def build_common_parser() -> ArgumentParser:
         default=1.0,
         metavar="SMOOTH_RATIO",
     )
+    parser.add_argument(
+        "--smooth-block-size",
+        help="Maximum number of output points super sampled at once when smoothing."
+        "\nInput files are processed by blocks of rows, in parallel (see --jobs), to"
+        "\nbound memory usage. Defaults to 4194304.",
+        dest="smooth_block_size",
+        action="store",
+        type=int,
+        default=4 * 1024 * 1024,
+        metavar="NB_POINTS",
+    )
+    parser.add_argument(
+        "--prefetch-files",
+        help="Number of next input files loaded (and tiled) in background while tiles"
+        "\nof the current one are processed. 0 disables prefetching. Defaults to 1.",
+        dest="prefetch_files",
+        action="store",
+        type=int,
+        default=1,
+        metavar="NB_FILES",
+    )
+    parser.add_argument(
+        "--prefetch-memory",
+        help="Maximum estimated memory used by prefetched input files, in MiB."
+        "\nDefaults to 2048.",
+        dest="prefetch_memory",
+        action="store",
+        type=int,
+        default=2048,
+        metavar="MIB",
+    )
 
     group = parser.add_mutually_exclusive_group()
     group.add_argument(
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import multiprocessing
 from argparse import Namespace
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
@@ -10,6 +11,11 @@ if TYPE_CHECKING:
 CONFIG_DIR = str(Path.home() / ".pyhgtmap")
 CONFIG_FILENAME = str(Path(CONFIG_DIR, "config.yaml"))
 
+# Start method of worker processes; "fork" is unsafe with threads
+DEFAULT_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
 
 class NestedConfig(Namespace):
     """
@@ -62,6 +68,20 @@ class Configuration(NestedConfig):
     rdpEpsilon: float | None = 0.0
     disableRdp: bool | None
     smooth_ratio: float = 1.0
+    smooth_block_size: int = 4 * 1024 * 1024
+    prefetch_files: int = 1
+    prefetch_memory: int = 2048
+    start_method: str = DEFAULT_START_METHOD
+    schedule_window: int = 0
+    memory_budget: int = 0
+    resume: bool = False
+    incremental: bool = False
+    timings_file: str | None = None
+    trace_file: str | None = None
+    profile_file: str | None = None
+    profile_memory: bool = False
+    plan: bool = False
+    plan_calibration: str | None = None
     gzip: int = 0
     pbf: bool = False
     o5m: bool = False
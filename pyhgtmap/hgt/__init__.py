@@ -1,15 +1,12 @@
 from __future__ import annotations
 
-from collections.abc import Iterable
-from typing import Callable
+import numpy
 
 from pyhgtmap import BBox
+from pyhgtmap.hgt.transform import CoordinatesTransform
 
-# Coordinates transformation function prototype
-TransformFunType = Callable[
-    [Iterable[tuple[float, float]]],
-    Iterable[tuple[float, float]],
-]
+# Coordinates transformation prototype
+TransformFunType = CoordinatesTransform
 
 
 def makeBBoxString(bbox: BBox) -> str:
@@ -26,11 +23,11 @@ def transformLonLats(
     if transform is None:
         return BBox(minLon, minLat, maxLon, maxLat)
     else:
-        (lon1, lat1), (lon2, lat2), (lon3, lat3), (lon4, lat4) = transform(
-            [(minLon, minLat), (maxLon, maxLat), (minLon, maxLat), (maxLon, maxLat)],
+        points = transform.transform_array(
+            numpy.array(
+                [(minLon, minLat), (maxLon, maxLat), (minLon, maxLat), (maxLon, minLat)]
+            )
         )
-        minLon = min([lon1, lon2, lon3, lon4])
-        maxLon = max([lon1, lon2, lon3, lon4])
-        minLat = min([lat1, lat2, lat3, lat4])
-        maxLat = max([lat1, lat2, lat3, lat4])
+        minLon, minLat = (float(v) for v in points.min(axis=0))
+        maxLon, maxLat = (float(v) for v in points.max(axis=0))
         return BBox(minLon, minLat, maxLon, maxLat)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import time
 from typing import TYPE_CHECKING, cast
 
 import contourpy
@@ -7,6 +8,8 @@ import numpy
 import numpy.typing
 from pybind11_rdp import rdp
 
+from pyhgtmap import timing
+
 if TYPE_CHECKING:
     from pyhgtmap.hgt import TransformFunType
 
@@ -122,6 +125,7 @@ class ContoursGenerator:
         along with the number of nodes and paths as expected in the OSM
         XML output.  Also, consecutive identical nodes are removed.
         """
+        start_time = time.perf_counter()
         # Keep only the first element of the tuple, ignoring matplot line code
         rawPaths: list[numpy.ndarray] = cast(
             list[numpy.ndarray],
@@ -129,14 +133,26 @@ class ContoursGenerator:
         )
         numOfPaths, numOfNodes = 0, 0
         resultPaths = []
+        # Stages are interleaved per path: accumulate their durations locally
+        tracing_time = time.perf_counter() - start_time
+        simplification_time = split_time = 0.0
         for path in rawPaths:
+            start_time = time.perf_counter()
             if self.transform:
-                path = numpy.array(self.transform(path))
+                path = self.transform(path)
+            transformed_time = time.perf_counter()
             path = simplify_path(path, self.rdp_epsilon)
+            simplified_time = time.perf_counter()
             splitPaths, numOfNodesAdd, numOfPathsAdd = self.splitList(path)
+            tracing_time += transformed_time - start_time
+            simplification_time += simplified_time - transformed_time
+            split_time += time.perf_counter() - simplified_time
             resultPaths.extend(splitPaths)
             numOfPaths += numOfPathsAdd
             numOfNodes += numOfNodesAdd
+        timing.add_stage(timing.CONTOUR_TRACING, tracing_time)
+        timing.add_stage(timing.SIMPLIFICATION, simplification_time)
+        timing.add_stage(timing.SPLIT, split_time)
         return resultPaths, numOfNodes, numOfPaths
 
 
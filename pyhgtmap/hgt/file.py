@@ -1,19 +1,23 @@
 from __future__ import annotations
 
+import json
 import logging
+import math
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING, Any, NamedTuple
 
 import numpy
 import numpy.typing
 import shapely
-from matplotlib.path import Path as PolygonPath
 from scipy import ndimage
 
-from pyhgtmap import BBox
+from pyhgtmap import BBox, timing
 from pyhgtmap.hgt import TransformFunType, transformLonLats
+from pyhgtmap.hgt.transform import AffineTransform, ProjTransform
 
 from .tile import HgtTile
 
@@ -30,6 +34,9 @@ meters2Feet = 1.0 / 0.3048
 
 logger = logging.getLogger(__name__)
 
+# Name of the sidecar file caching GeoTIFF metadata in input directories
+GEOTIFF_INDEX_FILENAME = ".pyhgtmap_index.json"
+
 GEOTIFF_ERROR = "GeoTiff optional support not enabled; please install with 'pip install pyhgtmap[geotiff]'"
 
 
@@ -133,8 +140,11 @@ def get_transform(
     file_proj: osr.SpatialReference, reverse=False
 ) -> TransformFunType | None:
     """
-    Returns a function to transform coordinate system of a list of points,
-    from original projection to EPSG:4326 (or the otherway around).
+    Returns a transformation of points coordinates, from original projection to
+    EPSG:4326 (or the otherway around).
+    None is returned when no transformation is needed, and an affine transformation
+    for geographic coordinates systems only differing from EPSG:4326 by their
+    angular unit or prime meridian.
     """
     try:
         from osgeo import osr
@@ -148,32 +158,36 @@ def get_transform(
     nAuth = n.GetAttrValue("AUTHORITY", 1)
     if nAuth == oAuth:
         return None
-    else:
-        if reverse:
-            t = osr.CoordinateTransformation(n, file_proj)
-        else:
-            t = osr.CoordinateTransformation(file_proj, n)
-
-        def transform(
-            points: Iterable[tuple[float, float]],
-        ) -> Iterable[tuple[float, float]]:
-            return [
-                p[:2]
-                for p in t.TransformPoints(points)
-                if not any(el == float("inf") for el in p[:2])
-            ]
-
-        return transform
-
-
-def parse_geotiff_bbox(
-    filename: str,
-    corrx: float,
-    corry: float,
-    doTransform: bool,
-) -> BBox:
+    if file_proj.IsGeographic() and file_proj.GetAttrValue("DATUM") == n.GetAttrValue(
+        "DATUM"
+    ):
+        # Same datum: only angular unit and prime meridian may differ. WKT1 gives
+        # the prime meridian longitude in degrees, whatever the angular unit.
+        scale = file_proj.GetAngularUnits() / n.GetAngularUnits()
+        offset = float(file_proj.GetAttrValue("PRIMEM", 1) or 0)
+        if scale == 1 and offset == 0:
+            return None
+        affine = AffineTransform(scale, offset, scale, 0)
+        return affine.inverse() if reverse else affine
+    if reverse:
+        return ProjTransform(n.ExportToWkt(), file_proj.ExportToWkt())
+    return ProjTransform(file_proj.ExportToWkt(), n.ExportToWkt())
+
+
+class GeotiffMetadata(NamedTuple):
+    """Metadata of a GeoTIFF file required to compute its bounding box."""
+
+    geo_transform: tuple[float, ...]
+    # Projection, as WKT
+    projection: str
+    nb_cols: int
+    nb_rows: int
+
+
+def read_geotiff_metadata(filename: str) -> GeotiffMetadata:
+    """Open GeoTIFF file <filename> and read its metadata."""
     try:
-        from osgeo import gdal, osr
+        from osgeo import gdal
 
         gdal.UseExceptions()
     except ModuleNotFoundError:
@@ -189,13 +203,114 @@ def parse_geotiff_bbox(
                 ),
             )
             raise hgtError
-        fileProj = osr.SpatialReference()
-        fileProj.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
-        fileProj.ImportFromWkt(g.GetProjectionRef())
-        numOfCols = g.RasterXSize
-        numOfRows = g.RasterYSize
+        return GeotiffMetadata(
+            tuple(geoTransform), g.GetProjectionRef(), g.RasterXSize, g.RasterYSize
+        )
     except Exception:
         raise hgtError(f"Can't handle geotiff file {filename!s}") from None
+
+
+class GeotiffMetadataIndex:
+    """Cache of GeoTIFF files metadata, persisted in a sidecar index file
+    (GEOTIFF_INDEX_FILENAME) in each directory containing input files.
+
+    Entries are keyed by file name, and remain valid as long as the file's
+    modification time and size are unchanged.
+    """
+
+    def __init__(self) -> None:
+        # Entries per (absolute) directory, as stored in index files
+        self._entries: dict[str, dict[str, dict[str, Any]]] = {}
+        # Directories whose index must be saved
+        self._modified: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _directory_entries(self, directory: str) -> dict[str, dict[str, Any]]:
+        """Get entries of <directory>, loading its index file on first access.
+        Must be called with the lock held.
+        """
+        if directory not in self._entries:
+            entries: dict[str, dict[str, Any]]
+            try:
+                with open(os.path.join(directory, GEOTIFF_INDEX_FILENAME)) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                # A missing or broken index is simply rebuilt
+                entries = {}
+            self._entries[directory] = entries
+        return self._entries[directory]
+
+    def get(self, filename: str) -> GeotiffMetadata:
+        """Get metadata of <filename>, reading the file only if not in the index
+        or modified since it was indexed.
+        """
+        stat = os.stat(filename)
+        directory, name = os.path.split(os.path.abspath(filename))
+        with self._lock:
+            entry = self._directory_entries(directory).get(name)
+        if (
+            entry is not None
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            return GeotiffMetadata(
+                tuple(entry["geo_transform"]),
+                entry["projection"],
+                entry["nb_cols"],
+                entry["nb_rows"],
+            )
+        metadata = read_geotiff_metadata(filename)
+        with self._lock:
+            self._directory_entries(directory)[name] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                **metadata._asdict(),
+            }
+            self._modified.add(directory)
+        return metadata
+
+    def save(self) -> None:
+        """Write index files of directories with new or updated entries.
+        Best effort: input directories may not be writable.
+        """
+        with self._lock:
+            for directory in self._modified:
+                index_filename = os.path.join(directory, GEOTIFF_INDEX_FILENAME)
+                try:
+                    # Write to a temporary file first to never leave a partial index
+                    tmp_filename = f"{index_filename}.{os.getpid()}.tmp"
+                    with open(tmp_filename, "w") as f:
+                        json.dump(self._entries[directory], f)
+                    os.replace(tmp_filename, index_filename)
+                except OSError as e:
+                    logger.debug(
+                        "Unable to save metadata index %s: %s", index_filename, e
+                    )
+            self._modified.clear()
+
+
+# Process-wide GeoTIFF metadata index, filled by calc_hgt_area() and reused by
+# HgtFile.borders()
+geotiff_metadata_index = GeotiffMetadataIndex()
+
+
+def parse_geotiff_bbox(
+    filename: str,
+    corrx: float,
+    corry: float,
+    doTransform: bool,
+) -> BBox:
+    try:
+        from osgeo import osr
+    except ModuleNotFoundError:
+        raise ImportError(GEOTIFF_ERROR) from None
+    metadata = geotiff_metadata_index.get(filename)
+    geoTransform = metadata.geo_transform
+    fileProj = osr.SpatialReference()
+    fileProj.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    fileProj.ImportFromWkt(metadata.projection)
+    numOfCols = metadata.nb_cols
+    numOfRows = metadata.nb_rows
     lonIncrement = geoTransform[1]
     latIncrement = geoTransform[5]
     minLon = geoTransform[0] + 0.5 * lonIncrement
@@ -259,14 +374,37 @@ def parse_file_for_bbox(
     raise ValueError(f"Unsupported extension {fileExt}")
 
 
+def get_file_nb_points(fullFilename: str) -> int:
+    """Return the number of points of an input file, without loading its data."""
+    fileExt: str = os.path.splitext(fullFilename)[1].lower().replace(".", "")
+    if fileExt == "hgt":
+        # 2 bytes per point
+        return os.path.getsize(fullFilename) // 2
+    elif fileExt in ("tif", "tiff", "vrt"):
+        metadata = geotiff_metadata_index.get(fullFilename)
+        return metadata.nb_cols * metadata.nb_rows
+    raise ValueError(f"Unsupported extension {fileExt}")
+
+
 def calc_hgt_area(
     filenames: list[tuple[str, bool]],
     corrx: float,
     corry: float,
+    max_workers: int | None = None,
 ) -> BBox:
-    bboxes = [
-        parse_file_for_bbox(f[0], corrx, corry, doTransform=True) for f in filenames
-    ]
+    """Compute the bounding box of all input files.
+
+    Files are parsed in parallel on <max_workers> threads (mostly waiting for I/O);
+    GeoTIFF metadata are cached in sidecar index files to make next runs faster.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        bboxes = list(
+            executor.map(
+                lambda f: parse_file_for_bbox(f[0], corrx, corry, doTransform=True),
+                filenames,
+            )
+        )
+    geotiff_metadata_index.save()
     minLon = sorted([b[0] for b in bboxes])[0]
     minLat = sorted([b[1] for b in bboxes])[0]
     maxLon = sorted([b[2] for b in bboxes])[-1]
@@ -310,6 +448,81 @@ def clip_polygons(
     return clipped_polygons
 
 
+def _rasterize_polygon(
+    x_data: numpy.ndarray,
+    sorted_y_data: numpy.ndarray,
+    rows_order: numpy.ndarray,
+    polygon: Polygon,
+) -> numpy.ndarray:
+    """Scanline rasterization of a single polygon, see rasterize_polygons()."""
+    vertices = numpy.asarray(polygon, dtype=numpy.float64)
+    # Edges from each vertex to the next one (ring is closed if not already)
+    x0, y0 = vertices[:, 0], vertices[:, 1]
+    x1, y1 = numpy.roll(x0, -1), numpy.roll(y0, -1)
+    # Horizontal edges never cross a scanline
+    non_horizontal = y0 != y1
+    x0, y0, x1, y1 = (
+        x0[non_horizontal],
+        y0[non_horizontal],
+        x1[non_horizontal],
+        y1[non_horizontal],
+    )
+    # An edge crosses the rows with y in ]min(y0, y1), max(y0, y1)]; this half-open
+    # interval ensures a vertex shared by 2 edges is counted properly
+    first_row = numpy.searchsorted(sorted_y_data, numpy.minimum(y0, y1), side="right")
+    end_row = numpy.searchsorted(sorted_y_data, numpy.maximum(y0, y1), side="right")
+    nb_crossings = end_row - first_row
+    edge_index = numpy.repeat(numpy.arange(len(x0)), nb_crossings)
+    # Index (in sorted_y_data) of the row of each crossing
+    crossing_row = numpy.arange(len(edge_index)) - numpy.repeat(
+        numpy.cumsum(nb_crossings) - nb_crossings - first_row,
+        nb_crossings,
+    )
+    x0, y0, x1, y1 = x0[edge_index], y0[edge_index], x1[edge_index], y1[edge_index]
+    crossing_x = x0 + (sorted_y_data[crossing_row] - y0) * (x1 - x0) / (y1 - y0)
+
+    # Sort crossings by row, then along x; consecutive pairs delimit inside spans
+    crossings_order = numpy.lexsort((crossing_x, crossing_row))
+    crossing_row = crossing_row[crossings_order]
+    crossing_x = crossing_x[crossings_order]
+    span_row = rows_order[crossing_row[0::2]]
+    span_start = numpy.searchsorted(x_data, crossing_x[0::2], side="right")
+    span_end = numpy.searchsorted(x_data, crossing_x[1::2], side="left")
+    not_empty = span_start < span_end
+
+    # Fill spans by accumulating their boundaries along each row
+    boundaries = numpy.zeros((len(rows_order), len(x_data) + 1), dtype=numpy.int8)
+    numpy.add.at(boundaries, (span_row[not_empty], span_start[not_empty]), 1)
+    numpy.add.at(boundaries, (span_row[not_empty], span_end[not_empty]), -1)
+    return numpy.cumsum(boundaries[:, :-1], axis=1, dtype=numpy.int8) > 0
+
+
+def rasterize_polygons(
+    x_data: numpy.ndarray,
+    y_data: numpy.ndarray,
+    polygons: PolygonsList,
+) -> numpy.ndarray:
+    """Rasterize <polygons> on the regular grid defined by <x_data> and <y_data>.
+
+    A 2-D boolean array is returned (rows matching <y_data>, columns matching
+    <x_data>), True for points inside any of the polygons. Points lying exactly on a
+    polygon's boundary are considered outside.
+    <x_data> must be sorted in increasing order, <y_data> may be in any order.
+
+    This is a scanline algorithm: the crossings of all rows with each polygon edge
+    are computed at once, then spans between consecutive crossings are filled row
+    by row. It runs in O(rows x edges) rather than O(points x vertices) for
+    point-in-polygon tests.
+    """
+    rows_order = numpy.argsort(y_data, kind="stable")
+    sorted_y_data = numpy.asarray(y_data, dtype=numpy.float64)[rows_order]
+    x_data = numpy.asarray(x_data, dtype=numpy.float64)
+    inside = numpy.zeros((len(y_data), len(x_data)), dtype=bool)
+    for polygon in polygons:
+        inside |= _rasterize_polygon(x_data, sorted_y_data, rows_order, polygon)
+    return inside
+
+
 def polygon_mask(
     x_data: numpy.ndarray,
     y_data: numpy.ndarray,
@@ -323,24 +536,18 @@ def polygon_mask(
     <transform> may be transform function from the file's projection to EPSG:4326,
     which is the projection used within polygon files.
     """
-    X, Y = numpy.meshgrid(x_data, y_data)
-    xyPoints: Iterable[tuple[float, float]] = numpy.vstack(([X.T], [Y.T])).T.reshape(
-        len(x_data) * len(y_data),
-        2,
-    )
-
     # To improve performances, clip original polygons to current data boundaries.
-    # Slightly expand the bounding box, as PolygonPath.contains_points result is undefined for points on boundary
-    # https://matplotlib.org/stable/api/path_api.html#matplotlib.path.Path.contains_point
-    bbox_points: Iterable[tuple[float, float]] = [
-        (x_data.min() - BBOX_EXPAND_EPSILON, y_data.min() - BBOX_EXPAND_EPSILON),
-        (x_data.min() - BBOX_EXPAND_EPSILON, y_data.max() + BBOX_EXPAND_EPSILON),
-        (x_data.max() + BBOX_EXPAND_EPSILON, y_data.max() + BBOX_EXPAND_EPSILON),
-        (x_data.max() + BBOX_EXPAND_EPSILON, y_data.min() - BBOX_EXPAND_EPSILON),
-        (x_data.min() - BBOX_EXPAND_EPSILON, y_data.min() - BBOX_EXPAND_EPSILON),
-    ]
+    # Slightly expand the bounding box, as points on boundary are considered outside.
+    bbox_points = numpy.array(
+        [
+            (x_data.min() - BBOX_EXPAND_EPSILON, y_data.min() - BBOX_EXPAND_EPSILON),
+            (x_data.min() - BBOX_EXPAND_EPSILON, y_data.max() + BBOX_EXPAND_EPSILON),
+            (x_data.max() + BBOX_EXPAND_EPSILON, y_data.max() + BBOX_EXPAND_EPSILON),
+            (x_data.max() + BBOX_EXPAND_EPSILON, y_data.min() - BBOX_EXPAND_EPSILON),
+            (x_data.min() - BBOX_EXPAND_EPSILON, y_data.min() - BBOX_EXPAND_EPSILON),
+        ]
+    )
     if transform is not None:
-        xyPoints = transform(xyPoints)
         bbox_points = transform(bbox_points)
 
     clipped_polygons = clip_polygons(polygons, bbox_points)
@@ -350,35 +557,216 @@ def polygon_mask(
         # Simply return a 1x1 True mask
         return numpy.array([True])
 
-    maskArray = numpy.ma.array(numpy.empty((len(x_data) * len(y_data), 1)))
-    for p in clipped_polygons:
-        # run through all polygons and combine masks
-        mask = PolygonPath(p).contains_points(xyPoints)  # type: ignore[arg-type]
-        maskArray = numpy.ma.array(maskArray, mask=mask, keep_mask=True)
-    return numpy.invert(maskArray.mask.reshape(len(y_data), len(x_data)))
+    if transform is None or isinstance(transform, AffineTransform):
+        # Data grid is regular in polygons' coordinates system
+        # (also after an affine transformation, as axes are transformed independently)
+        if transform is not None:
+            x_data, y_data = transform.transform_axes(x_data, y_data)
+        if len(x_data) > 1 and x_data[0] > x_data[-1]:
+            # Decreasing x values (eg. negative scale): rasterize_polygons() needs
+            # them increasing, flip columns
+            inside = rasterize_polygons(x_data[::-1], y_data, clipped_polygons)[:, ::-1]
+        else:
+            inside = rasterize_polygons(x_data, y_data, clipped_polygons)
+    else:
+        # Transformed data grid isn't regular anymore; test each point, relying on
+        # shapely's vectorized implementation
+        X, Y = numpy.meshgrid(x_data, y_data)
+        xyPoints = transform.transform_array(numpy.column_stack((X.ravel(), Y.ravel())))
+        inside = numpy.zeros(len(xyPoints), dtype=bool)
+        for p in clipped_polygons:
+            inside |= shapely.contains_xy(
+                shapely.Polygon(p), xyPoints[:, 0], xyPoints[:, 1]
+            )
+        inside = inside.reshape(len(y_data), len(x_data))
+    return numpy.invert(inside)
+
+
+def compact_elevations(raw_z_data: numpy.ndarray) -> numpy.ndarray:
+    """Return elevation data in the most compact dtype holding them losslessly.
+
+    Integer DEMs (HGT files and most GeoTIFF ones) fitting into 16 bits are kept as
+    int16, other ones (eg. float DEMs) as float32.
+    Data are converted to float only right before contouring, see HgtTile.contourLines().
+    """
+    if numpy.issubdtype(raw_z_data.dtype, numpy.integer):
+        int16_info = numpy.iinfo(numpy.int16)
+        if raw_z_data.size == 0 or (
+            raw_z_data.min() >= int16_info.min and raw_z_data.max() <= int16_info.max
+        ):
+            return raw_z_data.astype(numpy.int16, copy=False)
+    return raw_z_data.astype(numpy.float32, copy=False)
+
+
+# Number of input rows added above and below each block when super sampling. Spline
+# prefiltering has an infinite support, but its influence decreases exponentially
+# (by a ratio of ~0.27 per row for order 3), so results at blocks seams match the
+# ones computed on the whole data.
+SUPER_SAMPLE_HALO = 24
+
+# Default maximum number of output points super sampled at once
+SUPER_SAMPLE_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def _super_sample_block(
+    input_data: numpy.ndarray,
+    input_mask: numpy.ndarray,
+    out_data: numpy.ndarray,
+    out_mask: numpy.ndarray,
+    first_row: int,
+    last_row: int,
+) -> None:
+    """Super sample output rows [first_row, last_row[ into out_data and out_mask."""
+    # Same coordinates mapping as ndimage.zoom (grid_mode=False)
+    row_ratio, col_ratio = (
+        (in_size - 1) / (out_size - 1) if out_size > 1 else 1.0
+        for in_size, out_size in zip(input_data.shape, out_data.shape)
+    )
+    in_first = max(int(first_row * row_ratio) - SUPER_SAMPLE_HALO, 0)
+    in_last = min(
+        math.ceil((last_row - 1) * row_ratio) + 1 + SUPER_SAMPLE_HALO,
+        input_data.shape[0],
+    )
+    matrix = (row_ratio, col_ratio)
+    offset = (first_row * row_ratio - in_first, 0.0)
+    output_shape = (last_row - first_row, out_data.shape[1])
+    # Limit order to 1 to avoid artifacts on constant value boundaries (eg. limit of sea areas)
+    # Mirror mode is equivalent to ndimage.zoom's default constant mode within the
+    # input's extent, but tolerates rounding errors on the block's offset for the
+    # last output row
+    block = ndimage.affine_transform(
+        input_data[in_first:in_last].astype(numpy.float32),
+        matrix,
+        offset=offset,
+        output_shape=output_shape,
+        output=numpy.float32,
+        order=3,
+        mode="mirror",
+    )
+    # Round result to avoid oscillations around 0 due to spline interpolation
+    numpy.around(block, 0, out=block)
+    if numpy.issubdtype(out_data.dtype, numpy.integer):
+        # Spline interpolation may overshoot the input range (eg. close to void values)
+        dtype_info = numpy.iinfo(out_data.dtype)
+        numpy.clip(block, dtype_info.min, dtype_info.max, out=block)
+    out_data[first_row:last_row] = block
+    # Resize mask independantly, using 0 order to avoid artifacts.
+    # Nearest indices are computed from global coordinates as ndimage.zoom does, to
+    # get the same choice for points half-way between two input points.
+    rows = numpy.minimum(
+        numpy.floor(numpy.arange(first_row, last_row) * row_ratio + 0.5).astype(int),
+        input_mask.shape[0] - 1,
+    )
+    cols = numpy.minimum(
+        numpy.floor(numpy.arange(out_mask.shape[1]) * col_ratio + 0.5).astype(int),
+        input_mask.shape[1] - 1,
+    )
+    out_mask[first_row:last_row] = input_mask[numpy.ix_(rows, cols)]
 
 
 def super_sample(
     input_data: numpy.ndarray,
     input_mask: numpy.ndarray,
     zoom_level: float,
+    block_size: int = SUPER_SAMPLE_BLOCK_SIZE,
+    max_workers: int = 1,
 ) -> tuple[numpy.ndarray, numpy.ndarray]:
-    """Super sample the input data and associated mask."""
+    """Super sample the input data and associated mask.
+
+    Output data keep the dtype of the input ones (float32 for non-integer data).
+
+    Data are processed by blocks of rows of at most <block_size> output points
+    (along with a halo of input rows), possibly in parallel on <max_workers> threads,
+    to bound memory usage to the output arrays and ~<max_workers> blocks.
+    """
     logger.debug("Smoothing input by a ratio of %f", zoom_level)
-    # Limit order to 1 to avoid artifacts on constant value boundaries (eg. limit of sea areas)
-    # Round result to avoid oscillations around 0 due to spline interpolation
-    out_data = numpy.around(
-        cast(numpy.ndarray, ndimage.zoom(input_data, zoom_level, order=3)),
-        0,
+    out_shape = tuple(round(size * zoom_level) for size in input_data.shape)
+    out_dtype = (
+        input_data.dtype
+        if numpy.issubdtype(input_data.dtype, numpy.integer)
+        else numpy.dtype(numpy.float32)
+    )
+    out_data = numpy.empty(out_shape, dtype=out_dtype)
+    out_mask = numpy.empty(out_shape, dtype=input_mask.dtype)
+    block_rows = max(block_size // max(out_shape[1], 1), 1)
+    blocks = [
+        (first_row, min(first_row + block_rows, out_shape[0]))
+        for first_row in range(0, out_shape[0], block_rows)
+    ]
+    logger.debug(
+        "Super sampling %d blocks of %d rows with %d threads",
+        len(blocks),
+        block_rows,
+        max_workers,
     )
-    # Resize mask independantly, using 0 order to avoid artifacts
-    out_mask = ndimage.zoom(input_mask, zoom_level, order=0)
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        # Consume results to propagate exceptions
+        for _ in executor.map(
+            lambda block: _super_sample_block(
+                input_data, input_mask, out_data, out_mask, *block
+            ),
+            blocks,
+        ):
+            pass
     # from PIL import Image as im
     # im.fromarray(input_data, mode="F").save('orig.tiff')
     # im.fromarray(out_data, mode="F").save('super.tiff')
     return out_data, out_mask
 
 
+# Number of rows processed at once when computing per-row statistics
+ROWS_BLOCK_SIZE = 256
+
+
+def elevation_differences_per_row(
+    data: numpy.ma.masked_array,
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Sum absolute elevation differences between contiguous non-void points, per row.
+
+    Returns (<horizontal>, <vertical>) 1-D arrays: <horizontal>[i] sums differences
+    between neighbours within row i, <vertical>[i] the ones between rows i and i+1
+    (so it has one element less).
+    Differences are computed on the compact (raw) data, by blocks of rows to bound
+    memory usage.
+    """
+    values = numpy.ma.getdata(data)
+    void = numpy.ma.getmaskarray(data)
+    nb_rows = values.shape[0]
+    horizontal = numpy.zeros(nb_rows)
+    vertical = numpy.zeros(max(nb_rows - 1, 0))
+    for start in range(0, nb_rows, ROWS_BLOCK_SIZE):
+        # Include next block's first row, for vertical differences
+        end = min(start + ROWS_BLOCK_SIZE + 1, nb_rows)
+        block, block_void = values[start:end], void[start:end]
+        # Compute differences as float to avoid integer overflows
+        horizontal[start:end] = numpy.sum(
+            numpy.abs(numpy.subtract(block[:, 1:], block[:, :-1], dtype=numpy.float32)),
+            axis=1,
+            where=~(block_void[:, 1:] | block_void[:, :-1]),
+            dtype=numpy.float64,
+        )
+        vertical[start : end - 1] = numpy.sum(
+            numpy.abs(numpy.subtract(block[1:, :], block[:-1, :], dtype=numpy.float32)),
+            axis=1,
+            where=~(block_void[1:, :] | block_void[:-1, :]),
+            dtype=numpy.float64,
+        )
+    return horizontal, vertical
+
+
+class RowsCumulativeSum:
+    """Cumulative sum of per-row values of a 2-D array, giving the sum of those
+    values over any block of contiguous rows in constant time.
+    """
+
+    def __init__(self, row_values: numpy.ndarray) -> None:
+        self.cumulated = numpy.concatenate(([0], numpy.cumsum(row_values)))
+
+    def block_sum(self, first_row: int, nb_rows: int):
+        """Sum of values of rows [<first_row>, <first_row> + <nb_rows>[."""
+        return self.cumulated[first_row + nb_rows] - self.cumulated[first_row]
+
+
 class HgtFile:
     """is a handle for SRTM data files"""
 
@@ -392,18 +780,28 @@ class HgtFile:
         voidMax: int = -0x8000,
         feetSteps=False,
         smooth_ratio: float = 1.0,
+        smooth_block_size: int = SUPER_SAMPLE_BLOCK_SIZE,
+        smooth_jobs: int = 1,
     ) -> None:
         """tries to open <filename> and extracts content to self.zData.
 
         <corrx> and <corry> are longitude and latitude corrections (floats)
         as passed to pyhgtmap on the commandline.
+        <smooth_block_size> and <smooth_jobs> bound memory usage and set parallelism
+        of super sampling when <smooth_ratio> is not 1.
         """
         self.feetSteps = feetSteps
+        # Elevations are stored as read from the file (meters); conversion to feet is
+        # applied on the fly, to keep the compact storage of integer DEMs
+        self.zScale: float = meters2Feet if feetSteps else 1.0
+        self.smooth_block_size = smooth_block_size
+        self.smooth_jobs = smooth_jobs
         self.fullFilename = filename
         self.filename = os.path.split(filename)[-1]
         self.fileExt = os.path.splitext(self.filename)[1].lower().replace(".", "")
         # Assigned by initAsXxx
         self.polygons: PolygonsList | None
+        # Compact elevation data (int16 for integer DEMs) along with the void mask
         self.zData: numpy.ma.masked_array
         # Thjose represent the bounding box coordinates of the file,
         # ** using the actual file's projection coordinates!!! **
@@ -458,24 +856,28 @@ class HgtFile:
         try:
             numOfDataPoints = os.path.getsize(self.fullFilename) / 2
             self.numOfRows = self.numOfCols = int(numOfDataPoints**0.5)
-            raw_z_data = (
-                numpy.fromfile(self.fullFilename, dtype=">i2")
-                .reshape(self.numOfRows, self.numOfCols)
-                .astype("float32")
-            )
+            # Keep raw int16 values (in native byte order)
+            with timing.stage(timing.FILE_LOAD):
+                raw_z_data = (
+                    numpy.fromfile(self.fullFilename, dtype=">i2")
+                    .reshape(self.numOfRows, self.numOfCols)
+                    .astype(numpy.int16)
+                )
 
             # Compute mask BEFORE zooming, due to zoom artifacts on void areas boundaries
-            voidMask = numpy.asarray(numpy.where(raw_z_data <= voidMax, True, False))
+            with timing.stage(timing.VOID_MASK):
+                voidMask = raw_z_data <= voidMax
             if smooth_ratio != 1:
-                raw_z_data, voidMask = super_sample(raw_z_data, voidMask, smooth_ratio)
+                with timing.stage(timing.SMOOTHING):
+                    raw_z_data, voidMask = super_sample(
+                        raw_z_data,
+                        voidMask,
+                        smooth_ratio,
+                        self.smooth_block_size,
+                        self.smooth_jobs,
+                    )
                 self.numOfRows, self.numOfCols = raw_z_data.shape
-            self.zData = numpy.ma.array(
-                raw_z_data,
-                mask=voidMask,
-                fill_value=float("NaN"),
-            )
-            if self.feetSteps:
-                self.zData = self.zData * meters2Feet
+            self.zData = numpy.ma.array(raw_z_data, mask=voidMask)
         finally:
             self.lonIncrement = 1.0 / (self.numOfCols - 1)
             self.latIncrement = 1.0 / (self.numOfRows - 1)
@@ -518,19 +920,22 @@ class HgtFile:
             self.numOfCols = g.RasterXSize
             self.numOfRows = g.RasterYSize
             # init z data
-            raw_z_data = g.GetRasterBand(1).ReadAsArray().astype("float32")
+            with timing.stage(timing.FILE_LOAD):
+                raw_z_data = compact_elevations(g.GetRasterBand(1).ReadAsArray())
             # Compute mask BEFORE zooming, due to zoom artifacts on void areas boundaries
-            voidMask = numpy.asarray(numpy.where(raw_z_data <= voidMax, True, False))
+            with timing.stage(timing.VOID_MASK):
+                voidMask = raw_z_data <= voidMax
             if smooth_ratio != 1:
-                raw_z_data, voidMask = super_sample(raw_z_data, voidMask, smooth_ratio)
+                with timing.stage(timing.SMOOTHING):
+                    raw_z_data, voidMask = super_sample(
+                        raw_z_data,
+                        voidMask,
+                        smooth_ratio,
+                        self.smooth_block_size,
+                        self.smooth_jobs,
+                    )
                 self.numOfRows, self.numOfCols = raw_z_data.shape
-            self.zData = numpy.ma.array(
-                raw_z_data,
-                mask=voidMask,
-                fill_value=float("NaN"),
-            )
-            if self.feetSteps:
-                self.zData = self.zData * meters2Feet
+            self.zData = numpy.ma.array(raw_z_data, mask=voidMask)
             # make x and y data
             self.lonIncrement = geoTransform[1]
             self.latIncrement = -geoTransform[5]
@@ -548,7 +953,8 @@ class HgtFile:
                 self.polygons = None
 
     def borders(self, corrx=0.0, corry=0.0) -> BBox:
-        """determines the bounding box of self.filename using parseHgtFilename()."""
+        """determines the bounding box of self.filename using parseHgtFilename(),
+        or the GeoTIFF metadata index."""
         return parse_file_for_bbox(self.fullFilename, corrx, corry, doTransform=False)
 
     def make_tiles(self, opts: Configuration) -> list[HgtTile]:
@@ -641,10 +1047,15 @@ class HgtFile:
             inputBbox: BBox,
             inputData: numpy.ma.masked_array,
             depth=0,
+            first_row=0,
         ):
-            """chops data and appends chops to tiles if small enough."""
+            """chops data and appends chops to tiles if small enough.
+
+            <first_row> is the index of the first row of <inputData> in the
+            truncated data.
+            """
 
-            def estim_num_of_nodes(data: numpy.ma.masked_array) -> int:
+            def estim_num_of_nodes(first_row: int, nb_rows: int) -> float:
                 """simple estimation of the number of nodes. The number of nodes is
                 estimated by summing over all absolute differences of contiguous
                 points in the zData matrix which is previously divided by the step
@@ -654,14 +1065,16 @@ class HgtFile:
                 tagged with the value -32768 (-0x8000)), but overestimates the number of points
                 in areas with voids by approximately 0 ... 50 % although the
                 corresponding differences are explicitly set to 0.
+
+                Differences are summed per row once for the whole truncated data;
+                estimation for a chunk of rows is then done in constant time.
                 """
-                helpData = data.filled() / step
-                xHelpData = numpy.abs(helpData[:, 1:] - helpData[:, :-1])
-                yHelpData = numpy.abs(helpData[1:, :] - helpData[:-1, :])
-                estimatedNumOfNodes = numpy.nansum(xHelpData) + numpy.nansum(yHelpData)
-                return estimatedNumOfNodes
+                estimatedNumOfNodes = horizontalDiffs.block_sum(
+                    first_row, nb_rows
+                ) + verticalDiffs.block_sum(first_row, nb_rows - 1)
+                return estimatedNumOfNodes * self.zScale / step
 
-            def too_many_nodes(data: numpy.ma.masked_array) -> bool:
+            def too_many_nodes(first_row: int, nb_rows: int) -> bool:
                 """returns True if the estimated number of nodes is greater than
                 <maxNodes> and False otherwise.  <maxNodes> defaults to 1000000,
                 which is an approximate limit for correct handling of osm files
@@ -669,13 +1082,13 @@ class HgtFile:
                 """
                 if maxNodes == 0:
                     return False
-                return estim_num_of_nodes(data) > maxNodes
+                return estim_num_of_nodes(first_row, nb_rows) > maxNodes
 
             def get_chops(
-                unchoppedData: numpy.ma.masked_array, unchoppedBbox
+                unchoppedData: numpy.ma.masked_array, unchoppedBbox, unchoppedFirstRow
             ) -> tuple[
-                tuple[BBox, numpy.ma.masked_array],
-                tuple[BBox, numpy.ma.masked_array],
+                tuple[BBox, numpy.ma.masked_array, int],
+                tuple[BBox, numpy.ma.masked_array, int],
             ]:
                 """returns a data chop and the according bbox. This function is
                 recursively called until all tiles are estimated to be small enough.
@@ -708,47 +1121,34 @@ class HgtFile:
                 )
                 lowerChopData = unchoppedData[chopLatIndex:, :]
                 upperChopData = unchoppedData[: chopLatIndex + 1, :]
-                return (lowerChopBbox, lowerChopData), (upperChopBbox, upperChopData)
+                return (
+                    (lowerChopBbox, lowerChopData, unchoppedFirstRow + chopLatIndex),
+                    (upperChopBbox, upperChopData, unchoppedFirstRow),
+                )
 
+            nbRows = inputData.shape[0]
             # Discard quickly fully void tiles (eg. middle of the sea)
-            if isinstance(inputData, numpy.ma.masked_array):
-                voidMaskValues = numpy.unique(inputData.mask)
-                if numpy.array_equal(voidMaskValues, [True]):
-                    # this tile is full of void values, so discard this tile
+            if voidPoints.block_sum(first_row, nbRows) == inputData.size:
+                # this tile is full of void values, so discard this tile
+                return
+
+            if outsidePoints is not None:
+                nbOutsidePoints = outsidePoints.block_sum(first_row, nbRows)
+                if nbOutsidePoints == inputData.size:
+                    # all elements are masked -> tile is outside of self.polygons
                     return
 
-            if too_many_nodes(inputData):
-                chops = get_chops(inputData, inputBbox)
-                for choppedBbox, choppedData in chops:
-                    chop_data(choppedBbox, choppedData, depth + 1)
+            if too_many_nodes(first_row, nbRows):
+                chops = get_chops(inputData, inputBbox, first_row)
+                for choppedBbox, choppedData, choppedFirstRow in chops:
+                    chop_data(choppedBbox, choppedData, depth + 1, choppedFirstRow)
             else:
-                if self.polygons:
-                    tileXData = numpy.arange(
-                        inputBbox[0],
-                        inputBbox[2] + self.lonIncrement / 2.0,
-                        self.lonIncrement,
-                    )
-                    tileYData = numpy.arange(
-                        inputBbox[3],
-                        inputBbox[1] - self.latIncrement / 2.0,
-                        -self.latIncrement,
-                    )
-                    tileMask = polygon_mask(
-                        tileXData,
-                        tileYData,
-                        self.polygons,
-                        self.transform,
-                    )
-                    tilePolygon: PolygonsList | None = self.polygons
-                    if not numpy.any(tileMask):
-                        # all points are inside the polygon
-                        tilePolygon = None
-                    elif numpy.all(tileMask):
-                        # all elements are masked -> tile is outside of self.polygons
-                        return
-                else:
-                    tilePolygon = None
-                    tileMask = None
+                tilePolygon: PolygonsList | None = None
+                tileMask: numpy.ndarray | None = None
+                if outsidePoints is not None and nbOutsidePoints:
+                    # Tile is partially outside of self.polygons
+                    tilePolygon = self.polygons
+                    tileMask = polygonMask[first_row : first_row + nbRows]
                 tiles.append(
                     HgtTile(
                         bbox=inputBbox,
@@ -757,10 +1157,41 @@ class HgtFile:
                         polygons=tilePolygon,
                         mask=tileMask,
                         transform=self.transform,
+                        elevation_scale=self.zScale,
+                        estimated_nb_nodes=estim_num_of_nodes(first_row, nbRows),
                     ),
                 )
 
         tiles: list[HgtTile] = []
-        bbox, truncatedData = truncate_data(area, self.zData)
-        chop_data(bbox, truncatedData)
+        with timing.stage(timing.TILING):
+            bbox, truncatedData = truncate_data(area, self.zData)
+        # Polygon mask is computed once for the whole truncated data, and sliced for
+        # each tile; a summary of outside points per row allows discarding fully
+        # outside chunks and detecting fully inside tiles cheaply.
+        outsidePoints: RowsCumulativeSum | None = None
+        if self.polygons:
+            with timing.stage(timing.POLYGON_MASK):
+                polygonMask = self.polygon_mask(bbox, truncatedData.shape)
+            if polygonMask.shape != truncatedData.shape:
+                # Data fully outside of self.polygons
+                return tiles
+            outsidePoints = RowsCumulativeSum(numpy.count_nonzero(polygonMask, axis=1))
+        with timing.stage(timing.TILING):
+            # Void points and elevation differences are summarized per row once, and
+            # reused by all (recursive) chunks; the estimated number of nodes is also
+            # used to schedule tiles processing
+            voidPoints = RowsCumulativeSum(
+                numpy.count_nonzero(numpy.ma.getmaskarray(truncatedData), axis=1)
+            )
+            horizontalDiffs, verticalDiffs = (
+                RowsCumulativeSum(diffs)
+                for diffs in elevation_differences_per_row(truncatedData)
+            )
+            chop_data(bbox, truncatedData)
         return tiles
+
+    def polygon_mask(self, bbox: BBox, shape: tuple[int, ...]) -> numpy.ndarray:
+        """Return the mask of self.polygons for data of given <shape> and <bbox>."""
+        xData = numpy.arange(shape[1]) * self.lonIncrement + bbox.min_lon
+        yData = numpy.arange(shape[0]) * self.latIncrement * -1 + bbox.max_lat
+        return polygon_mask(xData, yData, self.polygons or [], self.transform)
@@ -0,0 +1,350 @@
+"""Persistent manifest of processed tiles, allowing to resume interrupted runs, or to
+regenerate only the tiles whose inputs changed.
+
+The manifest is a JSON lines file, stored along with output files, with one record
+per input file loaded and per tile processed. It's rewritten at the beginning of
+each run, keeping only the records which may be reused, and appended as tiles
+complete.
+Records hold a fingerprint of the options impacting output, and of the input file
+content, so that tiles are reused only if they would be generated identically.
+Input files are only hashed when their size or modification time differ from the
+ones recorded along with their fingerprint.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from typing import IO, TYPE_CHECKING, NamedTuple
+
+from pyhgtmap import BBox
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from pyhgtmap.configuration import Configuration
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "pyhgtmap_manifest.jsonl"
+
+TILE_DONE = "done"
+TILE_FAILED = "failed"
+
+# Options impacting the generated contours, their IDs or output files names
+OUTPUT_OPTIONS = (
+    "area",
+    "polygon",
+    "srtmCorrx",
+    "srtmCorry",
+    "voidMax",
+    "smooth_ratio",
+    "contourStepSize",
+    "contourFeet",
+    "noZero",
+    "lineCats",
+    "maxNodesPerTile",
+    "maxNodesPerWay",
+    "rdpEpsilon",
+    "disableRdp",
+    "startId",
+    "startWayId",
+    "osmVersion",
+    "writeTimestamp",
+    "outputPrefix",
+    "dataSource",
+    "gzip",
+    "pbf",
+    "o5m",
+)
+
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+
+def make_manifest_filename(opts: Configuration) -> str:
+    """Return the name of the manifest, stored along with output files."""
+    prefix = f"{opts.outputPrefix:s}_" if opts.outputPrefix else ""
+    return prefix + MANIFEST_FILENAME
+
+
+def options_fingerprint(opts: Configuration) -> str:
+    """Return a digest of the options impacting output files."""
+    return hashlib.sha256(
+        json.dumps(
+            {name: getattr(opts, name, None) for name in OUTPUT_OPTIONS},
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+
+class InputFingerprint(NamedTuple):
+    """Digest of an input file content, along with the size and modification time
+    of the file it was computed on.
+    """
+
+    digest: str
+    size: int
+    mtime_ns: int
+
+
+# Fingerprint of missing input files
+MISSING_INPUT = InputFingerprint("", -1, -1)
+
+
+def file_fingerprint(file_name: str) -> str:
+    """Return a digest of the content of a file."""
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as input_file:
+        for chunk in iter(lambda: input_file.read(FINGERPRINT_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileRecord(NamedTuple):
+    """Input file loaded, as stored in the manifest."""
+
+    input_file: str
+    fingerprint: str
+    input_fingerprint: str
+    # Number of tiles the file is made of
+    nb_tiles: int
+    # Size and modification time of the input file, when fingerprinted
+    input_size: int = -1
+    input_mtime_ns: int = -1
+
+
+class TileRecord(NamedTuple):
+    """Processing outcome of a tile, as stored in the manifest."""
+
+    input_file: str
+    bbox: BBox
+    fingerprint: str
+    input_fingerprint: str
+    state: str
+    # None for tiles without any contour
+    output_file: str | None = None
+    node_start_id: int = 0
+    nb_nodes: int = 0
+    way_start_id: int = 0
+    nb_ways: int = 0
+    # Size and modification time of the input file, when fingerprinted
+    input_size: int = -1
+    input_mtime_ns: int = -1
+
+
+class JobManifest:
+    """Manifest of the tiles processed by a run."""
+
+    def __init__(self, filename: str, fingerprint: str, reuse: bool) -> None:
+        """Open the manifest, reloading completed tiles of previous run if reusing.
+
+        Args:
+            filename (str): manifest file name
+            fingerprint (str): fingerprint of current run options
+            reuse (bool): whether tiles completed by previous run may be skipped
+        """
+        self.filename = filename
+        self.fingerprint = fingerprint
+        # Known digests of input files, by name, size and modification time
+        self.digests: dict[tuple[str, int, int], str] = {}
+        # Fingerprints of input files, by name, computed at most once per run
+        self.input_fingerprints: dict[str, InputFingerprint] = {}
+        # Input files loaded by previous run
+        self.files: dict[str, FileRecord] = {}
+        # Tiles completed by previous run, by input file and bounding box
+        self.completed: dict[tuple[str, BBox], TileRecord] = {}
+        # Tiles generated by previous run which can't be reused, by output file
+        self.stale: dict[str, TileRecord] = {}
+        # Output files written by current run (or reused)
+        self.outputs: set[str] = set()
+        if reuse:
+            self.load()
+            logger.info(
+                "Reusing previous run; %d tile(s) already completed",
+                len(self.completed),
+            )
+        self.file: IO[str] = open(self.filename, "w")  # noqa: SIM115
+        for file_record in self.files.values():
+            self.write(file_record)
+        for record in self.completed.values():
+            self.write(record)
+
+    def input_fingerprint(self, file_name: str) -> InputFingerprint:
+        """Return the (cached) fingerprint of an input file.
+
+        The file is hashed only if no digest is known for its current size and
+        modification time.
+        """
+        if file_name not in self.input_fingerprints:
+            try:
+                stat = os.stat(file_name)
+                key = (file_name, stat.st_size, stat.st_mtime_ns)
+                if key not in self.digests:
+                    self.digests[key] = file_fingerprint(file_name)
+                fingerprint = InputFingerprint(self.digests[key], *key[1:])
+            except OSError:
+                fingerprint = MISSING_INPUT
+            self.input_fingerprints[file_name] = fingerprint
+        return self.input_fingerprints[file_name]
+
+    def is_reusable(self, record: FileRecord | TileRecord) -> bool:
+        """Whether a record was generated with same options and input file."""
+        return record.fingerprint == self.fingerprint and (
+            record.input_fingerprint == self.input_fingerprint(record.input_file).digest
+        )
+
+    def load(self) -> None:
+        """Load records of previous run, keeping the completed tiles whose output
+        is still valid.
+        """
+        try:
+            with open(self.filename) as manifest_file:
+                lines = manifest_file.readlines()
+        except FileNotFoundError:
+            logger.warning("No manifest %s to reuse", self.filename)
+            return
+        records: list[FileRecord | TileRecord] = []
+        for line in lines:
+            try:
+                data = json.loads(line)
+                record: FileRecord | TileRecord = (
+                    FileRecord(**data)
+                    if "nb_tiles" in data
+                    else TileRecord(**{**data, "bbox": BBox(*data["bbox"])})
+                )
+            except (ValueError, TypeError, KeyError):
+                # Typically the last line, if previous run was killed while writing
+                logger.warning("Ignoring invalid manifest record: %s", line.strip())
+                continue
+            records.append(record)
+        # Input files unchanged since they were fingerprinted don't need to be
+        # hashed again
+        for record in records:
+            self.digests[
+                (record.input_file, record.input_size, record.input_mtime_ns)
+            ] = record.input_fingerprint
+        for record in records:
+            if isinstance(record, FileRecord):
+                if self.is_reusable(record):
+                    self.files[record.input_file] = record
+                continue
+            key = (record.input_file, record.bbox)
+            if (
+                record.state == TILE_DONE
+                and self.is_reusable(record)
+                and (record.output_file is None or os.path.exists(record.output_file))
+            ):
+                self.completed[key] = record
+            else:
+                self.completed.pop(key, None)
+                if record.state == TILE_DONE and record.output_file is not None:
+                    self.stale[record.output_file] = record
+
+    def completed_tile(self, input_file: str, bbox: BBox) -> TileRecord | None:
+        """Return the record of a tile completed by previous run, if any."""
+        return self.completed.get((input_file, bbox))
+
+    def completed_file(self, input_file: str) -> list[TileRecord] | None:
+        """Return the records of the tiles of an input file, if all of them were
+        completed by previous run.
+        """
+        file_record = self.files.get(input_file)
+        if file_record is None:
+            return None
+        records = [
+            record
+            for (file_name, _), record in self.completed.items()
+            if file_name == input_file
+        ]
+        return records if len(records) == file_record.nb_tiles else None
+
+    def next_ids(self) -> tuple[int, int]:
+        """Return the node and way IDs following the ones of completed tiles."""
+        return (
+            max(
+                (
+                    record.node_start_id + record.nb_nodes
+                    for record in self.completed.values()
+                ),
+                default=0,
+            ),
+            max(
+                (
+                    record.way_start_id + record.nb_ways
+                    for record in self.completed.values()
+                ),
+                default=0,
+            ),
+        )
+
+    def write(self, record: FileRecord | TileRecord) -> None:
+        """Append a record, flushed immediately to survive crashes."""
+        self.file.write(json.dumps(record._asdict()) + "\n")
+        self.file.flush()
+        if isinstance(record, TileRecord) and record.output_file is not None:
+            self.outputs.add(record.output_file)
+
+    def record_file(self, input_file: str, nb_tiles: int) -> None:
+        """Record an input file loaded by current run."""
+        input_fingerprint = self.input_fingerprint(input_file)
+        self.write(
+            FileRecord(
+                input_file,
+                self.fingerprint,
+                input_fingerprint.digest,
+                nb_tiles,
+                input_fingerprint.size,
+                input_fingerprint.mtime_ns,
+            )
+        )
+
+    def record(
+        self,
+        input_file: str,
+        bbox: BBox,
+        state: str,
+        output_file: str | None = None,
+        node_start_id: int = 0,
+        nb_nodes: int = 0,
+        way_start_id: int = 0,
+        nb_ways: int = 0,
+    ) -> None:
+        """Record the outcome of a tile processed by current run."""
+        input_fingerprint = self.input_fingerprint(input_file)
+        self.write(
+            TileRecord(
+                input_file,
+                BBox(*bbox),
+                self.fingerprint,
+                input_fingerprint.digest,
+                state,
+                output_file,
+                node_start_id,
+                nb_nodes,
+                way_start_id,
+                nb_ways,
+                input_fingerprint.size,
+                input_fingerprint.mtime_ns,
+            )
+        )
+
+    def remove_stale_outputs(self, input_files: Iterable[str]) -> None:
+        """Remove outputs generated by previous run from given input files, which
+        were neither reused nor generated again by current run (eg. tiles boundaries
+        moved as input file changed).
+        """
+        input_files = set(input_files)
+        for output_file, record in self.stale.items():
+            if (
+                record.input_file in input_files
+                and output_file not in self.outputs
+                and os.path.exists(output_file)
+            ):
+                logger.info("Removing stale output %s", output_file)
+                os.remove(output_file)
+
+    def close(self) -> None:
+        self.file.close()
@@ -2,29 +2,254 @@ from __future__ import annotations
 
 import logging
 import multiprocessing
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
 from multiprocessing.sharedctypes import Synchronized
-from typing import TYPE_CHECKING, Callable, cast
+from typing import TYPE_CHECKING, Any, NamedTuple, cast
 
-from pyhgtmap import BBox
-from pyhgtmap.hgt.file import HgtFile
-from pyhgtmap.output.factory import get_osm_output
+from pyhgtmap import BBox, profiling, timing, tracing
+from pyhgtmap.hgt.file import HgtFile, get_file_nb_points
+from pyhgtmap.hgt.manifest import (
+    TILE_DONE,
+    TILE_FAILED,
+    JobManifest,
+    TileRecord,
+    make_manifest_filename,
+    options_fingerprint,
+)
+from pyhgtmap.hgt.scheduler import (
+    MemoryAdmissionController,
+    TileCostFeatures,
+    TileCostModel,
+    TileMemoryFeatures,
+    get_peak_rss,
+    lpt_order,
+    reset_peak_rss,
+)
+from pyhgtmap.hgt.shared import SharedTile, attach_tile, release_tile, share_tile
+from pyhgtmap.logger import configure_logging
+from pyhgtmap.output.factory import get_osm_output, make_osm_filename
+from pyhgtmap.timing import TimingsRecorder
 
 if TYPE_CHECKING:
-    from multiprocessing.context import ForkProcess
+    from collections.abc import Callable, Iterator
+    from contextlib import AbstractContextManager
 
     from pyhgtmap.configuration import Configuration
-    from pyhgtmap.hgt.tile import HgtTile
+    from pyhgtmap.hgt.tile import HgtTile, TileContours
     from pyhgtmap.output import Output
 
 logger = logging.getLogger(__name__)
 
+# Approximate memory used per point of a loaded file: int16 elevation, void mask
+# and polygon mask
+LOADED_BYTES_PER_POINT = 4
+
+# Max number of times a tile is submitted to workers, when workers processing it
+# die abruptly; it's reported as failed afterwards
+MAX_TILE_ATTEMPTS = 2
+
+
+class TileResult(NamedTuple):
+    """Outcome of a tile processing, as reported by workers."""
+
+    file_name: str
+    # Tile description
+    tile: str
+    nb_nodes: int
+    nb_ways: int
+    # Formatted exception, if processing failed
+    error: str | None = None
+    # Contours computed by a worker, to be written by the parent process
+    contours: TileContours | None = None
+    # Time spent by the worker computing contours, in seconds
+    duration: float = 0.0
+    # Peak memory increase of the worker while computing contours, in bytes (0 if
+    # unknown)
+    peak_memory: int = 0
+    # Durations per processing stage, if timings are enabled
+    stages: dict[str, float] | None = None
+    # Trace events recorded by the worker, if tracing is enabled
+    trace_events: list[dict[str, Any]] | None = None
+    # Profile of the tile processing in the worker, if profiling is enabled
+    profile: profiling.TileProfile | None = None
+
+
+class PendingTile(NamedTuple):
+    """Tile whose contours are being computed by a worker."""
+
+    file_name: str
+    # Tile description
+    tile_name: str
+    bounding_box: BBox
+    # Shared memory segment holding tile's data, and its descriptor
+    segment: shared_memory.SharedMemory | None
+    shared_tile: SharedTile | None
+    features: TileCostFeatures
+    memory_features: TileMemoryFeatures | None
+    # None if not submitted (yet or again) to workers
+    future: Future[TileResult] | None
+    # Record of the tile if completed by a previous run (not processed again)
+    record: TileRecord | None = None
+    # Number of times the tile was submitted to workers
+    attempts: int = 0
+
+    def done(self) -> bool:
+        return self.future is None or self.future.done()
+
+
+def is_lost(future: Future | None) -> bool:
+    """Return true if the task was lost with a worker process which died abruptly."""
+    return (
+        future is not None
+        and future.done()
+        and not future.cancelled()
+        and isinstance(future.exception(), BrokenProcessPool)
+    )
+
+
+# Processor of the current worker process, see init_worker()
+_worker_processor: HgtFilesProcessor | None = None
+
+
+def init_worker(options: Configuration) -> None:
+    """Initialize a worker process of the pool.
+
+    The processor is kept for the whole life of the worker, along with imported
+    modules and caches.
+    """
+    global _worker_processor
+    if multiprocessing.get_start_method() != "fork":
+        # Fresh interpreter: logging isn't inherited from parent process
+        configure_logging(options.logLevel)
+    _worker_processor = HgtFilesProcessor(1, 0, 0, options)
+    if options.trace_file:
+        tracing.start_tracing("worker")
+
+
+def get_worker_processor() -> HgtFilesProcessor:
+    if _worker_processor is None:
+        raise RuntimeError("Worker process not initialized")
+    return _worker_processor
+
+
+def compute_contours_in_worker(file_name: str, shared_tile: SharedTile) -> TileResult:
+    """Compute contours of a single tile in a worker process, leaving IDs allocation
+    (and writing in single output mode) to the parent process.
+    """
+    processor = get_worker_processor()
+    with (
+        tracing.span(
+            "compute tile", "tile", file=file_name, tile=str(shared_tile.tile)
+        ),
+        processor.profiled_scope() as profiler,
+    ):
+        result = _compute_contours_in_worker(file_name, shared_tile)
+    return result._replace(
+        trace_events=tracing.drain_events(),
+        profile=profiler.profile if profiler is not None else None,
+    )
+
+
+def _compute_contours_in_worker(file_name: str, shared_tile: SharedTile) -> TileResult:
+    segment, tile = attach_tile(shared_tile)
+    processor = get_worker_processor()
+    start_rss = reset_peak_rss()
+    start_time = time.perf_counter()
+    try:
+        with timing.timed_scope(processor.timings_enabled) as timer:
+            tile_contours = processor.compute_contours(tile)
+    except ValueError:  # tiles with the same value on every element
+        logger.warning("Discarding invalid tile %s", tile)
+        return TileResult(file_name, str(tile), 0, 0)
+    except Exception:
+        return TileResult(file_name, str(tile), 0, 0, traceback.format_exc())
+    finally:
+        release_tile(segment, tile)
+    duration = time.perf_counter() - start_time
+    peak_rss = get_peak_rss()
+    return TileResult(
+        file_name,
+        str(tile),
+        tile_contours.nb_nodes,
+        tile_contours.nb_ways,
+        contours=tile_contours,
+        duration=duration,
+        peak_memory=(
+            peak_rss - start_rss
+            if peak_rss is not None and start_rss is not None
+            else 0
+        ),
+        stages=timer.durations if timer is not None else None,
+    )
+
+
+def write_contours_in_worker(
+    file_name: str,
+    tile_name: str,
+    bounding_box: BBox,
+    tile_contours: TileContours,
+    node_start_id: int,
+    way_start_id: int,
+    stages: dict[str, float] | None = None,
+) -> TileResult:
+    """Write contours of a single tile, with IDs allocated by the parent process,
+    in a worker process.
+
+    Durations of the stages already run for this tile (if any) are reported along
+    with the writing ones.
+    """
+    processor = get_worker_processor()
+    try:
+        with (
+            timing.timed_scope(stages is not None) as timer,
+            tracing.span("write tile", "tile", file=file_name, tile=tile_name),
+            processor.profiled_scope() as profiler,
+        ):
+            result = processor.write_contours(
+                file_name,
+                tile_name,
+                bounding_box,
+                tile_contours,
+                node_start_id,
+                way_start_id,
+            )
+    except Exception:
+        result = TileResult(file_name, tile_name, 0, 0, traceback.format_exc())
+    else:
+        if timer is not None and stages is not None:
+            timer.update(stages)
+            result = result._replace(stages=timer.durations)
+    return result._replace(
+        trace_events=tracing.drain_events(),
+        profile=profiler.profile if profiler is not None else None,
+    )
+
 
 class HgtFilesProcessor:
     """
     Generate contour files from HGT (or Geotiff) files.
     One file per tile (part of input file) is generated, ensuring there's no duplicate node nor way ID
     in the output files.
-    Process can be parallelized per tile to benefit from multiple cores CPU.
+    Process can be parallelized per tile to benefit from multiple cores CPU; in single
+    output mode, only contours computation is parallelized, the parent process being
+    the sole writer.
+    IDs are allocated in tiles order, so that results don't depend on parallelization.
+    Tiles are collected in a window (across files), and dispatched to workers largest
+    first, so that a big tile doesn't end up being processed alone at the end; the
+    estimated memory of tiles being processed may be bounded by a budget.
     """
 
     def __init__(
@@ -50,15 +275,75 @@ class HgtFilesProcessor:
             Synchronized,
             multiprocessing.Value("L", way_start_id),
         )
-        self.available_children = multiprocessing.Semaphore(nb_jobs)
+        self.nb_jobs = nb_jobs
         self.parallel: bool = nb_jobs > 1
-        # Not joined yet children
-        self.active_children: list[ForkProcess] = []
-        # Errors raised by previously joined children
-        self.children_errors: list[tuple[int, int]] = []
+        # Persistent pool of worker processes, started on first parallel tile
+        self.executor: ProcessPoolExecutor | None = None
+        # Tiles waiting to be dispatched to workers, in tiles order
+        self.scheduled_tiles: list[tuple[str, HgtTile]] = []
+        self.schedule_window: int = options.schedule_window or 2 * nb_jobs
+        # Estimation of tiles processing time, refined with workers measures
+        self.cost_model = TileCostModel()
+        self.memory_controller = MemoryAdmissionController(
+            options.memory_budget * 1024 * 1024
+        )
+        # Tiles whose contours are being computed by workers, in tiles order
+        self.pending_contours: deque[PendingTile] = deque()
+        # Tiles being written by workers, with their file name, description,
+        # bounding box and allocated IDs (to be recorded in the manifest)
+        self.pending_tiles: dict[
+            Future[TileResult], tuple[str, str, BBox, int, int, int, int]
+        ] = {}
+        # Manifest of processed tiles, in multiple outputs mode
+        self.manifest: JobManifest | None = None
+        # Results of tiles which failed
+        self.tiles_errors: list[TileResult] = []
         self.options: Configuration = options
         # Common output file used in single output mode
         self.common_osm_output: Output | None = None
+        # Names of the files processed
+        self.input_files: list[str] = []
+        # Recorder of stages durations, if enabled (parent process only)
+        self.timings: TimingsRecorder | None = None
+        self.profiles: profiling.ProfileRecorder | None = None
+
+    def profiled_scope(self) -> AbstractContextManager[profiling.TileProfiler | None]:
+        """Profile the block if profiling is enabled."""
+        return profiling.profiled_scope(
+            bool(self.options.profile_file), self.options.profile_memory
+        )
+
+    def record_profile(
+        self, result: TileResult, profiler: profiling.TileProfiler | None
+    ) -> None:
+        """Merge the profile of a tile processed in this process or in a worker."""
+        profile = profiler.profile if profiler is not None else result.profile
+        if self.profiles is not None and profile is not None:
+            self.profiles.record(f"{result.tile} of {result.file_name}", profile)
+
+    @property
+    def timings_enabled(self) -> bool:
+        return bool(self.options.timings_file)
+
+    def record_timings(
+        self,
+        durations: dict[str, float] | None,
+        kind: str = "tile",
+        **fields,
+    ) -> None:
+        """Record the stages durations of a file or tile (if timings are enabled)."""
+        if self.timings is not None and durations is not None:
+            self.timings.record(kind, durations, **fields)
+
+    def record_tile_timings(self, result: TileResult, bounding_box: BBox) -> None:
+        self.record_timings(
+            result.stages,
+            file=result.file_name,
+            tile=result.tile,
+            bbox=list(bounding_box),
+            nb_nodes=result.nb_nodes,
+            nb_ways=result.nb_ways,
+        )
 
     @property
     def single_output(self) -> bool:
@@ -111,148 +396,663 @@ class HgtFilesProcessor:
             counter.value += inc_value
         return previous_value
 
-    def process_tile_internal(self, file_name: str, tile: HgtTile) -> None:
-        """Process a single output tile."""
-        logger.debug("process_tile %s", tile)
-        try:
-            # Compute contours
-            tile_contours = tile.get_contours(
-                step_cont=int(self.options.contourStepSize),
-                max_nodes_per_way=self.options.maxNodesPerWay,
-                no_zero=self.options.noZero,
-                rdp_epsilon=self.options.rdpEpsilon,
-            )
+    def compute_contours(self, tile: HgtTile) -> TileContours:
+        """Compute contours of a single tile, according to options."""
+        return tile.get_contours(
+            step_cont=int(self.options.contourStepSize),
+            max_nodes_per_way=self.options.maxNodesPerWay,
+            no_zero=self.options.noZero,
+            rdp_epsilon=self.options.rdpEpsilon,
+        )
 
-            if not tile_contours.nb_nodes:
-                logger.info("%s doesn't contain any node, skipping.", tile)
-                return
+    def allocate_ids(self, tile_contours: TileContours) -> tuple[int, int]:
+        """Allocate nodes and ways IDs ranges for the contours of a tile.
 
-            # Update counters shared among parallel processes
-            # This is the actual critical section, to avoid duplicated node IDs
-            logger.debug("Pending next_node_id_lock")
-            tile_node_start_id: int = self.get_and_inc_counter(
-                self.next_node_id,
-                tile_contours.nb_nodes,
-            )
-            tile_way_start_id: int = self.get_and_inc_counter(
-                self.next_way_id,
-                tile_contours.nb_ways,
-            )
+        IDs are always allocated by the parent process, in tiles order, so that
+        runs are reproducible whatever the parallelization.
 
-            # Writing nodes to output is the most time & resources consuming part
-            osm_output = self.get_osm_output(
-                [
-                    file_name,
-                ],
-                tile.bbox(),
-            )
-            logger.debug("writeNodes")
+        Returns:
+            tuple[int, int]: first node ID and first way ID
+        """
+        tile_node_start_id: int = self.get_and_inc_counter(
+            self.next_node_id,
+            tile_contours.nb_nodes,
+        )
+        tile_way_start_id: int = self.get_and_inc_counter(
+            self.next_way_id,
+            tile_contours.nb_ways,
+        )
+        return tile_node_start_id, tile_way_start_id
+
+    def write_contours(
+        self,
+        file_name: str,
+        tile_name: str,
+        bounding_box: BBox,
+        tile_contours: TileContours,
+        tile_node_start_id: int,
+        tile_way_start_id: int,
+    ) -> TileResult:
+        """Write the contours of a single tile, with already allocated IDs."""
+        # Writing nodes to output is the most time & resources consuming part
+        osm_output = self.get_osm_output(
+            [
+                file_name,
+            ],
+            bounding_box,
+        )
+        logger.debug("writeNodes")
+        with timing.stage(timing.NODE_WRITE):
             new_start_id, ways = osm_output.write_nodes(
                 tile_contours,
                 osm_output.timestampString,
                 tile_node_start_id,
                 self.options.osmVersion,
             )
-            logger.debug("writeWays")
+        logger.debug("writeWays")
+        with timing.stage(timing.WAY_WRITE):
             osm_output.write_ways(ways, tile_way_start_id)
-            if not self.single_output:
-                # In single output mode, file will be finalized at the very end
-                logger.debug("done")
+        if not self.single_output:
+            # In single output mode, file will be finalized at the very end
+            logger.debug("done")
+            with timing.stage(timing.FINALIZE):
                 osm_output.done()
 
-            if new_start_id != tile_node_start_id + tile_contours.nb_nodes:
-                logger.warning(
-                    "new_start_id mismatch! new_start_id: %d - tile_node_start_id: %d",
-                    new_start_id,
-                    tile_node_start_id + tile_contours.nb_nodes,
-                )
-            if len(ways) != tile_contours.nb_ways:
-                logger.warning(
-                    "tile_way_start_id mismatch! len(ways): %d - tile_way_start_id: %d",
-                    len(ways),
-                    tile_way_start_id,
-                )
-        except ValueError:  # tiles with the same value on every element
-            logger.warning("Discarding invalid tile %s", tile)
+        if new_start_id != tile_node_start_id + tile_contours.nb_nodes:
+            logger.warning(
+                "new_start_id mismatch! new_start_id: %d - tile_node_start_id: %d",
+                new_start_id,
+                tile_node_start_id + tile_contours.nb_nodes,
+            )
+        if len(ways) != tile_contours.nb_ways:
+            logger.warning(
+                "tile_way_start_id mismatch! len(ways): %d - tile_way_start_id: %d",
+                len(ways),
+                tile_way_start_id,
+            )
+        return TileResult(
+            file_name, tile_name, tile_contours.nb_nodes, tile_contours.nb_ways
+        )
+
+    def write_tile(
+        self,
+        file_name: str,
+        tile_name: str,
+        bounding_box: BBox,
+        tile_contours: TileContours,
+    ) -> TileResult:
+        """Allocate IDs for and write the contours of a single tile."""
+        if not tile_contours.nb_nodes:
+            logger.info("%s doesn't contain any node, skipping.", tile_name)
+            self.record_tile(file_name, bounding_box, TILE_DONE)
+            return TileResult(file_name, tile_name, 0, 0)
+        tile_node_start_id, tile_way_start_id = self.allocate_ids(tile_contours)
+        result = self.write_contours(
+            file_name,
+            tile_name,
+            bounding_box,
+            tile_contours,
+            tile_node_start_id,
+            tile_way_start_id,
+        )
+        self.record_tile(
+            file_name,
+            bounding_box,
+            TILE_DONE,
+            tile_node_start_id,
+            tile_contours.nb_nodes,
+            tile_way_start_id,
+            tile_contours.nb_ways,
+        )
+        return result
+
+    def record_tile(
+        self,
+        file_name: str,
+        bounding_box: BBox,
+        state: str,
+        node_start_id: int = 0,
+        nb_nodes: int = 0,
+        way_start_id: int = 0,
+        nb_ways: int = 0,
+    ) -> None:
+        """Record the outcome of a tile in the manifest (if any)."""
+        if self.manifest is None:
+            return
+        self.manifest.record(
+            file_name,
+            bounding_box,
+            state,
+            (
+                make_osm_filename(bounding_box, self.options, [file_name])
+                if nb_nodes
+                else None
+            ),
+            node_start_id,
+            nb_nodes,
+            way_start_id,
+            nb_ways,
+        )
 
-    def run_in_child(self, func: Callable, *args) -> None:
+    def get_completed_tile(
+        self, file_name: str, bounding_box: BBox
+    ) -> TileRecord | None:
+        """Return the record of a tile completed by a previous run, when resuming."""
+        if self.manifest is None:
+            return None
+        return self.manifest.completed_tile(file_name, bounding_box)
+
+    def skip_tile(self, record: TileRecord) -> None:
+        """Skip a tile completed by a previous run, reserving the same IDs (unless
+        in incremental mode, where IDs are allocated after the reused ones).
         """
-        Basic wrapper function ensuring the available_children semaphore is properly released.
+        logger.info(
+            "Skipping tile %s of %s, completed by previous run",
+            record.bbox,
+            record.input_file,
+        )
+        if not record.nb_nodes or self.options.incremental:
+            return
+        tile_node_start_id = self.get_and_inc_counter(
+            self.next_node_id, record.nb_nodes
+        )
+        tile_way_start_id = self.get_and_inc_counter(self.next_way_id, record.nb_ways)
+        if (tile_node_start_id, tile_way_start_id) != (
+            record.node_start_id,
+            record.way_start_id,
+        ):
+            logger.warning(
+                "IDs mismatch for tile %s of %s: allocated %d/%d, previous run %d/%d",
+                record.bbox,
+                record.input_file,
+                tile_node_start_id,
+                tile_way_start_id,
+                record.node_start_id,
+                record.way_start_id,
+            )
+
+    def process_tile_internal(self, file_name: str, tile: HgtTile) -> TileResult:
+        """Process a single output tile."""
+        logger.debug("process_tile %s", tile)
+        bounding_box = tile.bbox()
+        with (
+            timing.timed_scope(self.timings_enabled) as timer,
+            tracing.span("process tile", "tile", file=file_name, tile=str(tile)),
+            self.profiled_scope() as profiler,
+        ):
+            try:
+                result = self.write_tile(
+                    file_name, str(tile), bounding_box, self.compute_contours(tile)
+                )
+            except ValueError:  # tiles with the same value on every element
+                logger.warning("Discarding invalid tile %s", tile)
+                self.record_tile(file_name, bounding_box, TILE_DONE)
+                result = TileResult(file_name, str(tile), 0, 0)
+        self.record_profile(result, profiler)
+        if timer is not None:
+            result = result._replace(stages=timer.durations)
+            self.record_tile_timings(result, bounding_box)
+        return result
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """Return the pool of worker processes, starting it on first call."""
+        if self.executor is None:
+            # Tiles data are handed over through shared memory, so any start method
+            # works; "fork" is unsafe with threads (eg. GDAL's or prefetching ones)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.nb_jobs,
+                mp_context=multiprocessing.get_context(self.options.start_method),
+                initializer=init_worker,
+                initargs=(self.options,),
+            )
+        return self.executor
+
+    def submit(self, function: Callable[..., TileResult], *args) -> Future[TileResult]:
+        """Submit a task to the pool of worker processes.
+
+        The abrupt death of a worker (eg. killed by OOM killer) breaks the whole pool,
+        failing all its pending tasks: it's then replaced by a fresh one.
         """
         try:
-            func(*args)
-        except Exception as e:
-            logger.error("Exception caught in child process: %s", e)
-            raise e
-        finally:
-            self.available_children.release()
+            return self.get_executor().submit(function, *args)
+        except BrokenProcessPool:
+            self.requeue_lost_tiles()
+            return self.get_executor().submit(function, *args)
+
+    def requeue_lost_tiles(self) -> None:
+        """Recover from the abrupt death of a worker, which broke the pool.
+
+        It's most likely due to the OOM killer: fewer tiles are then processed
+        concurrently, and the tiles lost with the pool are requeued, to be submitted
+        again to a fresh pool (up to MAX_TILE_ATTEMPTS times).
+        """
+        logger.warning("A worker process died abruptly, restarting workers")
+        # Ensure all tasks of the broken pool are marked as failed
+        self.shutdown_executor()
+        lost = [
+            index
+            for index, pending in enumerate(self.pending_contours)
+            if is_lost(pending.future)
+        ]
+        if not lost:
+            return
+        self.memory_controller.lower_concurrency(len(lost))
+        logger.warning(
+            "Requeuing %d tile(s), processing up to %d tile(s) concurrently",
+            len(lost),
+            self.memory_controller.max_in_flight,
+        )
+        for index in lost:
+            pending = self.pending_contours[index]
+            self.memory_controller.release(cast(Future, pending.future))
+            if pending.attempts < MAX_TILE_ATTEMPTS:
+                self.pending_contours[index] = pending._replace(future=None)
+
+    def submit_pending_tile(self, index: int) -> None:
+        """Submit the contours computation of a pending tile to workers."""
+        pending = self.pending_contours[index]
+        future = self.submit(
+            compute_contours_in_worker, pending.file_name, pending.shared_tile
+        )
+        self.memory_controller.admit(
+            future, cast(TileMemoryFeatures, pending.memory_features)
+        )
+        self.pending_contours[index] = pending._replace(
+            future=future, attempts=pending.attempts + 1
+        )
+
+    def shutdown_executor(self) -> None:
+        """Stop the pool of worker processes (if started), cancelling tasks not
+        started yet.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def discard_pending_tiles(self) -> None:
+        """Drop tiles not written yet, releasing their shared memory segments."""
+        while self.pending_contours:
+            segment = self.pending_contours.popleft().segment
+            if segment is not None:
+                segment.close()
+                segment.unlink()
 
     def process_tile(self, file_name: str, tile: HgtTile) -> None:
-        """Process given tile, in a dedicated process if parallelization is enabled.
+        """Process given tile, in a worker process if parallelization is enabled.
 
         Args:
             file_name (str): original file name (used for output file name generation)
             tile (hgt.hgtTile): tile to process
         """
-        if self.parallel and not self.single_output:
-            # Fork into a child process when available
-            self.available_children.acquire()
-            # Ensure "fork" method is used to share parent's process context
-            ctx = multiprocessing.get_context("fork")
-            p = ctx.Process(
-                target=self.run_in_child,
-                args=(self.process_tile_internal, file_name, tile),
-            )
-            self.active_children.append(p)
-            p.start()
-            # Try to progressively clean some done children
-            self.join_children(skip_active=True)
+        if self.parallel:
+            # Contours are computed by workers; IDs are then allocated by the parent
+            # process in tiles order, and contours written either by workers, or by
+            # the parent in single output mode (being the sole writer)
+            self.scheduled_tiles.append((file_name, tile))
+            if len(self.scheduled_tiles) >= self.schedule_window:
+                self.dispatch_tiles()
+            # Bound the number of queued tiles, to avoid keeping too much data in
+            # memory when tiles are produced faster than they're processed
+            while self.pending_contours and (
+                self.pending_contours[0].done()
+                or len(self.pending_contours) > self.schedule_window
+            ):
+                self.write_next_computed_tile()
         else:
-            # Process tile in current process
-            self.process_tile_internal(file_name, tile)
+            record = self.get_completed_tile(file_name, tile.bbox())
+            if record is not None:
+                self.skip_tile(record)
+            else:
+                # Process tile in current process
+                self.process_tile_internal(file_name, tile)
+
+    def release_tile_memory(self, future: Future[TileResult]) -> None:
+        """Release the memory admitted for a processed tile."""
+        self.memory_controller.release(
+            future,
+            0 if future.exception() is not None else future.result().peak_memory,
+        )
 
-    def process_file(self, file_name: str, check_poly: bool) -> None:
-        """Process given file, parallelizing tiles processing if enabled.
+    def wait_for_tile_memory(self) -> None:
+        """Wait for at least one tile being processed to complete."""
+        logger.debug(
+            "Waiting for memory; estimated usage: %d MiB",
+            self.memory_controller.used // 2**20,
+        )
+        with tracing.span("wait for memory", "wait"):
+            done, _ = wait(
+                self.memory_controller.in_flight, return_when=FIRST_COMPLETED
+            )
+        for future in done:
+            self.release_tile_memory(future)
+        if any(is_lost(future) for future in done):
+            self.requeue_lost_tiles()
+
+    def dispatch_tiles(self) -> None:
+        with tracing.span(
+            "dispatch tiles", "schedule", nb_tiles=len(self.scheduled_tiles)
+        ):
+            self._dispatch_tiles()
+
+    def _dispatch_tiles(self) -> None:
+        """Submit scheduled tiles to workers, in decreasing estimated cost order
+        (Longest Processing Time first).
+
+        When the estimated memory of a tile doesn't fit in the budget, next smaller
+        tiles which do fit are submitted first; if none fits, wait for tiles being
+        processed to complete.
+        Tiles are still queued for writing in tiles order, so that IDs allocation
+        doesn't depend on the scheduling. Tiles completed by a previous run are
+        not submitted, but still queued to reserve their IDs.
+        """
+        bounding_boxes = [tile.bbox() for _, tile in self.scheduled_tiles]
+        records = [
+            self.get_completed_tile(file_name, bounding_box)
+            for (file_name, _), bounding_box in zip(
+                self.scheduled_tiles, bounding_boxes
+            )
+        ]
+        tiles_features = [
+            TileCostFeatures.from_tile(tile) for _, tile in self.scheduled_tiles
+        ]
+        step_cont = int(self.options.contourStepSize)
+        memory_features = [
+            TileMemoryFeatures.from_tile(tile, step_cont)
+            for _, tile in self.scheduled_tiles
+        ]
+        first_index = len(self.pending_contours)
+        for (file_name, tile), bounding_box, features, tile_memory, record in zip(
+            self.scheduled_tiles,
+            bounding_boxes,
+            tiles_features,
+            memory_features,
+            records,
+        ):
+            self.pending_contours.append(
+                PendingTile(
+                    file_name,
+                    str(tile),
+                    bounding_box,
+                    None,
+                    None,
+                    features,
+                    tile_memory,
+                    None,
+                    record,
+                )
+            )
+        remaining = [
+            index
+            for index in lpt_order(
+                [self.cost_model.estimate(features) for features in tiles_features]
+            )
+            if records[index] is None
+        ]
+        while remaining:
+            index = next(
+                (
+                    index
+                    for index in remaining
+                    if self.memory_controller.can_admit(
+                        self.memory_controller.estimate(memory_features[index])
+                    )
+                ),
+                None,
+            )
+            if index is None:
+                self.wait_for_tile_memory()
+                continue
+            remaining.remove(index)
+            segment, shared_tile = share_tile(self.scheduled_tiles[index][1])
+            pending_index = first_index + index
+            self.pending_contours[pending_index] = self.pending_contours[
+                pending_index
+            ]._replace(segment=segment, shared_tile=shared_tile)
+            self.submit_pending_tile(pending_index)
+        self.scheduled_tiles = []
+
+    def load_file(self, file_name: str, check_poly: bool) -> list[HgtTile]:
+        """Load given file and build its tiles.
 
         Args:
             file_name (str): original file name
             check_poly (bool): whether polygons must be checked
-            options (_type_): processing options
+
+        Returns:
+            list[HgtTile]: tiles of the file
         """
-        logger.debug("process_file %s", file_name)
-        hgt_file = HgtFile(
-            file_name,
-            self.options.srtmCorrx,
-            self.options.srtmCorry,
-            self.options.polygon,
-            check_poly,
-            self.options.voidMax,
-            self.options.contourFeet,
-            self.options.smooth_ratio,
-        )
-        hgt_tiles = hgt_file.make_tiles(self.options)
+        logger.debug("load_file %s", file_name)
+        with (
+            timing.timed_scope(self.timings_enabled) as timer,
+            tracing.span("load file", "file", file=file_name),
+        ):
+            hgt_file = HgtFile(
+                file_name,
+                self.options.srtmCorrx,
+                self.options.srtmCorry,
+                self.options.polygon,
+                check_poly,
+                self.options.voidMax,
+                self.options.contourFeet,
+                self.options.smooth_ratio,
+                self.options.smooth_block_size,
+                self.options.nJobs,
+            )
+            hgt_tiles = hgt_file.make_tiles(self.options)
+        if timer is not None:
+            self.record_timings(
+                timer.durations, "file", file=file_name, nb_tiles=len(hgt_tiles)
+            )
         logger.debug("Tiles built; nb tiles: %d", len(hgt_tiles))
         for tile in hgt_tiles:
             logger.debug("  %s", tile.get_stats())
+        return hgt_tiles
 
-        for tile in hgt_tiles:
-            self.process_tile(file_name, tile)
+    def estimate_file_memory(self, file_name: str) -> int:
+        """Estimate the memory (in bytes) used by a loaded file."""
+        return int(
+            get_file_nb_points(file_name)
+            * self.options.smooth_ratio**2
+            * LOADED_BYTES_PER_POINT
+        )
+
+    def load_files(
+        self, files: list[tuple[str, bool]]
+    ) -> Iterator[tuple[str, list[HgtTile]]]:
+        """Load files and build their tiles, in order.
 
-    def join_children(self, skip_active=False) -> None:
+        Next files (up to options.prefetch_files) are loaded in background threads
+        while the tiles of the current one are being processed, so that workers
+        don't starve between files. The estimated memory of files being prefetched
+        is bounded by options.prefetch_memory (MiB); at least one file is always
+        loaded though.
+
+        Yields:
+            Iterator[tuple[str, list[HgtTile]]]: file name and its tiles
         """
-        Join all/finished children.
-        Call regularly to avoid open file (pipes) exhaustion when spawning
-        many processes for big datasets.
+        if self.options.prefetch_files <= 0:
+            for file_name, check_poly in files:
+                yield file_name, self.load_file(file_name, check_poly)
+            return
+
+        memory_budget: int = self.options.prefetch_memory * 1024 * 1024
+        # Files being loaded: name, estimated memory and loading task
+        loading: deque[tuple[str, int, Future[list[HgtTile]]]] = deque()
+        files_iter = iter(files)
+        next_file = next(files_iter, None)
+        with ThreadPoolExecutor(
+            max_workers=self.options.prefetch_files,
+            thread_name_prefix="prefetch",
+        ) as executor:
+            while loading or next_file is not None:
+                # Current file + prefetched ones
+                while (
+                    next_file is not None
+                    and len(loading) <= self.options.prefetch_files
+                ):
+                    file_memory = self.estimate_file_memory(next_file[0])
+                    if (
+                        loading
+                        and sum(loaded[1] for loaded in loading) + file_memory
+                        > memory_budget
+                    ):
+                        break
+                    loading.append(
+                        (
+                            next_file[0],
+                            file_memory,
+                            executor.submit(self.load_file, *next_file),
+                        )
+                    )
+                    next_file = next(files_iter, None)
+                file_name, _, future = loading.popleft()
+                with tracing.span("wait for file", "wait", file=file_name):
+                    hgt_tiles = future.result()
+                yield file_name, hgt_tiles
+
+    def get_result(
+        self, future: Future[TileResult], file_name: str, tile_name: str
+    ) -> TileResult:
+        """Wait for the result of a tile processed by a worker, recording errors."""
+        try:
+            result = future.result()
+        except Exception as e:
+            # Worker process died (eg. killed by OOM killer), breaking the pool
+            result = TileResult(file_name, tile_name, 0, 0, repr(e))
+        tracing.add_events(result.trace_events)
+        self.record_profile(result, None)
+        logger.debug(
+            "Tile processed: %s of %s; nodes: %d, ways: %d",
+            result.tile,
+            result.file_name,
+            result.nb_nodes,
+            result.nb_ways,
+        )
+        if result.error is not None:
+            logger.error(
+                "Exception caught in worker process for %s of %s:\n%s",
+                result.tile,
+                result.file_name,
+                result.error,
+            )
+            self.tiles_errors.append(result)
+        return result
+
+    def collect_results(self, wait_all: bool) -> None:
+        """Wait for (all or at least one of) pending tiles and record errors."""
+        with tracing.span("wait for writers", "wait"):
+            done, _ = wait(
+                self.pending_tiles,
+                return_when=ALL_COMPLETED if wait_all else FIRST_COMPLETED,
+            )
+        for future in done:
+            file_name, tile_name, bounding_box, *ids = self.pending_tiles.pop(future)
+            result = self.get_result(future, file_name, tile_name)
+            self.record_tile_timings(result, bounding_box)
+            self.record_tile(
+                file_name,
+                bounding_box,
+                TILE_DONE if result.error is None else TILE_FAILED,
+                *ids,
+            )
+
+    def wait_for_contours(self) -> None:
+        """Wait for the contours computation of the oldest pending tile to complete,
+        submitting it (again) to workers if needed.
         """
-        for p in self.active_children:
-            if skip_active and p.is_alive():
+        while True:
+            pending = self.pending_contours[0]
+            if pending.future is None:
+                # Tile lost with a worker which died abruptly
+                estimate = self.memory_controller.estimate(
+                    cast(TileMemoryFeatures, pending.memory_features)
+                )
+                while not self.memory_controller.can_admit(estimate):
+                    self.wait_for_tile_memory()
+                self.submit_pending_tile(0)
                 continue
-            # Wait for child to finish and check return code
-            p.join()
-            logger.debug("Joined child process %d", p.pid)
-            if p.exitcode and p.pid:
-                self.children_errors.append((p.pid, p.exitcode))
-            self.active_children.remove(p)
+            with tracing.span("wait for contours", "wait", file=pending.file_name):
+                wait([pending.future])
+            if not is_lost(pending.future) or pending.attempts >= MAX_TILE_ATTEMPTS:
+                return
+            self.requeue_lost_tiles()
+
+    def write_next_computed_tile(self) -> None:
+        """Wait for the contours of the oldest pending tile, allocate its IDs and
+        write it (or have it written by a worker).
+        """
+        if self.pending_contours[0].record is None:
+            self.wait_for_contours()
+        pending = self.pending_contours.popleft()
+        if pending.record is not None:
+            self.skip_tile(pending.record)
+            return
+        file_name, bounding_box = pending.file_name, pending.bounding_box
+        future = cast(Future, pending.future)
+        segment = cast(shared_memory.SharedMemory, pending.segment)
+        result = self.get_result(future, file_name, pending.tile_name)
+        self.release_tile_memory(future)
+        segment.close()
+        segment.unlink()
+        if result.contours is None:
+            self.record_tile(
+                file_name,
+                bounding_box,
+                TILE_DONE if result.error is None else TILE_FAILED,
+            )
+            return
+        self.cost_model.update(pending.features, result.duration)
+        if not result.contours.nb_nodes:
+            logger.info("%s doesn't contain any node, skipping.", result.tile)
+            self.record_tile(file_name, bounding_box, TILE_DONE)
+            self.record_tile_timings(result, bounding_box)
+            return
+        tile_node_start_id, tile_way_start_id = self.allocate_ids(result.contours)
+        if self.single_output:
+            with (
+                timing.timed_scope(self.timings_enabled) as timer,
+                tracing.span(
+                    "write tile", "tile", file=result.file_name, tile=result.tile
+                ),
+                self.profiled_scope() as profiler,
+            ):
+                self.write_contours(
+                    result.file_name,
+                    result.tile,
+                    bounding_box,
+                    result.contours,
+                    tile_node_start_id,
+                    tile_way_start_id,
+                )
+            self.record_profile(result, profiler)
+            if timer is not None:
+                timer.update(result.stages or {})
+                self.record_tile_timings(
+                    result._replace(stages=timer.durations), bounding_box
+                )
+        else:
+            while len(self.pending_tiles) >= 2 * self.nb_jobs:
+                self.collect_results(wait_all=False)
+            self.pending_tiles[
+                self.submit(
+                    write_contours_in_worker,
+                    result.file_name,
+                    result.tile,
+                    bounding_box,
+                    result.contours,
+                    tile_node_start_id,
+                    tile_way_start_id,
+                    result.stages,
+                )
+            ] = (
+                file_name,
+                result.tile,
+                bounding_box,
+                tile_node_start_id,
+                result.contours.nb_nodes,
+                tile_way_start_id,
+                result.contours.nb_ways,
+            )
 
     def process_files(self, files: list[tuple[str, bool]]) -> None:
         """Main entry point of this class, processing a bunch of HGT files.
@@ -260,6 +1060,14 @@ class HgtFilesProcessor:
         Args:
             files (List[Tuple[str, bool]]): List of [source file name, check poly toggle]
         """
+        self.input_files = [file_tuple[0] for file_tuple in files]
+        if self.options.trace_file:
+            tracing.start_tracing("main")
+        start_time = tracing.now_us()
+        if self.options.timings_file:
+            self.timings = TimingsRecorder(self.options.timings_file)
+        if self.options.profile_file:
+            self.profiles = profiling.ProfileRecorder(self.options.profile_file)
         if self.single_output:
             # Initialize common OSM output
             if not self.options.area:
@@ -271,56 +1079,103 @@ class HgtFilesProcessor:
                     [float(b) for b in self.options.area.split(":")],
                 ),
             )
+            if self.options.resume or self.options.incremental:
+                logger.warning(
+                    "Resuming or incremental processing is not supported in single"
+                    " output mode"
+                )
+        elif self.options.resume or self.options.incremental:
+            self.manifest = JobManifest(
+                make_manifest_filename(self.options),
+                options_fingerprint(self.options),
+                reuse=True,
+            )
+        if self.manifest is not None and self.options.incremental:
+            # Regenerated tiles may have a different number of nodes and ways than
+            # previously: allocate their IDs after the ones of reused tiles, to avoid
+            # any overlap
+            for counter, next_id in zip(
+                (self.next_node_id, self.next_way_id), self.manifest.next_ids()
+            ):
+                with counter.get_lock():
+                    counter.value = max(counter.value, next_id)
+            files_to_load = [
+                file_tuple
+                for file_tuple in files
+                if self.manifest.completed_file(file_tuple[0]) is None
+            ]
+            logger.info(
+                "%d input file(s) unchanged since previous run",
+                len(files) - len(files_to_load),
+            )
+        else:
+            files_to_load = files
+
+        try:
+            for file_name, hgt_tiles in self.load_files(files_to_load):
+                logger.debug("process_file %s", file_name)
+                if self.manifest is not None:
+                    self.manifest.record_file(file_name, len(hgt_tiles))
+                for tile in hgt_tiles:
+                    self.process_tile(file_name, tile)
+            logger.debug("Done scheduling, waiting for all workers to complete...")
 
-        # import objgraph
-        # import tracemalloc
-        # import random
-
-        # tracemalloc.start(10)
-        for file_name, check_poly in files:
-            self.process_file(file_name, check_poly)
-            # snapshot = tracemalloc.take_snapshot()
-            # top_stats = snapshot.statistics("traceback")
-            # # logger.debug("[memory top 10]\n  "+"\n  ".join([str(s) for s in top_stats[:10]]))
-            # logger.debug("===== Memory usage =====")
-            # for stat in top_stats[:10]:
-            #     logger.debug(
-            #         "%s memory blocks: %.1f KiB" % (stat.count, stat.size / 1024)
-            #     )
-            #     logger.debug("\n ".join(stat.traceback.format()))
-
-            # logger.debug("nb files: %s; nb tiles: %s", objgraph.count("hgtFile"), objgraph.count("hgtTile"))
-            # tiles = objgraph.by_type("hgtTile")
-            # objgraph.show_backrefs(tiles, filename="tiles_refs.png")
-            # objgraph.show_most_common_types()
-            # objgraph.show_growth(limit=3)
-            # try:
-            #     objgraph.show_chain(
-            #         objgraph.find_backref_chain(
-            #             random.choice(objgraph.by_type("WayType")),
-            #             objgraph.is_proper_module,
-            #         ),
-            #         filename="chain.png",
-            #     )
-            # except Exception:
-            #     pass
-            # roots = objgraph.get_leaking_objects()
-            # logger.debug("Leaking objects: %s", objgraph.show_most_common_types(objects=roots))
-            # objgraph.show_refs(roots[:3], refcounts=True, filename='roots.png')
-            # # objgraph.show_refs([y], filename='sample-graph.png')
-        logger.debug("Done scheduling, waiting for all children to complete...")
-
-        self.join_children()
-        if self.children_errors:
+            if self.scheduled_tiles:
+                self.dispatch_tiles()
+            while self.pending_contours:
+                self.write_next_computed_tile()
+            self.collect_results(wait_all=True)
+            if self.executor is not None:
+                logger.debug(
+                    "Tiles cost model (s/point, s/node): %s; memory estimates correction: %.2f",
+                    self.cost_model.coefficients,
+                    self.memory_controller.correction,
+                )
+        finally:
+            # When aborted, stop workers, then release the shared memory segments of
+            # pending tiles, which would otherwise outlive the process
+            self.shutdown_executor()
+            self.discard_pending_tiles()
+        if self.tiles_errors:
             logger.error(
-                "Some child process(es) finished with error; check earlier logs for exception details.%s",
-                "\n - ".join(
-                    f"pid: {p[0]}; exitcode: {p[1]}" for p in self.children_errors
+                "Some tile(s) processing failed; check earlier logs for exception details.%s",
+                "".join(
+                    f"\n - {result.tile} of {result.file_name}"
+                    for result in self.tiles_errors
                 ),
             )
 
+        if self.manifest is not None:
+            if self.options.incremental:
+                self.manifest.remove_stale_outputs(
+                    file_tuple[0] for file_tuple in files
+                )
+            self.manifest.close()
+            self.manifest = None
+
         if self.single_output and self.common_osm_output is not None:
             # Finalize output file
             logger.debug("Finalizing output file")
-            self.common_osm_output.done()
+            with (
+                timing.timed_scope(self.timings_enabled) as timer,
+                timing.stage(timing.FINALIZE),
+            ):
+                self.common_osm_output.done()
+            self.record_timings(timer.durations if timer else None, "output")
             self.common_osm_output = None
+
+        if self.timings is not None:
+            # Keep stdout for actual output
+            sys.stderr.write(self.timings.summary() + "\n")
+            self.timings.close()
+            self.timings = None
+
+        if self.profiles is not None:
+            self.profiles.write()
+            sys.stderr.write(self.profiles.summary())
+            self.profiles = None
+
+        tracer = tracing.stop_tracing()
+        if tracer is not None and self.options.trace_file:
+            tracer.complete("process files", start_time, tracing.now_us(), "job", {})
+            tracer.write(self.options.trace_file)
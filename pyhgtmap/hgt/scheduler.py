@@ -0,0 +1,202 @@
+"""Scheduling of tiles processing on worker processes."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple
+
+import numpy
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from pyhgtmap.hgt.tile import HgtTile
+
+
+class TileCostFeatures(NamedTuple):
+    """Features of a tile the processing cost is estimated from."""
+
+    nb_points: int
+    estimated_nb_nodes: float
+
+    @classmethod
+    def from_tile(cls, tile: HgtTile) -> TileCostFeatures:
+        return cls(tile.zData.size, tile.estimated_nb_nodes)
+
+
+class TileCostModel:
+    """Estimate the processing time of tiles from their features.
+
+    The cost is modeled as a linear combination of the number of points (data
+    preparation) and the estimated number of nodes (contours tracing and
+    simplification). Coefficients start from rough defaults, and are refined by
+    least squares on the durations measured by workers.
+    """
+
+    # Default cost per point and per estimated node, in seconds
+    DEFAULT_COEFFICIENTS = (2e-8, 2e-6)
+    # Minimum number of measures before relying on fitted coefficients
+    MIN_MEASURES = 4
+
+    def __init__(self) -> None:
+        self.coefficients = numpy.array(self.DEFAULT_COEFFICIENTS)
+        # Normal equations accumulators
+        self._features_products = numpy.zeros((2, 2))
+        self._features_durations = numpy.zeros(2)
+        self.nb_measures = 0
+
+    def estimate(self, features: TileCostFeatures) -> float:
+        """Estimated processing time of a tile, in seconds."""
+        return float(numpy.dot(self.coefficients, features))
+
+    def update(self, features: TileCostFeatures, duration: float) -> None:
+        """Refine the model with the measured processing duration of a tile."""
+        x = numpy.array(features, dtype=numpy.float64)
+        self._features_products += numpy.outer(x, x)
+        self._features_durations += x * duration
+        self.nb_measures += 1
+        if self.nb_measures < self.MIN_MEASURES:
+            return
+        try:
+            coefficients = numpy.linalg.solve(
+                self._features_products, self._features_durations
+            )
+        except numpy.linalg.LinAlgError:
+            # Degenerated measures (eg. all tiles of the same size)
+            return
+        if (coefficients > 0).all():
+            self.coefficients = coefficients
+
+
+def lpt_order(costs: list[float]) -> list[int]:
+    """Return indices of tasks sorted by decreasing cost (Longest Processing Time
+    first), ties being kept in original order.
+    """
+    return sorted(range(len(costs)), key=lambda index: -costs[index])
+
+
+def _read_proc_status(field: str) -> int | None:
+    """Return the value (in bytes) of a memory field of /proc/self/status, or None
+    if not available (non-Linux systems).
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> int | None:
+    """Reset the peak resident set size of current process to its current value.
+
+    Returns:
+        int | None: current RSS in bytes, or None if peak RSS can't be measured
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return None
+    return _read_proc_status("VmRSS")
+
+
+def get_peak_rss() -> int | None:
+    """Return the peak resident set size of current process, in bytes."""
+    return _read_proc_status("VmHWM")
+
+
+class TileMemoryFeatures(NamedTuple):
+    """Features of a tile the peak memory of its processing is estimated from."""
+
+    nb_points: int
+    nb_levels: int
+    estimated_nb_nodes: float
+
+    @classmethod
+    def from_tile(cls, tile: HgtTile, step_cont: int) -> TileMemoryFeatures:
+        return cls(
+            tile.zData.size,
+            max(int((tile.maxEle - tile.minEle) // step_cont), 0) + 1,
+            tile.estimated_nb_nodes,
+        )
+
+
+class MemoryAdmissionController:
+    """Bound the estimated memory used by workers processing tiles.
+
+    Tiles are admitted only while the sum of the estimated peak memory of tiles
+    being processed stays under the budget; a single tile is always admitted
+    though, to ensure progress. Estimates are corrected with the peak RSS
+    increases measured by workers.
+    The abrupt death of a worker (most likely killed by the OOM killer) is taken as
+    a sign of memory shortage, halving the number of tiles processed concurrently.
+    """
+
+    # Rough memory usage of contours computation: elevations converted to float,
+    # contourpy internal structures, and per level and per node Python objects
+    BYTES_PER_POINT = 48
+    BYTES_PER_LEVEL = 16 * 1024
+    BYTES_PER_NODE = 200
+    # Smoothing factor of the correction applied to estimates
+    CORRECTION_SMOOTHING = 0.3
+    # Measures of smaller tiles are dominated by allocator noise
+    MIN_FEEDBACK_BYTES = 1024 * 1024
+
+    def __init__(self, budget: int) -> None:
+        """
+        Args:
+            budget (int): memory budget in bytes; 0 to disable admission control
+        """
+        self.budget = budget
+        self.correction: float = 1.0
+        # Max number of tiles processed concurrently; 0 for no limit
+        self.max_in_flight: int = 0
+        # Tiles being processed, with their raw (uncorrected) estimate
+        self.in_flight: dict[Future, int] = {}
+
+    def raw_estimate(self, features: TileMemoryFeatures) -> int:
+        return int(
+            features.nb_points * self.BYTES_PER_POINT
+            + features.nb_levels * self.BYTES_PER_LEVEL
+            + features.estimated_nb_nodes * self.BYTES_PER_NODE
+        )
+
+    def estimate(self, features: TileMemoryFeatures) -> int:
+        """Estimated peak memory used to process a tile, in bytes."""
+        return int(self.raw_estimate(features) * self.correction)
+
+    @property
+    def used(self) -> int:
+        """Estimated memory used by tiles being processed, in bytes."""
+        return int(sum(self.in_flight.values()) * self.correction)
+
+    def can_admit(self, estimate: int) -> bool:
+        if not self.in_flight:
+            return True
+        if self.max_in_flight and len(self.in_flight) >= self.max_in_flight:
+            return False
+        return not self.budget or self.used + estimate <= self.budget
+
+    def lower_concurrency(self, nb_lost: int) -> None:
+        """Record the abrupt death of a worker, which lost <nb_lost> tiles being
+        processed.
+        """
+        limit = min(self.max_in_flight, nb_lost) if self.max_in_flight else nb_lost
+        self.max_in_flight = max(limit // 2, 1)
+
+    def admit(self, future: Future, features: TileMemoryFeatures) -> None:
+        """Record a tile submitted for processing."""
+        self.in_flight[future] = self.raw_estimate(features)
+
+    def release(self, future: Future, peak_memory: int = 0) -> None:
+        """Record the end of a tile processing, refining estimates with its
+        measured peak memory (0 if unknown).
+        """
+        raw_estimate = self.in_flight.pop(future, None)
+        if raw_estimate is None:
+            return
+        if peak_memory and raw_estimate >= self.MIN_FEEDBACK_BYTES:
+            ratio = min(max(peak_memory / raw_estimate, 0.1), 10.0)
+            self.correction += self.CORRECTION_SMOOTHING * (ratio - self.correction)
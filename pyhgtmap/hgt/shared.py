@@ -0,0 +1,107 @@
+"""Hand tiles over to worker processes through shared memory.
+
+Instead of pickling tiles along with their (large) arrays, arrays are copied once in
+a shared memory segment, and workers only receive a lightweight descriptor.
+"""
+
+from __future__ import annotations
+
+import copy
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, NamedTuple, cast
+
+import numpy
+
+if TYPE_CHECKING:
+    from pyhgtmap.hgt.tile import HgtTile
+
+
+class SharedTile(NamedTuple):
+    """Descriptor of a tile whose arrays are stored in a shared memory segment.
+
+    The segment contains, in this order: elevations, void mask, and polygon mask
+    (if any).
+    """
+
+    segment_name: str
+    shape: tuple[int, int]
+    dtype: str
+    has_polygon_mask: bool
+    # Tile stripped of its arrays
+    tile: HgtTile
+
+
+def _segment_arrays(
+    segment: shared_memory.SharedMemory,
+    shape: tuple[int, int],
+    dtype: numpy.dtype,
+    nb_masks: int,
+) -> list[numpy.ndarray]:
+    """Return views on the arrays stored in a segment."""
+    buffer = cast(memoryview, segment.buf)
+    data: numpy.ndarray = numpy.ndarray(shape, dtype=dtype, buffer=buffer)
+    offset = data.nbytes
+    masks = []
+    for _ in range(nb_masks):
+        mask: numpy.ndarray = numpy.ndarray(
+            shape, dtype=bool, buffer=buffer, offset=offset
+        )
+        offset += mask.nbytes
+        masks.append(mask)
+    return [data, *masks]
+
+
+def share_tile(tile: HgtTile) -> tuple[shared_memory.SharedMemory, SharedTile]:
+    """Copy the arrays of <tile> into a new shared memory segment.
+
+    The caller owns the returned segment, and must close and unlink it once the
+    tile has been processed.
+    """
+    data = numpy.ma.getdata(tile.zData)
+    arrays = [data, numpy.ma.getmaskarray(tile.zData)]
+    if tile.mask is not None:
+        arrays.append(numpy.broadcast_to(tile.mask, data.shape))
+    segment = shared_memory.SharedMemory(
+        create=True, size=max(sum(array.nbytes for array in arrays), 1)
+    )
+    for view, array in zip(
+        _segment_arrays(segment, data.shape, data.dtype, len(arrays) - 1), arrays
+    ):
+        view[...] = array
+    stripped_tile = copy.copy(tile)
+    stripped_tile.zData = None  # type: ignore[assignment]
+    stripped_tile.mask = None
+    return segment, SharedTile(
+        segment.name,
+        data.shape,
+        data.dtype.str,
+        tile.mask is not None,
+        stripped_tile,
+    )
+
+
+def attach_tile(
+    shared_tile: SharedTile,
+) -> tuple[shared_memory.SharedMemory, HgtTile]:
+    """Rebuild a tile, whose arrays are views on the shared memory segment.
+
+    Tile must be released with release_tile() once processed.
+    """
+    segment = shared_memory.SharedMemory(name=shared_tile.segment_name)
+    data, void_mask, *polygon_mask = _segment_arrays(
+        segment,
+        shared_tile.shape,
+        numpy.dtype(shared_tile.dtype),
+        2 if shared_tile.has_polygon_mask else 1,
+    )
+    tile = shared_tile.tile
+    tile.zData = numpy.ma.array(data, mask=void_mask, copy=False)
+    tile.mask = polygon_mask[0] if polygon_mask else None
+    return segment, tile
+
+
+def release_tile(segment: shared_memory.SharedMemory, tile: HgtTile) -> None:
+    """Drop views of the tile on the shared memory segment, and close it."""
+    tile.zData = None  # type: ignore[assignment]
+    tile.mask = None
+    segment.close()
@@ -2,12 +2,12 @@ from __future__ import annotations
 
 import logging
 from functools import lru_cache
-from typing import TYPE_CHECKING, NamedTuple
+from typing import TYPE_CHECKING, Any, NamedTuple
 
 import numpy
 import numpy.typing
 
-from pyhgtmap import BBox
+from pyhgtmap import BBox, timing, tracing
 from pyhgtmap.hgt import TransformFunType, makeBBoxString, transformLonLats
 from pyhgtmap.hgt.contour import ContoursGenerator, build_contours
 
@@ -41,12 +41,22 @@ class HgtTile:
         polygons: PolygonsList | None,
         mask,
         transform: TransformFunType | None,
+        elevation_scale: float = 1.0,
+        estimated_nb_nodes: float = 0.0,
     ):
         """initializes tile-specific variables. The minimum elevation is stored in
         self.minEle, the maximum elevation in self.maxEle.
+
+        <data> is kept in its compact storage form (eg. int16 for integer DEMs);
+        elevations are multiplied by <elevation_scale> (eg. for feet conversion) when
+        used.
+        <estimated_nb_nodes> is the estimation computed when building tiles, used
+        to schedule their processing.
         """
         self.minLon, self.minLat, self.maxLon, self.maxLat = bbox
         self.zData = data
+        self.elevation_scale = elevation_scale
+        self.estimated_nb_nodes = estimated_nb_nodes
         # initialize lists for longitude and latitude data
         self.numOfRows: int = self.zData.shape[0]
         self.numOfCols: int = self.zData.shape[1]
@@ -63,6 +73,16 @@ class HgtTile:
         # https://stackoverflow.com/a/68550238
         self.get_contours = lru_cache(maxsize=16)(self._get_contours)
 
+    def __getstate__(self) -> dict[str, Any]:
+        """Tiles are sent to worker processes; contours cache isn't picklable."""
+        state = self.__dict__.copy()
+        del state["get_contours"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.get_contours = lru_cache(maxsize=16)(self._get_contours)
+
     def get_stats(self) -> str:
         """Get some statistics about the tile."""
         minLon, minLat, maxLon, maxLat = self.bbox()
@@ -87,8 +107,8 @@ class HgtTile:
         We don't have to care about -0x8000 values here since these are masked
         so that self.zData's min and max methods will yield proper values.
         """
-        minEle = int(self.zData.min())
-        maxEle = int(self.zData.max())
+        minEle = int(self.zData.min() * self.elevation_scale)
+        maxEle = int(self.zData.max() * self.elevation_scale)
         return minEle, maxEle
 
     def bbox(self, doTransform=True) -> BBox:
@@ -146,9 +166,13 @@ class HgtTile:
         else:
             levels = range(int(min_cont), int(max_cont), stepCont)
         x, y = numpy.meshgrid(self.xData, self.yData)
+        # Compact z data are converted to float only now, right before contouring.
+        z_float = self.zData.astype(numpy.float32)
+        if self.elevation_scale != 1:
+            z_float *= self.elevation_scale
         # z data is a masked array filled with nan.
         z: numpy.typing.ArrayLike = numpy.ma.array(
-            self.zData,
+            z_float,
             mask=self.mask,
             fill_value=float("NaN"),
             keep_mask=True,
@@ -206,20 +230,23 @@ class HgtTile:
         Returns:
             TileContours: List of contours coordinates, per elevation, and associates statistics
         """
-        elevations, contour_data = self.contourLines(
-            step_cont,
-            max_nodes_per_way,
-            no_zero,
-            min_cont,
-            max_cont,
-            rdp_epsilon,
-        )
+        with timing.stage(timing.CONTOUR_TRACING):
+            elevations, contour_data = self.contourLines(
+                step_cont,
+                max_nodes_per_way,
+                no_zero,
+                min_cont,
+                max_cont,
+                rdp_epsilon,
+            )
         contours_per_elev: dict[int, list[numpy.ndarray]] = {}
         total_nodes, total_ways = 0, 0
-        for elev in elevations:
-            contours_per_elev[elev], nb_nodes, nb_ways = contour_data.trace(elev)
-            total_nodes += nb_nodes
-            total_ways += nb_ways
+        # Tracing, simplification and splitting are interleaved per path
+        with tracing.span("trace levels", "stage"):
+            for elev in elevations:
+                contours_per_elev[elev], nb_nodes, nb_ways = contour_data.trace(elev)
+                total_nodes += nb_nodes
+                total_ways += nb_ways
 
         tile_contours = TileContours(total_nodes, total_ways, contours_per_elev)
         return tile_contours
@@ -0,0 +1,120 @@
+"""Coordinates transformations between the input files projection and EPSG:4326."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any
+
+import numpy
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+class CoordinatesTransform(ABC):
+    """Transformation of points coordinates from a coordinates system to another.
+
+    Transformations work on (N, 2) arrays of (x, y) points; they may also be called
+    with any iterable of points, as the former list-based transform functions.
+    """
+
+    @abstractmethod
+    def transform_array(self, points: numpy.ndarray) -> numpy.ndarray:
+        """Transform a (N, 2) array of points into a new (N, 2) float64 array.
+
+        Points which can't be transformed are set to inf, to keep the input shape.
+        """
+
+    def __call__(self, points: Iterable[tuple[float, float]]) -> numpy.ndarray:
+        """Transform points, dropping the ones which can't be transformed."""
+        transformed = self.transform_array(
+            numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+        )
+        return transformed[numpy.isfinite(transformed).all(axis=1)]
+
+
+class AffineTransform(CoordinatesTransform):
+    """Transformation scaling and shifting each axis independently.
+
+    x' = x * scale_x + offset_x, y' = y * scale_y + offset_y
+    """
+
+    def __init__(
+        self,
+        scale_x: float,
+        offset_x: float,
+        scale_y: float,
+        offset_y: float,
+    ) -> None:
+        self.scale = numpy.array([scale_x, scale_y], dtype=numpy.float64)
+        self.offset = numpy.array([offset_x, offset_y], dtype=numpy.float64)
+
+    def transform_array(self, points: numpy.ndarray) -> numpy.ndarray:
+        return points * self.scale + self.offset
+
+    def transform_axes(
+        self, x_data: numpy.ndarray, y_data: numpy.ndarray
+    ) -> tuple[numpy.ndarray, numpy.ndarray]:
+        """Transform 1-D arrays of x and y values of a regular grid."""
+        return (
+            x_data * self.scale[0] + self.offset[0],
+            y_data * self.scale[1] + self.offset[1],
+        )
+
+    def inverse(self) -> AffineTransform:
+        """Return the reverse transformation."""
+        (scale_x, scale_y), (offset_x, offset_y) = self.scale, self.offset
+        return AffineTransform(
+            1 / scale_x, -offset_x / scale_x, 1 / scale_y, -offset_y / scale_y
+        )
+
+
+class ProjTransform(CoordinatesTransform):
+    """Generic transformation between 2 coordinates systems given as WKT.
+
+    Relies on pyproj when available (fully vectorized), and falls back to GDAL's
+    osr otherwise. The underlying transformer is created lazily, so that instances
+    can be pickled (eg. to be sent to worker processes).
+    """
+
+    def __init__(self, source_wkt: str, target_wkt: str) -> None:
+        self.source_wkt = source_wkt
+        self.target_wkt = target_wkt
+        self._transformer: Any = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_transformer"] = None
+        return state
+
+    def _get_transformer(self) -> Any:
+        if self._transformer is None:
+            try:
+                from pyproj import CRS, Transformer
+
+                self._transformer = Transformer.from_crs(
+                    CRS.from_wkt(self.source_wkt),
+                    CRS.from_wkt(self.target_wkt),
+                    always_xy=True,
+                )
+            except ModuleNotFoundError:
+                from osgeo import osr
+
+                source, target = osr.SpatialReference(), osr.SpatialReference()
+                for srs, wkt in ((source, self.source_wkt), (target, self.target_wkt)):
+                    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+                    srs.ImportFromWkt(wkt)
+                self._transformer = osr.CoordinateTransformation(source, target)
+        return self._transformer
+
+    def transform_array(self, points: numpy.ndarray) -> numpy.ndarray:
+        transformer = self._get_transformer()
+        if hasattr(transformer, "TransformPoints"):
+            # osr fallback
+            if not len(points):
+                return numpy.empty((0, 2), dtype=numpy.float64)
+            return numpy.array(
+                transformer.TransformPoints(points.tolist()), dtype=numpy.float64
+            )[:, :2]
+        x, y = transformer.transform(points[:, 0], points[:, 1], errcheck=False)
+        return numpy.column_stack((x, y)).astype(numpy.float64, copy=False)
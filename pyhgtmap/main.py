@@ -6,20 +6,28 @@ from __future__ import annotations
 import logging
 import os
 import sys
+from typing import TYPE_CHECKING
 
-from pyhgtmap import NASASRTMUtil
+from pyhgtmap import NASASRTMUtil, planner
 from pyhgtmap.cli import parse_command_line
 from pyhgtmap.hgt.file import calc_hgt_area
 from pyhgtmap.hgt.processor import HgtFilesProcessor
 from pyhgtmap.logger import configure_logging
 
+if TYPE_CHECKING:
+    from pyhgtmap.configuration import Configuration
+
 logger = logging.getLogger(__name__)
 
+INPUT_FILES_EXTENSIONS = (".hgt", ".tif", ".tiff", ".vrt")
 
-def main_internal(sys_args: list[str]) -> None:
-    opts, args = parse_command_line(sys_args)
-    configure_logging(opts.logLevel)
 
+def process(opts: Configuration, args: list[str]) -> HgtFilesProcessor | None:
+    """Process input files, or files downloaded for the configured area.
+
+    Returns:
+        HgtFilesProcessor | None: the processor used, or None if nothing was processed
+    """
     hgtDataFiles: list[tuple[str, bool]]
     if args:
         # Prefer using any manually provided source file
@@ -27,7 +35,7 @@ def main_internal(sys_args: list[str]) -> None:
         hgtDataFiles = [
             (arg, use_poly_flag)
             for arg in args
-            if os.path.splitext(arg)[1].lower() in (".hgt", ".tif", ".tiff", ".vrt")
+            if os.path.splitext(arg)[1].lower() in INPUT_FILES_EXTENSIONS
         ]
         opts.area = ":".join(
             [
@@ -52,13 +60,31 @@ def main_internal(sys_args: list[str]) -> None:
         )
         if len(hgtDataFiles) == 0:
             print(f"No files for this area {opts.area:s} from desired source(s).")
-            sys.exit(0)
+            return None
         elif opts.downloadOnly:
-            sys.exit(0)
+            return None
 
-    HgtFilesProcessor(opts.nJobs, opts.startId, opts.startWayId, opts).process_files(
-        hgtDataFiles,
-    )
+    if opts.plan:
+        calibration = (
+            planner.load_calibration(opts.plan_calibration)
+            if opts.plan_calibration
+            else planner.DEFAULT_CALIBRATION
+        )
+        print(
+            planner.report(opts, planner.estimate_job(opts, hgtDataFiles, calibration))
+        )
+        return None
+
+    processor = HgtFilesProcessor(opts.nJobs, opts.startId, opts.startWayId, opts)
+    processor.process_files(hgtDataFiles)
+    return processor
+
+
+def main_internal(sys_args: list[str]) -> None:
+    opts, args = parse_command_line(sys_args)
+    configure_logging(opts.logLevel)
+    if process(opts, args) is None:
+        sys.exit(0)
 
 
 def main() -> None:
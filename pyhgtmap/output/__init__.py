@@ -26,8 +26,6 @@ WaysType = NDArray[
     Structure["first_node_id: Int, nb_nodes: Int, closed_loop: Bool, elevation: Int"],
 ]
 
-NodeType = tuple[int, int]
-
 
 def make_elev_classifier(majorDivisor: int, mediumDivisor: int) -> Callable[[int], str]:
     """returns a function taking an elevation and returning a
@@ -105,39 +103,6 @@ class Id:
         return self.curId - 1
 
 
-# Helper functions
-def _makePoints(path, IDCounter, precision: int) -> tuple[list[NodeType], list[int]]:
-    ids, nodes = [], []
-    for lon, lat in path:
-        IDCounter.curId += 1
-        nodes.append((int(lon * precision), int(lat * precision)))
-        ids.append(IDCounter.curId - 1)
-    if numpy.all(path[0] == path[-1]):  # close contour
-        del nodes[-1]  # remove last node
-        del ids[-1]
-        ids.append(ids[0])
-        IDCounter.curId -= 1
-    return nodes, ids
-
-
-def make_nodes_ways(
-    contourList: list,
-    elevation: int,
-    IDCounter,
-    precision: int,
-) -> tuple[list, list[WayType]]:
-    ways: list[WayType] = []
-    nodes: list = []
-    for path in contourList:
-        newNodes, nodeRefs = _makePoints(path, IDCounter, precision)
-        nodes.extend(newNodes)
-        if nodeRefs[0] == nodeRefs[-1]:
-            ways.append(WayType(nodeRefs[0], len(nodeRefs) - 1, True, elevation))
-        else:
-            ways.append(WayType(nodeRefs[0], len(nodeRefs), False, elevation))
-    return nodes, ways
-
-
 def build_efficient_ways(ways: list[WayType]) -> WaysType:
     """Convert a list of ways (tuples) into a more efficient numpy array."""
     return numpy.array(
@@ -62,6 +62,21 @@ def make_osm_filename(
     return osmName
 
 
+# Output formats, as selected by get_output_format()
+OUTPUT_FORMATS = ("osm", "gzip", "pbf", "o5m")
+
+
+def get_output_format(opts: Configuration) -> str:
+    """Return the output format selected by options, among OUTPUT_FORMATS."""
+    if opts.pbf:
+        return "pbf"
+    elif opts.o5m:
+        return "o5m"
+    elif opts.gzip:
+        return "gzip"
+    return "osm"
+
+
 bboxStringtypes = (str, bytes, bytearray)
 
 
@@ -0,0 +1,263 @@
+"""Merge several output files (eg. generated by distinct shards) into a single one.
+
+Files are concatenated without renumbering, which requires their IDs not to
+overlap: nodes of all files are written first, then ways of all files.
+Only files generated by pyhgtmap are supported, as their structure is relied on:
+- o5m: datasets are split on reset markers, each block between resets holding a
+  single type of objects, and being independent from the other ones (delta coding
+  and strings table are cleared by resets)
+- PBF: blobs are self-contained, and hold a single type of objects
+- XML: nodes are written one per line, ways spanning several lines
+"""
+
+from __future__ import annotations
+
+import gzip
+import lzma
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from typing import IO, TYPE_CHECKING, Any, cast
+
+import pyhgtmap
+from pyhgtmap.output import o5mUtil, osmUtil, pbfUtil
+from pyhgtmap.output.factory import get_osm_output, make_osm_filename
+from pyhgtmap.varint import str2int
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from pyhgtmap import BBox
+    from pyhgtmap.configuration import Configuration
+
+# o5m datasets types
+O5M_NODE = 0x10
+O5M_WAY = 0x11
+O5M_RELATION = 0x12
+O5M_BBOX = 0xDB
+O5M_TIMESTAMP = 0xDC
+O5M_HEADER = 0xE0
+O5M_END = 0xFE
+O5M_RESET = 0xFF
+
+# Fields numbers of PBF PrimitiveGroup entities
+PBF_NODES = 1
+PBF_DENSE_NODES = 2
+PBF_WAYS = 3
+
+
+def merge_outputs(
+    opts: Configuration,
+    input_files_names: list[str],
+    outputs: list[str],
+    bounds: BBox,
+) -> str:
+    """Merge output files into a single one, named as in single output mode.
+
+    Args:
+        opts (Configuration): options used to generate outputs
+        input_files_names (list[str]): names of the input files used to generate outputs
+        outputs (list[str]): names of the files to merge, in order
+        bounds (BBox): bounding box of the merged output
+
+    Returns:
+        str: merged output file name
+    """
+    output_name = make_osm_filename(bounds, opts, input_files_names)
+    if opts.pbf:
+        merge_pbf(outputs, output_name, opts, bounds)
+        return output_name
+    output = get_osm_output(opts, input_files_names, bounds)
+    if isinstance(output, o5mUtil.Output):
+        merge_o5m(outputs, output.outf)
+    elif isinstance(output, osmUtil.Output):
+        merge_xml(outputs, cast(IO[bytes], output.outF))
+    output.done()
+    return output_name
+
+
+def _o5m_blocks(data: Any) -> Iterator[tuple[int, int, int]]:
+    """Split o5m data into blocks of datasets between resets.
+
+    Yields:
+        Iterator[tuple[int, int, int]]: datasets type, start and end offsets of blocks
+        holding objects
+    """
+    pos = 0
+    block_start = 0
+    block_type = 0
+    size = len(data)
+    while pos < size:
+        dataset_type = data[pos]
+        if dataset_type in (O5M_RESET, O5M_END):
+            if block_type:
+                yield block_type, block_start, pos
+            block_start = pos
+            block_type = 0
+            pos += 1
+            if dataset_type == O5M_END:
+                return
+            continue
+        if dataset_type >= 0xF0:
+            # Single byte datasets
+            pos += 1
+            continue
+        length, pos = str2int(data, pos + 1)
+        pos += length
+        if dataset_type in (O5M_HEADER, O5M_TIMESTAMP, O5M_BBOX):
+            continue
+        if block_type and dataset_type != block_type:
+            raise ValueError(
+                f"Unsupported o5m file: mixed datasets types without reset at {pos}"
+            )
+        block_type = dataset_type
+    if block_type:
+        yield block_type, block_start, pos
+
+
+def merge_o5m(outputs: list[str], output_file: IO[bytes]) -> None:
+    """Append nodes then ways blocks of o5m files to an o5m output, whose header has
+    already been written.
+    """
+    for objects_type in (O5M_NODE, O5M_WAY, O5M_RELATION):
+        for file_name in outputs:
+            with (
+                open(file_name, "rb") as input_file,
+                mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as data,
+            ):
+                for block_type, start, end in _o5m_blocks(data):
+                    if block_type == objects_type:
+                        output_file.write(data[start:end])
+
+
+def _protobuf_fields(data: memoryview) -> Iterator[tuple[int, Any]]:
+    """Iterate on the fields of a protobuf message.
+
+    Yields:
+        Iterator[tuple[int, Any]]: field number and value (int, or memoryview for
+        length delimited fields)
+    """
+    pos = 0
+    while pos < len(data):
+        key, pos = str2int(data, pos)
+        wire_type = key & 7
+        value: Any
+        if wire_type == 0:
+            value, pos = str2int(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos : pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = str2int(data, pos)
+            value, pos = data[pos : pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = data[pos : pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+        yield key >> 3, value
+
+
+def _pbf_blobs(input_file: IO[bytes]) -> Iterator[tuple[str, bytes]]:
+    """Iterate on the blobs of a PBF file.
+
+    Yields:
+        Iterator[tuple[str, bytes]]: blob type and raw blob (including its header)
+    """
+    while True:
+        header_size_data = input_file.read(4)
+        if not header_size_data:
+            return
+        (header_size,) = struct.unpack("!I", header_size_data)
+        header = input_file.read(header_size)
+        blob_type = ""
+        data_size = 0
+        for field_number, value in _protobuf_fields(memoryview(header)):
+            if field_number == 1:
+                blob_type = bytes(value).decode()
+            elif field_number == 3:
+                data_size = value
+        yield blob_type, header_size_data + header + input_file.read(data_size)
+
+
+def _pbf_blob_type(blob: bytes) -> int:
+    """Return the type of the entities held by a raw OSMData blob."""
+    (header_size,) = struct.unpack("!I", blob[:4])
+    block = b""
+    for field_number, value in _protobuf_fields(memoryview(blob)[4 + header_size :]):
+        if field_number == 1:
+            block = bytes(value)
+        elif field_number == 3:
+            block = zlib.decompress(value)
+        elif field_number == 4:
+            block = lzma.decompress(value)
+        elif field_number != 2:
+            raise ValueError(f"Unsupported PBF blob compression (field {field_number})")
+    for field_number, group in _protobuf_fields(memoryview(block)):
+        if field_number == 2:
+            for entity_type, _ in _protobuf_fields(group):
+                return PBF_NODES if entity_type == PBF_DENSE_NODES else entity_type
+    return 0
+
+
+def merge_pbf(
+    outputs: list[str], output_name: str, opts: Configuration, bounds: BBox
+) -> None:
+    """Merge PBF files, writing nodes blobs then ways blobs after a new header."""
+    # Let osmium build the header
+    header_fd, header_name = tempfile.mkstemp(
+        suffix=".osm.pbf", dir=os.path.dirname(output_name) or "."
+    )
+    os.close(header_fd)
+    try:
+        pbfUtil.Output(
+            header_name,
+            opts.osmVersion,
+            pyhgtmap.__version__,
+            bounds,
+            lambda _: "",
+        ).done()
+        with open(header_name, "rb") as header_file:
+            header_blobs = [
+                blob
+                for blob_type, blob in _pbf_blobs(header_file)
+                if blob_type == "OSMHeader"
+            ]
+    finally:
+        os.remove(header_name)
+    with open(output_name, "wb") as output_file:
+        for blob in header_blobs:
+            output_file.write(blob)
+        for entity_type in (PBF_NODES, PBF_WAYS):
+            for file_name in outputs:
+                with open(file_name, "rb") as input_file:
+                    for blob_type, blob in _pbf_blobs(input_file):
+                        if (
+                            blob_type == "OSMData"
+                            and _pbf_blob_type(blob) == entity_type
+                        ):
+                            output_file.write(blob)
+
+
+def _open_xml(file_name: str) -> IO[bytes]:
+    if file_name.endswith(".gz"):
+        return cast(IO[bytes], gzip.open(file_name, "rb"))
+    return open(file_name, "rb")  # noqa: SIM115
+
+
+def merge_xml(outputs: list[str], output_file: IO[bytes]) -> None:
+    """Append nodes then ways of OSM XML files to an XML output, whose preamble has
+    already been written.
+    """
+    for file_name in outputs:
+        with _open_xml(file_name) as input_file:
+            for line in input_file:
+                if line.startswith(b"<node"):
+                    output_file.write(line)
+    for file_name in outputs:
+        with _open_xml(file_name) as input_file:
+            for line in input_file:
+                if not line.startswith(
+                    (b"<node", b"<?xml", b"<osm", b"<bounds", b"</osm")
+                ):
+                    output_file.write(line)
@@ -1,12 +1,21 @@
 from __future__ import annotations
 
-import ast
 import time
-from typing import TYPE_CHECKING, Callable
+from typing import TYPE_CHECKING, Callable, Union
+
+import numpy
 
 import pyhgtmap.output
 from pyhgtmap import output
-from pyhgtmap.varint import int2str, join, sint2str, writableInt, writableString
+from pyhgtmap.varint import (
+    int2str,
+    int_array2str,
+    join,
+    sint2str,
+    sint_array2str,
+    writableInt,
+    writableString,
+)
 
 if TYPE_CHECKING:
     from pyhgtmap import BBox
@@ -14,6 +23,54 @@ if TYPE_CHECKING:
 
 HUNDREDNANO = 10000000
 
+# Maximum number of nodes written between two resets, unless a single elevation has
+# more
+MAX_NODES_PER_BLOCK = 32000
+
+# A field of consecutive records: either the same bytes for all records, or the
+# concatenated bytes of all records and the length of each of them
+FieldType = Union[bytes, tuple[numpy.ndarray, numpy.ndarray]]
+
+
+def join_fields(nb_records: int, fields: list[FieldType]) -> bytes:
+    """Join <nb_records> records made of <fields>, written one after the other."""
+    field_lengths = [
+        numpy.full(nb_records, len(field)) if isinstance(field, bytes) else field[1]
+        for field in fields
+    ]
+    record_lengths = numpy.sum(field_lengths, axis=0)
+    buffer = numpy.empty(int(record_lengths.sum()), dtype=numpy.uint8)
+    # Offset of the current field in each record
+    offsets = numpy.cumsum(record_lengths) - record_lengths
+    for field, lengths in zip(fields, field_lengths):
+        if isinstance(field, bytes):
+            buffer[offsets[:, numpy.newaxis] + numpy.arange(len(field))] = (
+                numpy.frombuffer(field, dtype=numpy.uint8)
+            )
+        else:
+            data = field[0]
+            # Shift each byte from its position in data to its position in buffer
+            data_offsets = numpy.cumsum(lengths) - lengths
+            buffer[
+                numpy.repeat(offsets - data_offsets, lengths) + numpy.arange(len(data))
+            ] = data
+        offsets = offsets + lengths
+    return buffer.tobytes()
+
+
+def _repeat_strings(
+    strings: list[bytes], counts: list[int]
+) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """returns each of <strings> repeated as many times as in <counts>, as a field
+    of join_fields()."""
+    return (
+        numpy.frombuffer(
+            join(string * count for string, count in zip(strings, counts)),
+            dtype=numpy.uint8,
+        ),
+        numpy.repeat([len(string) for string in strings], counts),
+    )
+
 
 class StringTable:
     def __init__(self):
@@ -126,12 +183,9 @@ class Output(output.Output):
             data.append(self.stringTable.stringOrIndex(writableInt(0x00) * 3))
         return join(data)
 
-    def writeNodesO5m(self, nodes, startNodeId):
-        """writes nodes to self.outf.  nodeList shall be a list of
-        (<lon>, <lat>) duples of ints in nanodegrees of longitude and latitude,
-        respectively.
-
-        The nodelist is split up to make sure the pbf blobs will not be too big.
+    def writeNodesO5m(self, nodes: numpy.ndarray, startNodeId: int) -> None:
+        """writes nodes to self.outf.  <nodes> shall be an array of (<lon>, <lat>)
+        ints in hundreds of nanodegrees of longitude and latitude, respectively.
         """
         if len(nodes) == 0:
             return
@@ -139,10 +193,27 @@ class Output(output.Output):
         # reset the delta counters each time
         self.writeReset()
         # write the first node
-        self.writeNode(nodes[0], lastNode=None, idDelta=startNodeId)
-        # write all other nodes:
-        for ind, node in enumerate(nodes[1:]):
-            self.writeNode(node, lastNode=nodes[ind], idDelta=1)
+        self.writeNode(
+            (int(nodes[0][0]), int(nodes[0][1])), lastNode=None, idDelta=startNodeId
+        )
+        # write all other nodes at once
+        if len(nodes) > 1:
+            self.outf.write(self.makeNodeDatasets(nodes))
+
+    def makeNodeDatasets(self, nodes: numpy.ndarray) -> bytes:
+        """returns the datasets of all nodes but the first one, delta coded."""
+        deltas = numpy.diff(nodes, axis=0)
+        # node id delta is 1, and version information is the same for all nodes
+        # following the first one
+        dataPrefix = sint2str(1) + self.makeVersionChunk(first=False)
+        deltaLon = sint_array2str(deltas[:, 0])
+        deltaLat = sint_array2str(deltas[:, 1])
+        nodeDataLen = int_array2str(len(dataPrefix) + deltaLon[1] + deltaLat[1])
+        # 0x10 means node
+        return join_fields(
+            len(deltas),
+            [writableInt(0x10), nodeDataLen, dataPrefix, deltaLon, deltaLat],
+        )
 
     def writeNode(self, node, lastNode, idDelta):
         nodeDataset = []
@@ -177,45 +248,48 @@ class Output(output.Output):
         return join(data)
 
     def _write_ways(self, ways: pyhgtmap.output.WaysType, startWayId):
-        """writes ways to self.outf.  ways shall be a list of
-        (<startNodeId>, <length>, <isCycle>, <elevation>) tuples.
+        """writes ways to self.outf.  ways shall be an array of
+        (<startNodeId>, <length>, <isCycle>, <elevation>) records.
         """
         if len(ways) == 0:
             return
         # write a reset byte
         self.writeReset()
-        # write the first way
-        self.writeWay(ways[0], idDelta=startWayId, first=True)
-        # write all other ways
-        for way in ways[1:]:
-            self.writeWay(way, idDelta=1)
-
-    def writeWay(self, way: pyhgtmap.output.WayType, idDelta, first=False):
-        wayDataset = []
+        # write all ways at once
+        self.outf.write(self.makeWayDatasets(ways, startWayId))
+
+    def makeWayDatasets(self, ways: pyhgtmap.output.WaysType, startWayId: int) -> bytes:
+        """returns the datasets of all <ways>, delta coded since the last reset."""
+        nbWays = len(ways)
+        idDeltas = numpy.ones(nbWays, dtype=numpy.int64)
+        idDeltas[0] = startWayId
+        idDelta = sint_array2str(idDeltas)
+        versionChunks, tags = self.makeWayStrings(ways["elevation"])
+        wayRefSection = self.makeWayReferenceSections(
+            ways["first_node_id"].astype(numpy.int64),
+            ways["nb_nodes"].astype(numpy.int64),
+            ways["closed_loop"],
+        )
+        wayDataLen = int_array2str(
+            idDelta[1]
+            + versionChunks[1]
+            + sum(lengths for _, lengths in wayRefSection)
+            + tags[1]
+        )
         # 0x11 means way
-        wayDataset.append(writableInt(0x11))
-        wayData = self.makeWayData(way, idDelta, first)
-        wayDataLen = len(wayData)
-        wayDataset.append(int2str(wayDataLen))
-        wayDataset.append(wayData)
-        self.outf.write(join(wayDataset))
-
-    def makeWayData(self, way: pyhgtmap.output.WayType, idDelta, first):
-        startNodeId, length, isCycle, elevation = way
-        data = []
-        data.append(sint2str(idDelta))
-        # version information
-        if first:
-            # first way
-            data.append(self.makeVersionChunk(first=True))
-        else:
-            data.append(self.makeVersionChunk(first=False))
-        # node references
-        wayRefSection = self.makeWayReferenceSection(startNodeId, length, isCycle)
-        wayRefSectionLen = len(wayRefSection)
-        data.append(int2str(wayRefSectionLen))
-        data.append(wayRefSection)
-        # tags
+        return join_fields(
+            nbWays,
+            [
+                writableInt(0x11),
+                wayDataLen,
+                idDelta,
+                versionChunks,
+                *wayRefSection,
+                tags,
+            ],
+        )
+
+    def makeWayTags(self, elevation) -> bytes:
         # ele = <elevation>
         eleTag = self.makeStringPair("ele", str(elevation))
         contourTag = self.makeStringPair("contour", "elevation")
@@ -223,32 +297,75 @@ class Output(output.Output):
             "contour_ext",
             self.elevClassifier(elevation),
         )
-        data.append(self.stringTable.stringOrIndex(eleTag))
-        data.append(self.stringTable.stringOrIndex(contourTag))
-        data.append(self.stringTable.stringOrIndex(elevClassifierTag))
-        return join(data)
-
-    def makeWayReferenceSection(self, startNodeId, length, isCycle):
-        nodeIdDeltas = []
-        # the first node id, delta coded
-        nodeIdDeltas.append(startNodeId - self.lastNodeId)
-        nodeIdDeltas.extend(
+        return join(
             [
-                1,
+                self.stringTable.stringOrIndex(eleTag),
+                self.stringTable.stringOrIndex(contourTag),
+                self.stringTable.stringOrIndex(elevClassifierTag),
             ]
-            * (length - 1),
         )
-        if isCycle:
-            nodeIdDeltas.append(-(length - 1))
-            self.lastNodeId = startNodeId
-        else:
-            self.lastNodeId = startNodeId + length - 1
-        return join([sint2str(nodeIdDelta) for nodeIdDelta in nodeIdDeltas])
 
-    def write(self, nodeString):
-        """wrapper imitating osmUtil.Output's write method."""
-        startNodeId, nodes = ast.literal_eval(nodeString.strip())
-        self.writeNodesO5m(nodes, startNodeId)
+    def makeWayStrings(
+        self, elevations: numpy.ndarray
+    ) -> tuple[
+        tuple[numpy.ndarray, numpy.ndarray], tuple[numpy.ndarray, numpy.ndarray]
+    ]:
+        """returns version information and tags of ways, as fields of join_fields().
+
+        The string table only changes when a string is added to it, so strings are
+        resolved for the first way of each elevation, possibly adding them, and
+        then once for all following ways of the same elevation.
+        """
+        runStarts = numpy.flatnonzero(
+            numpy.concatenate(([True], elevations[1:] != elevations[:-1]))
+        )
+        runLengths = numpy.diff(numpy.append(runStarts, len(elevations)))
+        versionChunks: list[bytes] = []
+        tags: list[bytes] = []
+        counts: list[int] = []
+        for runStart, runLength in zip(runStarts.tolist(), runLengths.tolist()):
+            elevation = elevations[runStart]
+            versionChunks.append(self.makeVersionChunk(first=runStart == 0))
+            tags.append(self.makeWayTags(elevation))
+            counts.append(1)
+            if runLength > 1:
+                versionChunks.append(self.makeVersionChunk(first=False))
+                tags.append(self.makeWayTags(elevation))
+                counts.append(runLength - 1)
+        return _repeat_strings(versionChunks, counts), _repeat_strings(tags, counts)
+
+    def makeWayReferenceSections(
+        self,
+        startNodeIds: numpy.ndarray,
+        lengths: numpy.ndarray,
+        isCycle: numpy.ndarray,
+    ) -> list[FieldType]:
+        """returns the node references sections of ways, preceded by their length,
+        as fields of join_fields().
+        """
+        lastNodeIds = numpy.where(isCycle, startNodeIds, startNodeIds + lengths - 1)
+        # the first node id, delta coded from the last node of the previous way
+        firstDelta = sint_array2str(
+            startNodeIds - numpy.append(self.lastNodeId, lastNodeIds[:-1])
+        )
+        self.lastNodeId = int(lastNodeIds[-1])
+        # following nodes ids are consecutive: delta 1, 0x02 once zigzag coded
+        nbNextNodes = lengths - 1
+        nextDeltas = (
+            numpy.full(int(nbNextNodes.sum()), 0x02, dtype=numpy.uint8),
+            nbNextNodes,
+        )
+        # cycles go back to their first node
+        closingBytes, cycleClosingLengths = sint_array2str(-nbNextNodes[isCycle])
+        closingLengths = numpy.zeros(len(lengths), dtype=numpy.int64)
+        closingLengths[isCycle] = cycleClosingLengths
+        wayRefSectionLen = int_array2str(firstDelta[1] + nbNextNodes + closingLengths)
+        return [
+            wayRefSectionLen,
+            firstDelta,
+            nextDeltas,
+            (closingBytes, closingLengths),
+        ]
 
     def flush(self) -> None:
         self.outf.flush()
@@ -271,34 +388,43 @@ class Output(output.Output):
         return writeNodes(self, tile_contours, timestamp_string, start_node_id)
 
 
+def _write_nodes_block(
+    output: Output, contours: list[numpy.ndarray], start_node_id: int
+) -> None:
+    nodes = (numpy.concatenate(contours) * HUNDREDNANO).astype(numpy.int64)
+    output.writeNodesO5m(nodes, start_node_id)
+    output.flush()
+
+
 def writeNodes(
     output: Output,
     tile_contours: TileContours,
     timestampString,  # dummy option
     start_node_id,
 ) -> tuple[int, output.WaysType]:
-    IDCounter = pyhgtmap.output.Id(start_node_id)
-    ways = []
-    nodes = []
-    startId = start_node_id
-    for elevation, contourList in tile_contours.contours.items():
-        if not contourList:
+    ways: list[pyhgtmap.output.WayType] = []
+    contours: list[numpy.ndarray] = []
+    next_node_id = block_start_id = start_node_id
+
+    for elevation, contour_list in tile_contours.contours.items():
+        if not contour_list:
             continue
-        newNodes, newWays = pyhgtmap.output.make_nodes_ways(
-            contourList,
-            elevation,
-            IDCounter,
-            HUNDREDNANO,
-        )
-        ways.extend(newWays)
-        nodes.extend(newNodes)
-        if len(nodes) > 32000:
-            output.write(str((startId, nodes)) + "\n")
-            output.flush()
-            startId = IDCounter.curId
-            nodes = []
-    newId = IDCounter.getId()
-    if len(nodes) > 0:
-        output.write(str((startId, nodes)) + "\n")
-        output.flush()
-    return newId, pyhgtmap.output.build_efficient_ways(ways)
+        for contour in contour_list:
+            is_closed_way = bool(numpy.all(contour[0] == contour[-1]))
+            if is_closed_way:
+                # Close way by re-using first node instead of a new one
+                contour = contour[:-1]
+            contours.append(contour)
+            ways.append(
+                pyhgtmap.output.WayType(
+                    next_node_id, len(contour), is_closed_way, elevation
+                )
+            )
+            next_node_id += len(contour)
+        if next_node_id - block_start_id > MAX_NODES_PER_BLOCK:
+            _write_nodes_block(output, contours, block_start_id)
+            block_start_id = next_node_id
+            contours = []
+    if contours:
+        _write_nodes_block(output, contours, block_start_id)
+    return next_node_id, pyhgtmap.output.build_efficient_ways(ways)
@@ -0,0 +1,256 @@
+"""Dry-run estimation of a job: tiles, nodes, ways, output size, memory and time.
+
+Files are loaded and tiled as for actual processing, but contours aren't computed:
+counts are derived from the number of nodes estimated when building tiles, with
+coefficients calibrated by pyhgtmap-benchmark (see its --calibration option).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import TYPE_CHECKING, NamedTuple
+
+import numpy
+
+from pyhgtmap.hgt.processor import HgtFilesProcessor
+from pyhgtmap.hgt.scheduler import TileCostFeatures, TileMemoryFeatures
+from pyhgtmap.output.factory import OUTPUT_FORMATS, get_output_format
+
+if TYPE_CHECKING:
+    from pyhgtmap.configuration import Configuration
+
+
+class Calibration(NamedTuple):
+    """Coefficients converting tiles estimates into actual figures."""
+
+    # Nodes actually written per node estimated when building tiles (simplification
+    # and voids make the estimation pessimistic)
+    nodes_per_estimated_node: float
+    ways_per_node: float
+    # Contours computation time, in seconds per point and per estimated node (see
+    # TileCostModel)
+    tile_cost_coefficients: tuple[float, float]
+    # Writing time in seconds per node, and output size in bytes per node, per
+    # output format
+    write_seconds_per_node: dict[str, float]
+    bytes_per_node: dict[str, float]
+
+
+# Measured with pyhgtmap-benchmark on N43E006.hgt, with default options
+DEFAULT_CALIBRATION = Calibration(
+    nodes_per_estimated_node=0.95,
+    ways_per_node=0.0095,
+    tile_cost_coefficients=(5.4e-9, 5.4e-7),
+    write_seconds_per_node={
+        "osm": 2.8e-6,
+        "gzip": 4.5e-6,
+        "pbf": 1.1e-6,
+        "o5m": 4.0e-7,
+    },
+    bytes_per_node={"osm": 89.4, "gzip": 11.9, "pbf": 3.1, "o5m": 10.6},
+)
+
+
+def load_calibration(filename: str) -> Calibration:
+    """Load calibration from a JSON file, as written by save_calibration()."""
+    with open(filename) as calibration_file:
+        values = json.load(calibration_file)
+    values["tile_cost_coefficients"] = tuple(values["tile_cost_coefficients"])
+    return Calibration(**values)
+
+
+def save_calibration(filename: str, calibration: Calibration) -> None:
+    with open(filename, "w") as calibration_file:
+        json.dump(calibration._asdict(), calibration_file, indent=2)
+
+
+class FileEstimate(NamedTuple):
+    """Estimates of the processing of an input file."""
+
+    file_name: str
+    nb_tiles: int
+    nb_nodes: float
+    nb_ways: float
+    output_bytes: dict[str, float]
+    # Estimated memory of the loaded file (parent process), and peak memory of its
+    # largest tile (worker process), in bytes
+    file_memory: int
+    worker_memory: int
+    # Measured loading and tiling time
+    load_seconds: float
+    # Estimated contours computation and writing times
+    compute_seconds: float
+    write_seconds: float
+    # Estimated time of the longest tile
+    max_tile_seconds: float
+
+
+def estimate_file(
+    processor: HgtFilesProcessor,
+    file_name: str,
+    check_poly: bool,
+    calibration: Calibration,
+) -> FileEstimate:
+    """Load and tile a file, and estimate the processing of its tiles."""
+    opts = processor.options
+    output_format = get_output_format(opts)
+    start = time.perf_counter()
+    tiles = processor.load_file(file_name, check_poly)
+    load_seconds = time.perf_counter() - start
+    step = int(opts.contourStepSize)
+    cost_coefficients = numpy.array(calibration.tile_cost_coefficients)
+    nb_nodes = compute_seconds = write_seconds = max_tile_seconds = 0.0
+    worker_memory = 0
+    for tile in tiles:
+        tile_nb_nodes = tile.estimated_nb_nodes * calibration.nodes_per_estimated_node
+        tile_seconds = float(
+            numpy.dot(cost_coefficients, TileCostFeatures.from_tile(tile))
+        )
+        tile_write_seconds = (
+            tile_nb_nodes * calibration.write_seconds_per_node[output_format]
+        )
+        nb_nodes += tile_nb_nodes
+        compute_seconds += tile_seconds
+        write_seconds += tile_write_seconds
+        max_tile_seconds = max(max_tile_seconds, tile_seconds + tile_write_seconds)
+        worker_memory = max(
+            worker_memory,
+            processor.memory_controller.raw_estimate(
+                TileMemoryFeatures.from_tile(tile, step)
+            ),
+        )
+    return FileEstimate(
+        file_name,
+        len(tiles),
+        nb_nodes,
+        nb_nodes * calibration.ways_per_node,
+        {
+            output_format: nb_nodes * bytes_per_node
+            for output_format, bytes_per_node in calibration.bytes_per_node.items()
+        },
+        processor.estimate_file_memory(file_name),
+        worker_memory,
+        load_seconds,
+        compute_seconds,
+        write_seconds,
+        max_tile_seconds,
+    )
+
+
+def estimate_job(
+    opts: Configuration,
+    files: list[tuple[str, bool]],
+    calibration: Calibration = DEFAULT_CALIBRATION,
+) -> list[FileEstimate]:
+    """Estimate the processing of all input files, one at a time."""
+    processor = HgtFilesProcessor(opts.nJobs, opts.startId, opts.startWayId, opts)
+    return [
+        estimate_file(processor, file_name, check_poly, calibration)
+        for file_name, check_poly in files
+    ]
+
+
+def projected_wall_time(
+    opts: Configuration, estimates: list[FileEstimate]
+) -> tuple[float, float]:
+    """Project processing time with options.nJobs workers (at most one per CPU).
+
+    Files are loaded by the main process, contours are computed by workers, and
+    written by workers too unless writing a single output.
+
+    Returns:
+        tuple[float, float]: CPU time and wall time, in seconds
+    """
+    load_seconds = sum(estimate.load_seconds for estimate in estimates)
+    compute_seconds = sum(estimate.compute_seconds for estimate in estimates)
+    write_seconds = sum(estimate.write_seconds for estimate in estimates)
+    cpu_seconds = load_seconds + compute_seconds + write_seconds
+    # Workers can't run faster than the available CPUs
+    nb_jobs = min(opts.nJobs, os.cpu_count() or 1)
+    if nb_jobs <= 1:
+        return cpu_seconds, cpu_seconds
+    max_tile_seconds = max(
+        (estimate.max_tile_seconds for estimate in estimates), default=0.0
+    )
+    if opts.maxNodesPerTile:
+        serial_seconds, parallel_seconds = load_seconds, compute_seconds + write_seconds
+    else:
+        serial_seconds, parallel_seconds = load_seconds + write_seconds, compute_seconds
+    return cpu_seconds, serial_seconds + max(
+        parallel_seconds / nb_jobs, max_tile_seconds
+    )
+
+
+def format_size(nb_bytes: float) -> str:
+    units = ("B", "KiB", "MiB", "GiB", "TiB")
+    unit_index = 0
+    while nb_bytes >= 1024 and unit_index < len(units) - 1:
+        nb_bytes /= 1024
+        unit_index += 1
+    return f"{nb_bytes:.1f} {units[unit_index]}"
+
+
+def report(opts: Configuration, estimates: list[FileEstimate]) -> str:
+    """Return a table of per file and total estimates."""
+    lines = [
+        f"{'File':<24} {'Tiles':>6} {'Nodes':>12} {'Ways':>9}"
+        + "".join(f" {output_format:>10}" for output_format in OUTPUT_FORMATS)
+        + f" {'Worker mem':>11} {'Time (s)':>9}"
+    ]
+
+    def add_line(
+        name: str,
+        nb_tiles: int,
+        nb_nodes: float,
+        nb_ways: float,
+        output_bytes: dict[str, float],
+        worker_memory: int,
+        seconds: float,
+    ) -> None:
+        lines.append(
+            f"{name:<24} {nb_tiles:>6d} {nb_nodes:>12.0f} {nb_ways:>9.0f}"
+            + "".join(
+                f" {format_size(output_bytes[output_format]):>10}"
+                for output_format in OUTPUT_FORMATS
+            )
+            + f" {format_size(worker_memory):>11} {seconds:>9.1f}"
+        )
+
+    for estimate in estimates:
+        add_line(
+            os.path.basename(estimate.file_name),
+            estimate.nb_tiles,
+            estimate.nb_nodes,
+            estimate.nb_ways,
+            estimate.output_bytes,
+            estimate.worker_memory,
+            estimate.load_seconds + estimate.compute_seconds + estimate.write_seconds,
+        )
+    cpu_seconds, wall_seconds = projected_wall_time(opts, estimates)
+    worker_memory = max((estimate.worker_memory for estimate in estimates), default=0)
+    add_line(
+        "Total",
+        sum(estimate.nb_tiles for estimate in estimates),
+        sum(estimate.nb_nodes for estimate in estimates),
+        sum(estimate.nb_ways for estimate in estimates),
+        {
+            output_format: sum(
+                estimate.output_bytes[output_format] for estimate in estimates
+            )
+            for output_format in OUTPUT_FORMATS
+        },
+        worker_memory,
+        cpu_seconds,
+    )
+    file_memory = max((estimate.file_memory for estimate in estimates), default=0)
+    lines.append(
+        f"Peak memory: {format_size(file_memory)} per loaded file (main process),"
+        f" {format_size(worker_memory)} per worker"
+    )
+    lines.append(
+        f"Projected runtime ({get_output_format(opts)} output): {wall_seconds:.1f} s"
+        f" with {opts.nJobs} job(s), {cpu_seconds:.1f} s of CPU"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,185 @@
+"""Profiling of tiles processing, with cProfile and optionally tracemalloc.
+
+Tiles are profiled where they are processed (in workers when parallelized), and
+their raw statistics are returned to the parent process along with the results,
+which merges them into a single pstats file and allocations report.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Any, NamedTuple, cast
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# Number of frames stored per allocation traceback
+NB_FRAMES = 10
+# Number of allocation sites reported per tile
+NB_ALLOCATIONS = 20
+
+
+class TileProfile(NamedTuple):
+    """Profile of a tile processing, as returned by workers."""
+
+    # Raw cProfile statistics (see pstats.Stats.stats)
+    stats: dict[tuple[str, int, str], Any]
+    # Largest allocation sites still alive at the end of tile processing:
+    # formatted traceback, size and number of blocks
+    allocations: list[tuple[tuple[str, ...], int, int]]
+    # Peak memory traced during tile processing, in bytes (0 if not traced)
+    peak_memory: int
+
+
+class TileProfiler:
+    """Profile of the block run by profiled_scope(), available once it exits."""
+
+    def __init__(self) -> None:
+        self.profile: TileProfile | None = None
+
+
+@contextmanager
+def profiled_scope(
+    enabled: bool = True, trace_memory: bool = False
+) -> Iterator[TileProfiler | None]:
+    """Profile the block with cProfile, and trace its allocations if requested.
+
+    Allocations are traced for the whole process, and only the ones still alive at
+    the end of the block are reported, along with the peak of traced memory.
+
+    Yields:
+        Iterator[TileProfiler | None]: the profiler, or None if not enabled
+    """
+    if not enabled:
+        yield None
+        return
+    tile_profiler = TileProfiler()
+    # Memory tracing is left as found (eg. when enabled with PYTHONTRACEMALLOC)
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start(NB_FRAMES)
+    elif trace_memory:
+        tracemalloc.clear_traces()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield tile_profiler
+    finally:
+        profiler.disable()
+        allocations: list[tuple[tuple[str, ...], int, int]] = []
+        peak_memory = 0
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                    tracemalloc.Filter(False, "<unknown>"),
+                )
+            )
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            if start_tracing:
+                tracemalloc.stop()
+            allocations = [
+                (tuple(stat.traceback.format()), stat.size, stat.count)
+                for stat in snapshot.statistics("traceback")[:NB_ALLOCATIONS]
+            ]
+        profiler.create_stats()
+        tile_profiler.profile = TileProfile(
+            profiler.stats,  # type: ignore[attr-defined]
+            allocations,
+            peak_memory,
+        )
+
+
+class _RawStats:
+    """Minimal profiler-like object, to load raw statistics in pstats.Stats."""
+
+    def __init__(self, stats: dict[tuple[str, int, str], Any]) -> None:
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+class AllocationStats:
+    """Aggregated allocations of a site, over all tiles."""
+
+    def __init__(self) -> None:
+        self.size = 0
+        self.count = 0
+        self.max_size = 0
+
+    def add(self, size: int, count: int) -> None:
+        self.size += size
+        self.count += count
+        self.max_size = max(self.max_size, size)
+
+
+def make_allocations_filename(profile_filename: str) -> str:
+    """Name of the allocations report written along the given pstats file."""
+    return f"{os.path.splitext(profile_filename)[0]}_allocations.txt"
+
+
+class ProfileRecorder:
+    """Merge tiles profiles, and write them as a pstats file and an allocations
+    report.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.stats = pstats.Stats()
+        self.allocations: dict[tuple[str, ...], AllocationStats] = {}
+        # Peak traced memory per tile
+        self.peak_memory: dict[str, int] = {}
+
+    def record(self, tile_name: str, profile: TileProfile) -> None:
+        self.stats.add(cast(cProfile.Profile, _RawStats(profile.stats)))
+        for traceback, size, count in profile.allocations:
+            self.allocations.setdefault(traceback, AllocationStats()).add(size, count)
+        if profile.peak_memory:
+            self.peak_memory[tile_name] = max(
+                self.peak_memory.get(tile_name, 0), profile.peak_memory
+            )
+
+    def write(self) -> None:
+        """Write merged statistics, and the allocations report if memory was traced."""
+        self.stats.dump_stats(self.filename)
+        if self.peak_memory:
+            with open(make_allocations_filename(self.filename), "w") as report_file:
+                self.write_allocations(report_file)
+
+    def write_allocations(self, report_file: IO[str]) -> None:
+        report_file.write(
+            "Largest allocation sites still alive at the end of tiles processing\n"
+        )
+        for index, (traceback, allocation) in enumerate(
+            sorted(
+                self.allocations.items(),
+                key=lambda item: item[1].size,
+                reverse=True,
+            ),
+            start=1,
+        ):
+            report_file.write(
+                f"\n#{index}: {allocation.size / 1024:.1f} KiB in"
+                f" {allocation.count} blocks (max {allocation.max_size / 1024:.1f}"
+                " KiB in a tile)\n"
+            )
+            report_file.write("\n".join(traceback) + "\n")
+        report_file.write("\nPeak traced memory per tile\n")
+        for tile_name, peak_memory in sorted(
+            self.peak_memory.items(), key=lambda item: item[1], reverse=True
+        ):
+            report_file.write(f"{peak_memory / 2**20:>10.1f} MiB  {tile_name}\n")
+
+    def summary(self, limit: int = 20) -> str:
+        """Return the top functions by cumulative time."""
+        stream = io.StringIO()
+        self.stats.stream = stream  # type: ignore[attr-defined]
+        self.stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stream.getvalue()
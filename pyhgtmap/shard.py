@@ -0,0 +1,362 @@
+"""Distributed execution of pyhgtmap, splitting a job into independent shards.
+
+A job is first planned: its area (or its input files) is split into shards, each
+shard being given a disjoint range of node and way IDs. Shards can then be
+processed independently, possibly on different machines sharing the plan file, and
+their outputs finally merged into a single file, without renumbering.
+
+Usage:
+    pyhgtmap-shard plan --shards N job.json -- <pyhgtmap options and files>
+    pyhgtmap-shard run-shard job.json <shard index>
+    pyhgtmap-shard merge job.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import sys
+from typing import Any, NamedTuple
+
+from pyhgtmap import BBox
+from pyhgtmap.cli import parse_command_line
+from pyhgtmap.hgt.file import calc_hgt_area
+from pyhgtmap.hgt.manifest import MANIFEST_FILENAME
+from pyhgtmap.logger import configure_logging
+from pyhgtmap.main import INPUT_FILES_EXTENSIONS, process
+from pyhgtmap.output.merge import merge_outputs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NODE_IDS_PER_SHARD = 1_000_000_000
+DEFAULT_WAY_IDS_PER_SHARD = 100_000_000
+
+SHARD_FILENAME = "shard.json"
+
+
+class Shard(NamedTuple):
+    """Part of a job, processed independently."""
+
+    shard_index: int
+    # Area to process, or None when processing input files
+    area: str | None
+    files: list[str]
+    start_id: int
+    start_way_id: int
+
+
+class ShardResult(NamedTuple):
+    """Outcome of a shard processing, stored along with its outputs."""
+
+    shard_index: int
+    input_files: list[str]
+    outputs: list[str]
+    # First and next (unused) IDs
+    node_ids: tuple[int, int]
+    way_ids: tuple[int, int]
+
+
+def split_area(area: BBox, nb_shards: int) -> list[BBox]:
+    """Split an area into longitude bands.
+
+    Bands boundaries are aligned on integer degrees (ie. on input files boundaries)
+    whenever the area is wide enough, so that each input file is loaded by a single
+    shard.
+    """
+    min_lon, min_lat, max_lon, max_lat = area
+    if min_lon > max_lon:
+        raise ValueError("Sharding areas crossing the 180° meridian is not supported")
+    first_degree = math.floor(min_lon)
+    nb_degrees = math.ceil(max_lon) - first_degree
+    if nb_degrees >= nb_shards:
+        edges = [
+            float(first_degree + round(index * nb_degrees / nb_shards))
+            for index in range(1, nb_shards)
+        ]
+    else:
+        edges = [
+            min_lon + index * (max_lon - min_lon) / nb_shards
+            for index in range(1, nb_shards)
+        ]
+    edges = [min_lon, *edges, max_lon]
+    return [
+        BBox(edges[index], min_lat, edges[index + 1], max_lat)
+        for index in range(nb_shards)
+    ]
+
+
+def split_files(files: list[str], nb_shards: int) -> list[list[str]]:
+    """Split files into contiguous groups of (almost) equal sizes."""
+    quotient, remainder = divmod(len(files), nb_shards)
+    groups = []
+    start = 0
+    for index in range(nb_shards):
+        end = start + quotient + (index < remainder)
+        groups.append(files[start:end])
+        start = end
+    return groups
+
+
+def area_string(area: BBox) -> str:
+    return ":".join([str(bound) for bound in area])
+
+
+def positional_indexes(sys_args: list[str], args: list[str]) -> list[int]:
+    """Return the indexes in <sys_args> of the positional arguments <args>.
+
+    Arguments are matched from the end, as positional arguments follow options, whose
+    values may be the same.
+    """
+    indexes: list[int] = []
+    end = len(sys_args)
+    for arg in reversed(args):
+        end = max(index for index in range(end) if sys_args[index] == arg)
+        indexes.append(end)
+    return indexes[::-1]
+
+
+def make_plan(
+    sys_args: list[str],
+    nb_shards: int,
+    node_ids_per_shard: int = DEFAULT_NODE_IDS_PER_SHARD,
+    way_ids_per_shard: int = DEFAULT_WAY_IDS_PER_SHARD,
+) -> dict[str, Any]:
+    """Split a pyhgtmap job into shards.
+
+    Args:
+        sys_args (list[str]): pyhgtmap command line arguments
+        nb_shards (int): number of shards wanted; less shards are planned if there
+            are less input files
+        node_ids_per_shard (int): size of the nodes IDs range reserved per shard
+        way_ids_per_shard (int): size of the ways IDs range reserved per shard
+    """
+    opts, args = parse_command_line(sys_args)
+    files_indexes = [
+        index
+        for index, arg in zip(positional_indexes(sys_args, args), args)
+        if os.path.splitext(arg)[1].lower() in INPUT_FILES_EXTENSIONS
+    ]
+    files = [sys_args[index] for index in files_indexes]
+    areas: list[str | None]
+    files_groups: list[list[str]]
+    if files:
+        files_groups = split_files(files, min(nb_shards, len(files)))
+        areas = [None] * len(files_groups)
+        area = calc_hgt_area(
+            [(file_name, False) for file_name in files],
+            opts.srtmCorrx,
+            opts.srtmCorry,
+        )
+    else:
+        if not opts.area:
+            raise ValueError("opts.area is not defined")
+        area = BBox(*[float(bound) for bound in opts.area.split(":")])
+        areas = [area_string(shard) for shard in split_area(area, nb_shards)]
+        files_groups = [[] for _ in areas]
+    return {
+        # Input files are dispatched to shards
+        "args": [
+            arg for index, arg in enumerate(sys_args) if index not in files_indexes
+        ],
+        "area": area_string(area),
+        "node_ids_per_shard": node_ids_per_shard,
+        "way_ids_per_shard": way_ids_per_shard,
+        "shards": [
+            Shard(
+                index,
+                shard_area,
+                shard_files,
+                opts.startId + index * node_ids_per_shard,
+                opts.startWayId + index * way_ids_per_shard,
+            )._asdict()
+            for index, (shard_area, shard_files) in enumerate(zip(areas, files_groups))
+        ],
+    }
+
+
+def make_shard_dirname(plan_filename: str, index: int) -> str:
+    """Return the directory where shard outputs are stored, along with the plan."""
+    return os.path.join(f"{os.path.splitext(plan_filename)[0]}_shards", f"{index:03d}")
+
+
+def load_plan(plan_filename: str) -> dict[str, Any]:
+    with open(plan_filename) as plan_file:
+        return json.load(plan_file)
+
+
+def run_shard(plan_filename: str, index: int) -> ShardResult:
+    """Process a single shard of a plan."""
+    plan = load_plan(plan_filename)
+    shard = Shard(**plan["shards"][index])
+    opts, args = parse_command_line(plan["args"] + shard.files)
+    configure_logging(opts.logLevel)
+    if shard.area is not None:
+        opts.area = shard.area
+    opts.startId = shard.start_id
+    opts.startWayId = shard.start_way_id
+    shard_dirname = make_shard_dirname(plan_filename, index)
+    os.makedirs(shard_dirname, exist_ok=True)
+    opts.outputPrefix = os.path.join(
+        shard_dirname, os.path.basename(opts.outputPrefix or "") or "shard"
+    )
+
+    processor = process(opts, args)
+    next_node_id = processor.next_node_id.value if processor else shard.start_id
+    next_way_id = processor.next_way_id.value if processor else shard.start_way_id
+    if next_node_id - shard.start_id > plan["node_ids_per_shard"]:
+        raise ValueError(
+            f"Shard {index} used {next_node_id - shard.start_id} node IDs, more than"
+            f" the {plan['node_ids_per_shard']} reserved; plan again with a larger"
+            " --node-ids-per-shard"
+        )
+    if next_way_id - shard.start_way_id > plan["way_ids_per_shard"]:
+        raise ValueError(
+            f"Shard {index} used {next_way_id - shard.start_way_id} way IDs, more than"
+            f" the {plan['way_ids_per_shard']} reserved; plan again with a larger"
+            " --way-ids-per-shard"
+        )
+
+    result = ShardResult(
+        index,
+        processor.input_files if processor else [],
+        sorted(
+            file_name
+            for file_name in glob.glob(os.path.join(shard_dirname, "*"))
+            if not file_name.endswith((SHARD_FILENAME, MANIFEST_FILENAME))
+        ),
+        (shard.start_id, next_node_id),
+        (shard.start_way_id, next_way_id),
+    )
+    with open(os.path.join(shard_dirname, SHARD_FILENAME), "w") as shard_file:
+        json.dump(result._asdict(), shard_file)
+    return result
+
+
+def check_shards(results: list[ShardResult]) -> None:
+    """Ensure shards IDs ranges don't overlap."""
+    for ids_type in ("node_ids", "way_ids"):
+        ranges = sorted(getattr(result, ids_type) for result in results)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            if start < end:
+                raise ValueError(f"Overlapping shards {ids_type}: {ranges}")
+
+
+def merge_shards(plan_filename: str) -> str:
+    """Merge the outputs of all shards of a plan into a single file.
+
+    Returns:
+        str: merged output file name
+    """
+    plan = load_plan(plan_filename)
+    shards_filenames = [
+        os.path.join(
+            make_shard_dirname(plan_filename, shard["shard_index"]), SHARD_FILENAME
+        )
+        for shard in plan["shards"]
+    ]
+    missing = [
+        shard["shard_index"]
+        for shard, shard_filename in zip(plan["shards"], shards_filenames)
+        if not os.path.exists(shard_filename)
+    ]
+    if missing:
+        raise ValueError(f"Shard(s) not processed yet: {missing}")
+    results: list[ShardResult] = []
+    for shard_filename in shards_filenames:
+        with open(shard_filename) as shard_file:
+            results.append(ShardResult(**json.load(shard_file)))
+    check_shards(results)
+
+    input_files = [file_name for result in results for file_name in result.input_files]
+    opts, _ = parse_command_line(plan["args"] + input_files)
+    configure_logging(opts.logLevel)
+    output_name = merge_outputs(
+        opts,
+        input_files,
+        [file_name for result in results for file_name in result.outputs],
+        BBox(*[float(bound) for bound in plan["area"].split(":")]),
+    )
+    logger.info("Merged %d shard(s) into %s", len(results), output_name)
+    return output_name
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="pyhgtmap-shard",
+        description="Split a pyhgtmap job into shards processed independently, and"
+        " merge their outputs.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = subparsers.add_parser(
+        "plan", help="split a job into shards, writing the plan to PLAN_FILE"
+    )
+    plan_parser.add_argument("plan_file", metavar="PLAN_FILE")
+    plan_parser.add_argument(
+        "--shards",
+        help="number of shards to split the job into",
+        type=int,
+        required=True,
+        dest="nb_shards",
+    )
+    plan_parser.add_argument(
+        "--node-ids-per-shard",
+        help="size of the node IDs range reserved for each shard",
+        type=int,
+        default=DEFAULT_NODE_IDS_PER_SHARD,
+    )
+    plan_parser.add_argument(
+        "--way-ids-per-shard",
+        help="size of the way IDs range reserved for each shard",
+        type=int,
+        default=DEFAULT_WAY_IDS_PER_SHARD,
+    )
+    plan_parser.add_argument(
+        "pyhgtmap_args",
+        nargs=argparse.REMAINDER,
+        help="pyhgtmap options and input files, after '--'",
+    )
+
+    run_parser = subparsers.add_parser("run-shard", help="process a single shard")
+    run_parser.add_argument("plan_file", metavar="PLAN_FILE")
+    run_parser.add_argument("index", type=int, help="index of the shard to process")
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="merge the outputs of all shards into a single file"
+    )
+    merge_parser.add_argument("plan_file", metavar="PLAN_FILE")
+    return parser
+
+
+def main_internal(sys_args: list[str]) -> None:
+    args = build_parser().parse_args(sys_args)
+    if args.command == "plan":
+        pyhgtmap_args = args.pyhgtmap_args
+        if pyhgtmap_args[:1] == ["--"]:
+            pyhgtmap_args = pyhgtmap_args[1:]
+        plan = make_plan(
+            pyhgtmap_args,
+            args.nb_shards,
+            args.node_ids_per_shard,
+            args.way_ids_per_shard,
+        )
+        with open(args.plan_file, "w") as plan_file:
+            json.dump(plan, plan_file, indent=2)
+        print(f"Planned {len(plan['shards'])} shard(s) in {args.plan_file}")
+    elif args.command == "run-shard":
+        run_shard(args.plan_file, args.index)
+    else:
+        print(merge_shards(args.plan_file))
+
+
+def main() -> None:
+    """Parameter-less entry point, required for python packaging scripts"""
+    main_internal(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    main()
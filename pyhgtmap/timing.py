@@ -0,0 +1,178 @@
+"""Per-stage timing instrumentation.
+
+Durations are accumulated per stage in the timer active in the current thread (if
+any), so that deeply nested code can be instrumented without threading a timer
+through all calls; when no timer is active, instrumentation costs only a lookup.
+Workers return the durations of their tiles to the parent process, which records
+them along with its own ones.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import IO, TYPE_CHECKING, Any
+
+from pyhgtmap import tracing
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# Stages, in processing order
+FILE_LOAD = "file load"
+VOID_MASK = "void mask"
+SMOOTHING = "smoothing"
+POLYGON_MASK = "polygon mask"
+TILING = "tiling"
+CONTOUR_TRACING = "contour tracing"
+SIMPLIFICATION = "simplification"
+SPLIT = "split"
+NODE_WRITE = "node write"
+WAY_WRITE = "way write"
+FINALIZE = "finalize"
+STAGES = (
+    FILE_LOAD,
+    VOID_MASK,
+    SMOOTHING,
+    POLYGON_MASK,
+    TILING,
+    CONTOUR_TRACING,
+    SIMPLIFICATION,
+    SPLIT,
+    NODE_WRITE,
+    WAY_WRITE,
+    FINALIZE,
+)
+
+_local = threading.local()
+
+
+class StageTimer:
+    """Durations accumulated per stage, in seconds."""
+
+    def __init__(self) -> None:
+        self.durations: dict[str, float] = {}
+
+    def add(self, stage: str, duration: float) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + duration
+
+    def update(self, durations: dict[str, float]) -> None:
+        for stage, duration in durations.items():
+            self.add(stage, duration)
+
+
+def active_timer() -> StageTimer | None:
+    """Return the timer active in the current thread, if any."""
+    return getattr(_local, "timer", None)
+
+
+@contextmanager
+def timed_scope(enabled: bool = True) -> Iterator[StageTimer | None]:
+    """Activate a new timer in the current thread for the duration of the block.
+
+    Yields:
+        Iterator[StageTimer | None]: the timer, or None if not enabled
+    """
+    if not enabled:
+        yield None
+        return
+    previous = active_timer()
+    timer = StageTimer()
+    _local.timer = timer
+    try:
+        yield timer
+    finally:
+        _local.timer = previous
+
+
+def add_stage(stage: str, duration: float) -> None:
+    """Account a duration measured by the caller to a stage of the active timer."""
+    timer = active_timer()
+    if timer is not None:
+        timer.add(stage, duration)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Account the duration of the block to a stage of the active timer, and
+    record it as a span if tracing.
+    """
+    timer = active_timer()
+    with tracing.span(name, "stage"):
+        if timer is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timer.add(name, time.perf_counter() - start)
+
+
+class StageStats:
+    """Aggregated durations of a stage."""
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, duration: float) -> None:
+        self.total += duration
+        self.count += 1
+        self.max = max(self.max, duration)
+
+
+class TimingsRecorder:
+    """Write timing records to a JSON lines file, and aggregate them per stage."""
+
+    def __init__(self, filename: str) -> None:
+        self.file: IO[str] = open(filename, "w")  # noqa: SIM115
+        # Files are loaded (and recorded) by prefetching threads
+        self.lock = threading.Lock()
+        self.stats: dict[str, StageStats] = {}
+        self.start_time = time.perf_counter()
+
+    def record(self, kind: str, durations: dict[str, float], **fields: Any) -> None:
+        """Write a record of given kind (eg. "file" or "tile").
+
+        Args:
+            kind (str): kind of the timed item
+            durations (dict[str, float]): durations per stage, in seconds
+            fields: description of the timed item
+        """
+        with self.lock:
+            self.file.write(
+                json.dumps({"type": kind, **fields, "stages": durations}) + "\n"
+            )
+            for stage_name, duration in durations.items():
+                self.stats.setdefault(stage_name, StageStats()).add(duration)
+
+    def summary(self) -> str:
+        """Return a table of durations aggregated per stage."""
+        wall_time = time.perf_counter() - self.start_time
+        total = sum(stats.total for stats in self.stats.values())
+        lines = [
+            f"{'Stage':<16} {'Total (s)':>10} {'Share':>7} {'Count':>7}"
+            f" {'Mean (ms)':>10} {'Max (ms)':>10}"
+        ]
+        for stage_name in [
+            *STAGES,
+            *sorted(set(self.stats).difference(STAGES)),
+        ]:
+            stats = self.stats.get(stage_name)
+            if stats is None:
+                continue
+            share = stats.total / total if total else 0.0
+            lines.append(
+                f"{stage_name:<16} {stats.total:>10.3f} {share:>7.1%}"
+                f" {stats.count:>7d} {stats.total / stats.count * 1000:>10.2f}"
+                f" {stats.max * 1000:>10.2f}"
+            )
+        lines.append(f"{'all stages':<16} {total:>10.3f}; wall time: {wall_time:.3f} s")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        self.file.close()
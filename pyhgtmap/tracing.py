@@ -0,0 +1,135 @@
+"""Timeline tracing, in Chrome trace event format (viewable in Perfetto).
+
+Each process records complete events (spans) for files, tiles and processing
+stages. Workers hand their events over to the parent process along with the
+results of their tasks, so that the parent writes a single trace of all processes.
+Timestamps come from the monotonic clock, shared by all processes of a host.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+def now_us() -> float:
+    """Current timestamp, in microseconds."""
+    return time.monotonic_ns() / 1000
+
+
+class Tracer:
+    """Trace events recorded by a process."""
+
+    def __init__(self, process_name: str) -> None:
+        self.pid = os.getpid()
+        self.events: list[dict[str, Any]] = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self.pid,
+                "args": {"name": f"{process_name} ({self.pid})"},
+            }
+        ]
+        # Threads already named in the trace
+        self.threads: set[int] = set()
+        self.lock = threading.Lock()
+
+    def complete(
+        self, name: str, start: float, end: float, category: str, args: dict[str, Any]
+    ) -> None:
+        """Record a span of the current thread, from <start> to <end> (in µs)."""
+        thread = threading.current_thread()
+        tid = thread.native_id or 0
+        with self.lock:
+            if tid not in self.threads:
+                self.threads.add(tid)
+                self.events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": self.pid,
+                        "tid": tid,
+                        "args": {"name": thread.name},
+                    }
+                )
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": start,
+                    "dur": end - start,
+                    "pid": self.pid,
+                    "tid": tid,
+                    "args": args,
+                }
+            )
+
+    def drain(self) -> list[dict[str, Any]]:
+        """Return recorded events, and forget them."""
+        with self.lock:
+            events, self.events = self.events, []
+        return events
+
+    def extend(self, events: list[dict[str, Any]]) -> None:
+        """Add events recorded by another process."""
+        with self.lock:
+            self.events.extend(events)
+
+    def write(self, filename: str) -> None:
+        with open(filename, "w") as trace_file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, trace_file)
+
+
+# Tracer of the current process, if tracing is enabled
+_tracer: Tracer | None = None
+
+
+def start_tracing(process_name: str) -> Tracer:
+    """Enable tracing in the current process."""
+    global _tracer
+    _tracer = Tracer(process_name)
+    return _tracer
+
+
+def stop_tracing() -> Tracer | None:
+    """Disable tracing in the current process, returning the tracer used."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def active_tracer() -> Tracer | None:
+    return _tracer
+
+
+def drain_events() -> list[dict[str, Any]] | None:
+    """Return events recorded so far by the current process, if tracing."""
+    return _tracer.drain() if _tracer is not None else None
+
+
+def add_events(events: list[dict[str, Any]] | None) -> None:
+    """Add events recorded by another process, if tracing."""
+    if _tracer is not None and events:
+        _tracer.extend(events)
+
+
+@contextmanager
+def span(name: str, category: str = "", **args: Any) -> Iterator[None]:
+    """Record the block as a span of the current thread, if tracing."""
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+    start = now_us()
+    try:
+        yield
+    finally:
+        tracer.complete(name, start, now_us(), category, args)
@@ -1,3 +1,8 @@
+from __future__ import annotations
+
+import numpy
+
+
 def int2str(n) -> bytes:
     b = n & 127
     n >>= 7
@@ -10,6 +15,20 @@ def int2str(n) -> bytes:
     return bytes(s)
 
 
+def str2int(data, pos=0) -> tuple[int, int]:
+    """decodes the varint starting at <pos> in <data>; returns its value and the
+    position following it."""
+    n = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 127) << shift
+        if b < 128:
+            return n, pos
+        shift += 7
+
+
 def sint2str(n) -> bytes:
     if n > -1:
         # 0 or positive, shift 1 to the left
@@ -21,6 +40,91 @@ def sint2str(n) -> bytes:
     return int2str(n)
 
 
+def zigzag(values: numpy.ndarray) -> numpy.ndarray:
+    """maps signed int64 <values> to unsigned ones as sint2str() does: 0, -1, 1, -2…
+    become 0, 1, 2, 3…"""
+    values = numpy.asarray(values, dtype=numpy.int64)
+    return ((values << 1) ^ (values >> 63)).view(numpy.uint64)
+
+
+def unzigzag(values: numpy.ndarray) -> numpy.ndarray:
+    """maps unsigned <values> back to signed int64 ones, reversing zigzag()."""
+    values = numpy.asarray(values, dtype=numpy.uint64)
+    return (values >> numpy.uint64(1)).view(numpy.int64) ^ -(
+        values & numpy.uint64(1)
+    ).view(numpy.int64)
+
+
+def varint_lengths(values: numpy.ndarray) -> numpy.ndarray:
+    """returns the number of bytes of the varint encoding of each unsigned value."""
+    values = numpy.asarray(values, dtype=numpy.uint64)
+    lengths = numpy.ones(values.shape, dtype=numpy.int64)
+    for shift in range(7, 64, 7):
+        lengths += values >= numpy.uint64(1 << shift)
+    return lengths
+
+
+def int_array2str(values: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """varint encodes unsigned <values>, as int2str() does for each of them.
+
+    Returns the concatenated encodings, as an uint8 array, and the length of each
+    of them."""
+    values = numpy.asarray(values, dtype=numpy.uint64).ravel()
+    lengths = varint_lengths(values)
+    if not values.size:
+        return numpy.empty(0, dtype=numpy.uint8), lengths
+    # One column per group of 7 bits, least significant first
+    positions = numpy.arange(lengths.max())
+    groups = (
+        values[:, numpy.newaxis] >> (7 * positions).astype(numpy.uint64)
+    ) & numpy.uint64(127)
+    # All groups but the last one of a value have the continuation bit
+    groups[positions < lengths[:, numpy.newaxis] - 1] |= numpy.uint64(128)
+    return (
+        groups[positions < lengths[:, numpy.newaxis]].astype(numpy.uint8),
+        lengths,
+    )
+
+
+def sint_array2str(values: numpy.ndarray) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """varint encodes signed <values>, as sint2str() does for each of them."""
+    return int_array2str(zigzag(values))
+
+
+def str2int_array(data) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """decodes the concatenated varints of <data> (bytes-like or uint8 array), as
+    str2int() does for each of them.
+
+    Returns their values, as an uint64 array, and the length of each of them."""
+    data = (
+        data.astype(numpy.uint8, copy=False)
+        if isinstance(data, numpy.ndarray)
+        else numpy.frombuffer(data, dtype=numpy.uint8)
+    )
+    # Each value ends with the first byte without the continuation bit
+    ends = numpy.flatnonzero(data < 128)
+    if data.size and (not ends.size or ends[-1] != data.size - 1):
+        raise ValueError("Truncated varint at the end of data")
+    lengths = numpy.diff(ends, prepend=-1)
+    # 10 bytes hold 70 bits: only the lowest one of the last byte fits in 64 bits
+    if lengths.size and (lengths.max() > 10 or (data[ends[lengths == 10]] > 1).any()):
+        raise ValueError("Varint too long for a 64 bits value")
+    starts = ends + 1 - lengths
+    if not data.size:
+        return numpy.empty(0, dtype=numpy.uint64), lengths
+    # Position of each byte in its value, least significant first
+    positions = numpy.arange(data.size) - numpy.repeat(starts, lengths)
+    groups = (data & 127).astype(numpy.uint64) << (7 * positions).astype(numpy.uint64)
+    return numpy.bitwise_or.reduceat(groups, starts), lengths
+
+
+def str2sint_array(data) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """decodes the concatenated signed varints of <data>, as written by
+    sint_array2str(); returns their values, as an int64 array, and lengths."""
+    values, lengths = str2int_array(data)
+    return unzigzag(values), lengths
+
+
 def str2bytes(string, encoding="utf-8") -> bytes:
     return bytes(string, encoding=encoding)
 
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+import numpy
+import pytest
+
+from pyhgtmap.benchmark.dem import (
+    VOID_VALUE,
+    DemSpec,
+    fractal_surface,
+    generate_dem,
+    make_dem,
+)
+from pyhgtmap.hgt.file import HgtFile
+from tests.hgt import handle_optional_geotiff_support
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_fractal_surface() -> None:
+    rng = numpy.random.default_rng(0)
+    smooth = fractal_surface(101, 0.0, rng)
+    rough = fractal_surface(101, 1.0, rng)
+    assert smooth.shape == (101, 101)
+    assert smooth.min() == 0
+    assert smooth.max() == 1
+    # Rougher surfaces vary more between neighbor points
+    assert numpy.abs(numpy.diff(rough)).mean() > numpy.abs(numpy.diff(smooth)).mean()
+    with pytest.raises(ValueError, match="Roughness"):
+        fractal_surface(101, 1.5, rng)
+
+
+def test_make_dem() -> None:
+    spec = DemSpec(size=201, void_fraction=0.1, seed=1)
+    elevations = make_dem(spec)
+    assert elevations.dtype == numpy.int16
+    assert elevations.shape == (201, 201)
+    voids = elevations == VOID_VALUE
+    assert voids.mean() == pytest.approx(0.1, abs=0.01)
+    assert elevations[~voids].min() >= spec.min_elevation
+    assert elevations[~voids].max() <= spec.max_elevation
+    # Reproducible
+    numpy.testing.assert_array_equal(make_dem(spec), elevations)
+    assert not numpy.array_equal(make_dem(spec._replace(seed=2)), elevations)
+
+
+def test_dem_spec_name() -> None:
+    assert DemSpec().name == "hgt-1201-r0.50-v0.00-s0"
+    assert DemSpec(epsg=3857, void_fraction=0.05).name == "tiff3857-1201-r0.50-v0.05-s0"
+
+
+def test_generate_hgt(tmp_path: Path) -> None:
+    spec = DemSpec(size=121, void_fraction=0.05)
+    filename = generate_dem(str(tmp_path), spec)
+    assert os.path.basename(filename) == "N45E006.hgt"
+    hgt_file = HgtFile(filename, 0, 0)
+    assert (hgt_file.numOfCols, hgt_file.numOfRows) == (121, 121)
+    assert (hgt_file.minLon, hgt_file.minLat) == (6, 45)
+    numpy.testing.assert_array_equal(hgt_file.zData.mask, make_dem(spec) == VOID_VALUE)
+
+
+@pytest.mark.parametrize("epsg", [4326, 3857])
+def test_generate_geotiff(tmp_path: Path, epsg: int) -> None:
+    with handle_optional_geotiff_support():
+        filename = generate_dem(str(tmp_path), DemSpec(size=121, epsg=epsg))
+        hgt_file = HgtFile(filename, 0, 0)
+        assert (hgt_file.numOfCols, hgt_file.numOfRows) == (121, 121)
+        assert (hgt_file.transform is None) == (epsg == 4326)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+from pyhgtmap.benchmark import cli, suite
+from pyhgtmap.benchmark.dem import DemSpec, generate_dem
+from pyhgtmap.benchmark.suite import StageResult
+from pyhgtmap.cli import parse_command_line
+from pyhgtmap.planner import DEFAULT_CALIBRATION, load_calibration
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_run_benchmark(tmp_path: Path) -> None:
+    filename = generate_dem(str(tmp_path), DemSpec(size=241, void_fraction=0.05))
+    opts, _ = parse_command_line(["--step=100", "--max-nodes-per-tile=2000", filename])
+    result = suite.run_benchmark(filename, opts, ["osm", "pbf", "o5m"], repeat=2)
+    results = result.stages
+
+    assert [result.stage for result in results] == [
+        suite.LOAD,
+        suite.MAKE_TILES,
+        suite.CONTOURS,
+        "write osm",
+        "write pbf",
+        "write o5m",
+    ]
+    assert all(result.seconds > 0 for result in results)
+    contours = results[2]
+    assert contours.nb_nodes > 0
+    assert contours.nb_bytes == 241 * 241 * 2
+    for write_result in results[3:]:
+        assert write_result.nb_nodes == contours.nb_nodes
+        assert write_result.nb_bytes > 0
+    # Outputs are removed
+    assert [path.name for path in tmp_path.iterdir()] == ["N45E006.hgt"]
+    assert result.stats.nb_nodes == contours.nb_nodes
+    assert result.stats.nb_points >= 241 * 241
+    assert 0 < result.stats.nb_ways < result.stats.nb_nodes
+    assert result.stats.estimated_nb_nodes > 0
+
+    calibration = suite.make_calibration(result)
+    assert calibration.nodes_per_estimated_node == pytest.approx(
+        result.stats.nb_nodes / result.stats.estimated_nb_nodes
+    )
+    assert calibration.bytes_per_node["pbf"] == pytest.approx(
+        results[4].nb_bytes / contours.nb_nodes
+    )
+    # Not benchmarked format keeps default coefficients
+    assert (
+        calibration.bytes_per_node["gzip"] == DEFAULT_CALIBRATION.bytes_per_node["gzip"]
+    )
+    # Calibrated cost model matches the measured contours time
+    assert calibration.tile_cost_coefficients[0] * result.stats.nb_points + (
+        calibration.tile_cost_coefficients[1] * result.stats.estimated_nb_nodes
+    ) == pytest.approx(contours.seconds)
+
+
+def test_make_calibration_no_contours() -> None:
+    result = suite.BenchmarkResult(
+        [StageResult(suite.CONTOURS, 1.0, 0, 0)], suite.DemStats(100, 0.0, 0, 0)
+    )
+    with pytest.raises(ValueError, match="without any contour"):
+        suite.make_calibration(result)
+
+
+def test_baselines(tmp_path: Path) -> None:
+    filename = str(tmp_path / "baselines.json")
+    assert suite.load_baselines(filename) == {}
+    results = [
+        StageResult("load", 1.0, 0, 2_000_000),
+        StageResult("contours", 2.0, 1000, 0),
+    ]
+    suite.save_baseline(filename, "A", results)
+    suite.save_baseline(filename, "B", results[:1])
+    baselines = suite.load_baselines(filename)
+    assert set(baselines) == {"A", "B"}
+    assert baselines["A"]["stages"] == {"load": 1.0, "contours": 2.0}
+    assert baselines["A"]["environment"]["python"]
+
+    slower = [StageResult("load", 1.05, 0, 0), StageResult("contours", 3.0, 1000, 0)]
+    (regression,) = suite.compare(slower, baselines["A"], tolerance=0.1)
+    assert regression.stage == "contours"
+    assert regression.ratio == 1.5
+    # Stages without baseline are ignored
+    assert suite.compare(slower, baselines["B"], tolerance=0.1) == []
+
+    lines = suite.report(slower, baselines["A"]).splitlines()
+    assert lines[1].split() == ["load", "1.050", "0", "0.00", "1.000", "+5.0%"]
+    assert lines[2].split()[2] == "333"
+    assert suite.report(results).splitlines()[1].split() == [
+        "load",
+        "1.000",
+        "0",
+        "2.00",
+    ]
+
+
+def test_main(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    baselines = str(tmp_path / "baselines.json")
+    args = [
+        "run",
+        "--size=121",
+        "--repeat=1",
+        "--formats=o5m",
+        f"--baselines={baselines}",
+    ]
+    cli.main_internal([*args, "--save-baseline", "--", "--step=100"])
+    with open(baselines) as baselines_file:
+        (name,) = json.load(baselines_file)
+    assert name == "hgt-121-r0.50-v0.00-s0 --step=100"
+
+    # Make the baseline unreachable
+    with open(baselines) as baselines_file:
+        baseline = json.load(baselines_file)
+    baseline[name]["stages"]["write o5m"] = 1e-9
+    with open(baselines, "w") as baselines_file:
+        json.dump(baseline, baselines_file)
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main_internal([*args, "--", "--step=100"])
+    assert exit_info.value.code == 1
+    assert "Regression: write o5m" in capsys.readouterr().out
+
+    with pytest.raises(SystemExit, match="Unknown output format: xml"):
+        cli.main_internal(["run", "--formats=xml"])
+
+
+def test_main_calibration(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    input_filename = generate_dem(str(tmp_path), DemSpec(size=121))
+    calibration_filename = str(tmp_path / "calibration.json")
+    cli.main_internal(
+        [
+            "run",
+            f"--input={input_filename}",
+            "--repeat=1",
+            "--formats=pbf",
+            f"--baselines={tmp_path / 'baselines.json'}",
+            f"--calibration={calibration_filename}",
+            "--",
+            "--step=100",
+        ]
+    )
+    out = capsys.readouterr().out
+    assert "Benchmark: N45E006.hgt --step=100" in out
+    assert f"Calibration saved in {calibration_filename}" in out
+    calibration = load_calibration(calibration_filename)
+    assert calibration.bytes_per_node["pbf"] > 0
+    assert (
+        calibration.write_seconds_per_node["osm"]
+        == DEFAULT_CALIBRATION.write_seconds_per_node["osm"]
+    )
+
+
+def test_generate(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    cli.main_internal(["generate", "--size=121", str(tmp_path)])
+    assert capsys.readouterr().out.strip() == str(tmp_path / "N45E006.hgt")
@@ -2,23 +2,35 @@ from __future__ import annotations
 
 import os
 from typing import TYPE_CHECKING
+from unittest import mock
 
 import numpy
 import pytest
+import shapely
+from scipy import ndimage
 
 from pyhgtmap import Polygon, PolygonsList, hgt
 from pyhgtmap.configuration import Configuration
 from pyhgtmap.hgt.file import (
+    GEOTIFF_INDEX_FILENAME,
+    GeotiffMetadata,
+    GeotiffMetadataIndex,
     HgtFile,
     HgtTile,
     calc_hgt_area,
     clip_polygons,
+    compact_elevations,
+    elevation_differences_per_row,
     polygon_mask,
+    rasterize_polygons,
+    super_sample,
 )
 from tests import TEST_DATA_PATH
 from tests.hgt import handle_optional_geotiff_support
 
 if TYPE_CHECKING:
+    from pathlib import Path
+
     from pyhgtmap import BBox
 
 HGT_SIZE: int = 1201
@@ -109,6 +121,44 @@ class TestHgtFile:
             "tile with 421 x 961 points, bbox: (6.20, 43.45, 7.00, 43.80); minimum elevation: -12.00; maximum elevation: 1703.00",
         ]
 
+    @staticmethod
+    def test_make_tiles_polygon() -> None:
+        """Polygon mask is computed once per file, and sliced for each tile."""
+        # Triangle covering the upper half of the file
+        polygon: Polygon = [(5.5, 43.5), (7.5, 43.5), (6.5, 44.5), (5.5, 43.5)]
+        hgt_file = HgtFile(
+            os.path.join(TEST_DATA_PATH, "N43E006.hgt"),
+            0,
+            0,
+            polygons=[polygon],
+            checkPoly=True,
+        )
+        custom_options = Configuration(
+            area=None,
+            maxNodesPerTile=100000,
+            contourStepSize=20,
+        )
+        with mock.patch(
+            "pyhgtmap.hgt.file.polygon_mask", wraps=polygon_mask
+        ) as polygon_mask_mock:
+            tiles: list[HgtTile] = hgt_file.make_tiles(custom_options)
+        polygon_mask_mock.assert_called_once()
+        # Tiles of the lower half are fully outside of the polygon
+        assert min(tile.minLat for tile in tiles) == pytest.approx(43.5)
+        for tile in tiles:
+            if tile.mask is None:
+                # Fully inside tile
+                assert tile.polygons is None
+            else:
+                assert tile.polygons == [polygon]
+                assert tile.mask.shape == tile.zData.shape
+                numpy.testing.assert_array_equal(
+                    tile.mask,
+                    polygon_mask(tile.xData, tile.yData, [polygon], None),
+                )
+        # Upper (narrowest) part of the triangle must be partially masked
+        assert tiles[-1].mask is not None
+
     @staticmethod
     def test_make_tiles_fully_masked() -> None:
         """No tile should be generated out of a fully masked input."""
@@ -150,6 +200,26 @@ class TestHgtFile:
             assert hgt_file.transform is None
             assert hgt_file.polygons is None
 
+    @staticmethod
+    def test_init_compact_storage() -> None:
+        """Integer elevations must be kept as int16 until contouring."""
+        hgt_file = HgtFile(os.path.join(TEST_DATA_PATH, "N43E006.hgt"), 0, 0)
+        assert hgt_file.zData.dtype == numpy.int16
+        assert hgt_file.zData.mask.dtype == numpy.bool_
+        assert hgt_file.zScale == 1
+
+    @staticmethod
+    def test_make_tiles_feet() -> None:
+        """Feet conversion is applied on the fly on compact data."""
+        hgt_file = HgtFile(
+            os.path.join(TEST_DATA_PATH, "N43E006.hgt"), 0, 0, feetSteps=True
+        )
+        assert hgt_file.zData.dtype == numpy.int16
+        options = Configuration(area=None, maxNodesPerTile=0, contourStepSize=20)
+        tiles: list[HgtTile] = hgt_file.make_tiles(options)
+        assert len(tiles) == 1
+        assert (tiles[0].minEle, tiles[0].maxEle) == (-39, 6309)
+
     @staticmethod
     def test_init_geotiff_transform() -> None:
         """Validate init from geotiff in EPSG 3857 projection."""
@@ -179,6 +249,33 @@ class TestHgtFile:
             ) == (MIN_LON, MIN_LAT, MAX_LON, MAX_LAT)
 
 
+@pytest.mark.parametrize(
+    ("raw_data", "expected_dtype"),
+    [
+        pytest.param(
+            numpy.array([[-32768, 0, 8848]], dtype=">i2"), numpy.int16, id="HGT"
+        ),
+        pytest.param(
+            numpy.array([[0, 4000]], dtype=numpy.uint16), numpy.int16, id="uint16"
+        ),
+        pytest.param(
+            numpy.array([[0, 40000]], dtype=numpy.int32),
+            numpy.float32,
+            id="int32 out of range",
+        ),
+        pytest.param(
+            numpy.array([[0.5, 12.25]], dtype=numpy.float64), numpy.float32, id="float"
+        ),
+    ],
+)
+def test_compact_elevations(
+    raw_data: numpy.ndarray, expected_dtype: numpy.dtype
+) -> None:
+    compact_data = compact_elevations(raw_data)
+    assert compact_data.dtype == expected_dtype
+    numpy.testing.assert_array_equal(compact_data, raw_data)
+
+
 def test_polygon_mask() -> None:
     x_data = numpy.array([0, 1, 2, 3, 4, 5])
     y_data = numpy.array([0, 1, 2, 3, 4, 5])
@@ -277,6 +374,32 @@ def test_polygon_mask() -> None:
     numpy.testing.assert_array_equal(mask_out, numpy.full((1), True))
 
 
+@pytest.mark.parametrize(
+    "y_step",
+    [
+        pytest.param(1, id="Ascending rows"),
+        pytest.param(-1, id="Descending rows"),
+    ],
+)
+def test_rasterize_polygons(y_step: int) -> None:
+    """Scanline rasterization must match a point-in-polygon test."""
+    x_data = numpy.arange(0.25, 20, 0.5)
+    y_data = numpy.arange(0.25, 20, 0.5)[::y_step]
+    polygons: PolygonsList = [
+        # Concave polygon, not explicitly closed, with a horizontal edge
+        [(1, 1), (18, 2), (10, 10), (18, 18), (1, 18), (5, 10)],
+        # Small triangle overlapping the first polygon
+        [(15, 8), (19.9, 8), (19.9, 12), (15, 8)],
+    ]
+    inside = rasterize_polygons(x_data, y_data, polygons)
+
+    x, y = numpy.meshgrid(x_data, y_data)
+    expected = shapely.contains_xy(
+        shapely.MultiPolygon([shapely.Polygon(p) for p in polygons]).buffer(0), x, y
+    )
+    numpy.testing.assert_array_equal(inside, expected)
+
+
 @pytest.mark.parametrize(
     "file_name",
     ["N43E006.hgt", "N43E006.tiff"],
@@ -355,3 +478,65 @@ def test_clip_polygons() -> None:
             (0.4, 49.9),
         ],
     ]
+
+
+@pytest.mark.parametrize("nb_rows", [1, 255, 256, 257, 600])
+def test_elevation_differences_per_row(nb_rows: int) -> None:
+    """Blockwise per-row differences match a direct computation on the whole data."""
+    rng = numpy.random.default_rng(42)
+    values = rng.integers(-500, 3000, size=(nb_rows, 40)).astype(numpy.int16)
+    data = numpy.ma.array(values, mask=rng.random(values.shape) < 0.2)
+    horizontal, vertical = elevation_differences_per_row(data)
+    # Reference: masked differences (void pairs are masked out)
+    as_float = data.astype(numpy.float64)
+    expected_horizontal = numpy.ma.abs(numpy.ma.diff(as_float, axis=1)).sum(axis=1)
+    expected_vertical = numpy.ma.abs(numpy.ma.diff(as_float, axis=0)).sum(axis=1)
+    numpy.testing.assert_allclose(horizontal, expected_horizontal.filled(0))
+    numpy.testing.assert_allclose(vertical, expected_vertical.filled(0))
+
+
+@pytest.mark.parametrize("zoom_level", [1.5, 2, 3])
+@pytest.mark.parametrize("block_size", [1000, 10000, 10**8])
+def test_super_sample(zoom_level: float, block_size: int) -> None:
+    """Block-wise super sampling matches zooming the whole data at once."""
+    rng = numpy.random.default_rng(42)
+    data = numpy.cumsum(rng.integers(-20, 20, size=(150, 120)), axis=0).astype(
+        numpy.int16
+    )
+    mask = rng.random(data.shape) < 0.1
+    out_data, out_mask = super_sample(
+        data, mask, zoom_level, block_size=block_size, max_workers=2
+    )
+    expected_data = numpy.clip(
+        numpy.around(ndimage.zoom(data.astype(numpy.float32), zoom_level, order=3)),
+        -0x8000,
+        0x7FFF,
+    ).astype(numpy.int16)
+    assert out_data.dtype == numpy.int16
+    numpy.testing.assert_array_equal(out_data, expected_data)
+    numpy.testing.assert_array_equal(out_mask, ndimage.zoom(mask, zoom_level, order=0))
+
+
+def test_geotiff_metadata_index(tmp_path: Path) -> None:
+    """Metadata are read once, persisted, and read again only for modified files."""
+    file_name = tmp_path / "dem.tiff"
+    file_name.write_bytes(b"fake")
+    metadata = GeotiffMetadata((5.0, 0.1, 0.0, 45.0, 0.0, -0.1), "WKT", 10, 20)
+    with mock.patch(
+        "pyhgtmap.hgt.file.read_geotiff_metadata", return_value=metadata
+    ) as read_mock:
+        index = GeotiffMetadataIndex()
+        assert index.get(str(file_name)) == metadata
+        assert index.get(str(file_name)) == metadata
+        read_mock.assert_called_once()
+        index.save()
+        assert (tmp_path / GEOTIFF_INDEX_FILENAME).exists()
+
+        # Reloaded from sidecar index
+        assert GeotiffMetadataIndex().get(str(file_name)) == metadata
+        read_mock.assert_called_once()
+
+        # Modified file must be read again
+        file_name.write_bytes(b"modified")
+        assert GeotiffMetadataIndex().get(str(file_name)) == metadata
+        assert read_mock.call_count == 2
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+from pyhgtmap import BBox
+from pyhgtmap.configuration import Configuration
+from pyhgtmap.hgt.manifest import (
+    MISSING_INPUT,
+    TILE_DONE,
+    TILE_FAILED,
+    JobManifest,
+    file_fingerprint,
+    make_manifest_filename,
+    options_fingerprint,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+BBOX_1 = BBox(6.0, 43.0, 7.0, 43.5)
+BBOX_2 = BBox(6.0, 43.5, 7.0, 44.0)
+BBOX_3 = BBox(7.0, 43.0, 8.0, 44.0)
+
+
+def test_make_manifest_filename() -> None:
+    assert (
+        make_manifest_filename(Configuration(outputPrefix=None))
+        == "pyhgtmap_manifest.jsonl"
+    )
+    assert (
+        make_manifest_filename(Configuration(outputPrefix="out/alps"))
+        == "out/alps_pyhgtmap_manifest.jsonl"
+    )
+
+
+def test_options_fingerprint() -> None:
+    """Only options impacting output change the fingerprint."""
+    options = Configuration(contourStepSize="20", nJobs=1)
+    fingerprint = options_fingerprint(options)
+    options.nJobs = 8
+    assert options_fingerprint(options) == fingerprint
+    options.contourStepSize = "10"
+    assert options_fingerprint(options) != fingerprint
+
+
+def test_resume(tmp_path: Path) -> None:
+    """Only tiles completed with the same options and still existing output are
+    reused.
+    """
+    filename = str(tmp_path / "manifest.jsonl")
+    output_file = str(tmp_path / "tile1.osm")
+    with open(output_file, "w"):
+        pass
+    manifest = JobManifest(filename, "fingerprint", reuse=False)
+    manifest.record("file1.hgt", BBOX_1, TILE_DONE, output_file, 100, 10, 200, 2)
+    manifest.record("file1.hgt", BBOX_2, TILE_FAILED)
+    manifest.record("file2.hgt", BBOX_3, TILE_DONE)
+    manifest.record("file1.hgt", BBOX_3, TILE_DONE, str(tmp_path / "missing.osm"))
+    manifest.close()
+    # Record truncated by a crash
+    with open(filename, "a") as manifest_file:
+        manifest_file.write('{"input_file": "fil')
+
+    manifest = JobManifest(filename, "fingerprint", reuse=True)
+    manifest.close()
+    record = manifest.completed_tile("file1.hgt", BBOX_1)
+    assert record is not None
+    assert (record.output_file, record.node_start_id, record.nb_nodes) == (
+        output_file,
+        100,
+        10,
+    )
+    assert manifest.completed_tile("file1.hgt", BBOX_2) is None
+    assert manifest.completed_tile("file2.hgt", BBOX_3) is not None
+    assert manifest.completed_tile("file1.hgt", BBOX_3) is None
+    # Manifest is rewritten with reusable records only
+    with open(filename) as manifest_file:
+        assert len(manifest_file.readlines()) == 2
+
+    # Other options
+    manifest = JobManifest(filename, "other fingerprint", reuse=True)
+    manifest.close()
+    assert not manifest.completed
+
+    # No manifest to resume from
+    os.remove(filename)
+    manifest = JobManifest(filename, "fingerprint", reuse=True)
+    manifest.close()
+    assert not manifest.completed
+
+
+def test_incremental(tmp_path: Path) -> None:
+    """Tiles of changed input files are not reused, and their outputs are removed
+    unless generated again.
+    """
+    filename = str(tmp_path / "manifest.jsonl")
+    input_files = [str(tmp_path / f"file{index}.hgt") for index in range(2)]
+    output_files = [str(tmp_path / f"tile{index}.osm") for index in range(3)]
+    for file_name in input_files + output_files:
+        with open(file_name, "w") as output_file:
+            output_file.write(file_name)
+    manifest = JobManifest(filename, "fingerprint", reuse=False)
+    manifest.record_file(input_files[0], 1)
+    manifest.record(input_files[0], BBOX_1, TILE_DONE, output_files[0], 100, 10, 200, 2)
+    manifest.record_file(input_files[1], 2)
+    manifest.record(input_files[1], BBOX_2, TILE_DONE, output_files[1], 110, 20, 202, 3)
+    manifest.record(input_files[1], BBOX_3, TILE_DONE, output_files[2], 130, 30, 205, 4)
+    manifest.close()
+    assert manifest.input_fingerprint(input_files[0]).digest == file_fingerprint(
+        input_files[0]
+    )
+
+    manifest = JobManifest(filename, "fingerprint", reuse=True)
+    manifest.close()
+    assert manifest.completed_file(input_files[0]) is not None
+    assert manifest.completed_file(input_files[1]) is not None
+    assert manifest.next_ids() == (160, 209)
+
+    # Input file changed
+    with open(input_files[1], "a") as input_file:
+        input_file.write("changed")
+    manifest = JobManifest(filename, "fingerprint", reuse=True)
+    assert manifest.completed_file(input_files[0]) is not None
+    assert manifest.completed_file(input_files[1]) is None
+    assert manifest.completed_tile(input_files[1], BBOX_2) is None
+    assert manifest.next_ids() == (110, 202)
+    # Only one tile generated again, with the same output file
+    manifest.record(input_files[1], BBOX_2, TILE_DONE, output_files[1], 110, 25, 202, 3)
+    manifest.remove_stale_outputs(input_files)
+    manifest.close()
+    assert [os.path.exists(output_file) for output_file in output_files] == [
+        True,
+        True,
+        False,
+    ]
+
+
+def test_input_fingerprint_cache(tmp_path: Path) -> None:
+    """Input files are hashed again only if their size or modification time
+    changed.
+    """
+    filename = str(tmp_path / "manifest.jsonl")
+    input_file = str(tmp_path / "file.hgt")
+    with open(input_file, "w") as output_file:
+        output_file.write("content")
+    manifest = JobManifest(filename, "fingerprint", reuse=False)
+    manifest.record_file(input_file, 1)
+    manifest.record(input_file, BBOX_1, TILE_DONE)
+    manifest.close()
+
+    with patch("pyhgtmap.hgt.manifest.file_fingerprint") as fingerprint_mock:
+        manifest = JobManifest(filename, "fingerprint", reuse=True)
+        manifest.close()
+    fingerprint_mock.assert_not_called()
+    assert manifest.completed_file(input_file) is not None
+
+    # Touched, but same content
+    stat = os.stat(input_file)
+    os.utime(input_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    with patch(
+        "pyhgtmap.hgt.manifest.file_fingerprint", side_effect=file_fingerprint
+    ) as fingerprint_mock:
+        manifest = JobManifest(filename, "fingerprint", reuse=True)
+        manifest.close()
+    fingerprint_mock.assert_called_once_with(input_file)
+    assert manifest.completed_file(input_file) is not None
+
+    # Missing input file
+    os.remove(input_file)
+    manifest = JobManifest(filename, "fingerprint", reuse=True)
+    manifest.close()
+    assert manifest.input_fingerprint(input_file) == MISSING_INPUT
+    assert manifest.completed_file(input_file) is None
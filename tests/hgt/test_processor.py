@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 import glob
+import io
 import itertools
+import json
 import logging
 import multiprocessing
 import os
+import pstats
 import shutil
+import signal
 import sys
 import tempfile
-from contextlib import contextmanager
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from multiprocessing import shared_memory
 from typing import TYPE_CHECKING, Callable, NamedTuple
 from unittest import mock
 from unittest.mock import MagicMock, Mock
@@ -16,12 +21,20 @@ from unittest.mock import MagicMock, Mock
 import npyosmium
 import npyosmium.io
 import npyosmium.osm
+import numpy
 import pytest
 
-from pyhgtmap import BBox
+from pyhgtmap import BBox, timing, tracing
 from pyhgtmap.configuration import Configuration
-from pyhgtmap.hgt.processor import HgtFilesProcessor
-from pyhgtmap.hgt.tile import TileContours
+from pyhgtmap.hgt import processor as processor_module
+from pyhgtmap.hgt.processor import (
+    HgtFilesProcessor,
+    TileResult,
+    compute_contours_in_worker,
+    init_worker,
+)
+from pyhgtmap.hgt.shared import share_tile
+from pyhgtmap.hgt.tile import HgtTile, TileContours
 from tests import TEST_DATA_PATH
 
 if TYPE_CHECKING:
@@ -102,7 +115,8 @@ def cwd(path) -> Generator[None, None, None]:
         os.chdir(oldpwd)
 
 
-def check_no_id_overlap(osm_files_names: list[str]) -> None:
+def check_no_id_overlap(osm_files_names: list[str]) -> list[IdBoundaries]:
+    """Check IDs ranges of given files don't overlap, and return them."""
     ids_boundaries: list[IdBoundaries] = []
     for out_file_name in osm_files_names:
         osm_decoder = OSMDecoder()
@@ -128,6 +142,34 @@ def check_no_id_overlap(osm_files_names: list[str]) -> None:
             boundaries_1.min_way_id,
             boundaries_2.min_way_id,
         ), f"Overlap of ways boundaries {boundaries_1} and {boundaries_2}"
+    return ids_boundaries
+
+
+_compute_contours = HgtFilesProcessor.compute_contours
+
+
+def compute_contours_or_die(
+    processor: HgtFilesProcessor, tile: HgtTile
+) -> TileContours:
+    """Compute contours of a tile, abruptly killing the worker for the tile starting
+    at 43.5 latitude.
+    """
+    if tile.minLat == 43.5:
+        os.kill(os.getpid(), signal.SIGKILL)
+    return _compute_contours(processor, tile)
+
+
+def compute_contours_or_die_once(
+    processor: HgtFilesProcessor, tile: HgtTile
+) -> TileContours:
+    """Compute contours of a tile, abruptly killing the worker for the first attempt
+    of the tile starting at 43.0 latitude.
+    """
+    if tile.minLat == 43.0 and not os.path.exists("killed"):
+        with open("killed", "w"):
+            pass
+        os.kill(os.getpid(), signal.SIGKILL)
+    return _compute_contours(processor, tile)
 
 
 @pytest.fixture()
@@ -212,15 +254,432 @@ class TestHgtFilesProcessor:
                     # process_tile_internal is NOT called in parent process, but in children
                     # (not reflected in parent's mock). Can' check for actual max concurrency.
                     processor.process_tile_internal.assert_not_called()
+                # No manifest without --resume or --incremental
+                assert not os.path.exists("pyhgtmap_manifest.jsonl")
 
                 # Ensure nodes and ways IDs do not overlap between generated files
-                # (they should actually be continuous, but we really only care about overlapping)
+                ids_boundaries = check_no_id_overlap(out_files_names)
+                # IDs are allocated in tiles order (south to north), whatever the
+                # parallelization, making runs reproducible
+                assert (
+                    ids_boundaries[0].min_node_id,
+                    ids_boundaries[0].min_way_id,
+                ) == (100, 200), f"Unexpected first IDs {ids_boundaries[0]}"
+                for previous, current in zip(ids_boundaries, ids_boundaries[1:]):
+                    assert (current.min_node_id, current.min_way_id) == (
+                        previous.max_node_id + 1,
+                        previous.max_way_id + 1,
+                    ), f"Non contiguous IDs {previous} and {current}"
+
+            # Move coverage files of child process back to root
+            for coverage_file in glob.glob(os.path.join(tempdir_name, ".coverage.*")):
+                shutil.move(coverage_file, ".")
+
+    @staticmethod
+    def test_process_files_worker_killed(default_options: Configuration) -> None:
+        """Run completes when a worker dies abruptly, reporting its tile as failed."""
+        run_in_spawned_process(
+            TestHgtFilesProcessor._test_process_files_worker_killed,
+            default_options,
+        )
+
+    @staticmethod
+    def _test_process_files_worker_killed(options: Configuration) -> None:
+        # Workers must inherit the patched method
+        options.start_method = "fork"
+        options.prefetch_files = 0
+        files_list: list[tuple[str, bool]] = [
+            (os.path.join(TEST_DATA_PATH, "N43E006.hgt"), False),
+        ]
+        with tempfile.TemporaryDirectory() as tempdir_name:
+            with (
+                cwd(tempdir_name),
+                mock.patch.object(
+                    HgtFilesProcessor, "compute_contours", compute_contours_or_die
+                ),
+            ):
+                processor = HgtFilesProcessor(2, 100, 200, options)
+                processor.process_files(files_list)
+                failed_tiles = [
+                    (result.file_name, result.tile) for result in processor.tiles_errors
+                ]
+                # Tiles being written by the pool may be lost too
+                assert (
+                    files_list[0][0],
+                    "Tile (6.00, 43.50, 7.00, 43.75)",
+                ) in failed_tiles, f"Unexpected failed tiles {failed_tiles}"
+                assert processor.executor is None
+                assert sorted(glob.glob("*.osm.pbf")) == [
+                    out_file_name
+                    for out_file_name, tile_name in [
+                        (
+                            "lon6.00_7.00lat43.00_43.50_local-source.osm.pbf",
+                            "Tile (6.00, 43.00, 7.00, 43.50)",
+                        ),
+                        (
+                            "lon6.00_7.00lat43.50_43.75_local-source.osm.pbf",
+                            "Tile (6.00, 43.50, 7.00, 43.75)",
+                        ),
+                        (
+                            "lon6.00_7.00lat43.75_43.88_local-source.osm.pbf",
+                            "Tile (6.00, 43.75, 7.00, 43.88)",
+                        ),
+                        (
+                            "lon6.00_7.00lat43.88_44.00_local-source.osm.pbf",
+                            "Tile (6.00, 43.88, 7.00, 44.00)",
+                        ),
+                    ]
+                    if (files_list[0][0], tile_name) not in failed_tiles
+                ]
+
+            # Move coverage files of child process back to root
+            for coverage_file in glob.glob(os.path.join(tempdir_name, ".coverage.*")):
+                shutil.move(coverage_file, ".")
+
+    @staticmethod
+    def test_process_files_worker_killed_once(default_options: Configuration) -> None:
+        """Tiles lost with a worker which died abruptly are processed again, with
+        lower concurrency.
+        """
+        run_in_spawned_process(
+            TestHgtFilesProcessor._test_process_files_worker_killed_once,
+            default_options,
+        )
+
+    @staticmethod
+    def _test_process_files_worker_killed_once(options: Configuration) -> None:
+        # Workers must inherit the patched method
+        options.start_method = "fork"
+        options.prefetch_files = 0
+        files_list: list[tuple[str, bool]] = [
+            (os.path.join(TEST_DATA_PATH, "N43E006.hgt"), False),
+        ]
+        with tempfile.TemporaryDirectory() as tempdir_name:
+            with (
+                cwd(tempdir_name),
+                mock.patch.object(
+                    HgtFilesProcessor, "compute_contours", compute_contours_or_die_once
+                ),
+            ):
+                processor = HgtFilesProcessor(2, 100, 200, options)
+                processor.process_files(files_list)
+                assert os.path.exists("killed")
+                assert (
+                    not processor.tiles_errors
+                ), f"Unexpected failed tiles {processor.tiles_errors}"
+                assert processor.memory_controller.max_in_flight >= 1
+                out_files_names: list[str] = sorted(glob.glob("*.osm.pbf"))
+                assert len(out_files_names) == 4, out_files_names
+                # IDs are still allocated in tiles order
+                ids_boundaries = check_no_id_overlap(out_files_names)
+                assert (
+                    ids_boundaries[0].min_node_id,
+                    ids_boundaries[0].min_way_id,
+                ) == (100, 200), f"Unexpected first IDs {ids_boundaries[0]}"
+
+            # Move coverage files of child process back to root
+            for coverage_file in glob.glob(os.path.join(tempdir_name, ".coverage.*")):
+                shutil.move(coverage_file, ".")
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        "nb_jobs",
+        [
+            1,  # Single process mode
+            8,  # Multi-processes mode
+        ],
+    )
+    def test_process_files_resume(nb_jobs: int, default_options: Configuration) -> None:
+        """Interrupted run is resumed, processing only missing tiles with same IDs."""
+        run_in_spawned_process(
+            TestHgtFilesProcessor._test_process_files_resume,
+            nb_jobs,
+            default_options,
+        )
+
+    @staticmethod
+    def _test_process_files_resume(nb_jobs: int, options: Configuration) -> None:
+        files_list: list[tuple[str, bool]] = [
+            (os.path.join(TEST_DATA_PATH, "N43E006.hgt"), False),
+        ]
+        options.resume = True
+        with tempfile.TemporaryDirectory() as tempdir_name:
+            with cwd(tempdir_name):
+                # No manifest to resume from yet: regular run, recording tiles
+                HgtFilesProcessor(nb_jobs, 100, 200, options).process_files(files_list)
+                out_files_names: list[str] = sorted(glob.glob("*.osm.pbf"))
+                ids_boundaries = check_no_id_overlap(out_files_names)
+                # Simulate a run interrupted while writing the last tile
+                with open("pyhgtmap_manifest.jsonl") as manifest_file:
+                    records = manifest_file.readlines()
+                with open("pyhgtmap_manifest.jsonl", "w") as manifest_file:
+                    manifest_file.writelines(records[:-1])
+                os.remove(json.loads(records[-1])["output_file"])
+
+                processor = HgtFilesProcessor(nb_jobs, 100, 200, options)
+                processor.process_tile_internal = Mock(  # type: ignore[method-assign]
+                    side_effect=processor.process_tile_internal,
+                )
+                processor.process_files(files_list)
+                assert sorted(glob.glob("*.osm.pbf")) == out_files_names
+                if nb_jobs == 1:
+                    assert processor.process_tile_internal.call_count == 1
+                assert check_no_id_overlap(out_files_names) == ids_boundaries
+                with open("pyhgtmap_manifest.jsonl") as manifest_file:
+                    # Input file loaded again
+                    assert len(manifest_file.readlines()) == len(records) + 1
+
+            # Move coverage files of child process back to root
+            for coverage_file in glob.glob(os.path.join(tempdir_name, ".coverage.*")):
+                shutil.move(coverage_file, ".")
+
+    @staticmethod
+    def test_process_files_incremental(default_options: Configuration) -> None:
+        """Unchanged input files are not processed again."""
+        run_in_spawned_process(
+            TestHgtFilesProcessor._test_process_files_incremental,
+            default_options,
+        )
+
+    @staticmethod
+    def _test_process_files_incremental(options: Configuration) -> None:
+        with tempfile.TemporaryDirectory() as tempdir_name:
+            with cwd(tempdir_name):
+                shutil.copy(os.path.join(TEST_DATA_PATH, "N43E006.hgt"), ".")
+                files_list: list[tuple[str, bool]] = [("N43E006.hgt", False)]
+                options.incremental = True
+                HgtFilesProcessor(1, 100, 200, options).process_files(files_list)
+                out_files_names: list[str] = sorted(glob.glob("*.osm.pbf"))
+
+                processor = HgtFilesProcessor(1, 100, 200, options)
+                processor.load_file = Mock(  # type: ignore[method-assign]
+                    side_effect=processor.load_file,
+                )
+                processor.process_files(files_list)
+                processor.load_file.assert_not_called()
+                assert sorted(glob.glob("*.osm.pbf")) == out_files_names
+
+                # Changed input file
+                with open("N43E006.hgt", "r+b") as input_file:
+                    input_file.write(b"\x01\x00")
+                processor = HgtFilesProcessor(1, 100, 200, options)
+                processor.process_files(files_list)
+                assert sorted(glob.glob("*.osm.pbf")) == out_files_names
                 check_no_id_overlap(out_files_names)
 
             # Move coverage files of child process back to root
             for coverage_file in glob.glob(os.path.join(tempdir_name, ".coverage.*")):
                 shutil.move(coverage_file, ".")
 
+    @staticmethod
+    @pytest.mark.parametrize(
+        ("nb_jobs", "max_nodes_per_tile"),
+        [
+            (1, 500000),  # Single process mode
+            (4, 500000),  # Multi-processes mode
+            (4, 0),  # Multi-processes mode, single output
+        ],
+    )
+    def test_process_files_timings(
+        nb_jobs: int, max_nodes_per_tile: int, default_options: Configuration
+    ) -> None:
+        """Stages durations are recorded per file and per tile, across workers."""
+        run_in_spawned_process(
+            TestHgtFilesProcessor._test_process_files_timings,
+            nb_jobs,
+            max_nodes_per_tile,
+            default_options,
+        )
+
+    @staticmethod
+    def _test_process_files_timings(
+        nb_jobs: int, max_nodes_per_tile: int, options: Configuration
+    ) -> None:
+        options.contourStepSize = "100"
+        options.maxNodesPerTile = max_nodes_per_tile
+        options.timings_file = "timings.jsonl"
+        options.area = "6:43:7:44"
+        files_list: list[tuple[str, bool]] = [
+            (os.path.join(TEST_DATA_PATH, "N43E006.hgt"), False),
+        ]
+        with tempfile.TemporaryDirectory() as tempdir_name:
+            with cwd(tempdir_name):
+                processor = HgtFilesProcessor(nb_jobs, 100, 200, options)
+                with (
+                    redirect_stdout(io.StringIO()) as stdout,
+                    redirect_stderr(io.StringIO()) as stderr,
+                ):
+                    processor.process_files(files_list)
+                # Summary is kept out of stdout
+                assert not stdout.getvalue()
+                assert "Stage " in stderr.getvalue()
+                with open("timings.jsonl") as timings_file:
+                    records = [json.loads(line) for line in timings_file]
+                assert processor.timings is None
+
+            # Move coverage files of child process back to root
+            for coverage_file in glob.glob(os.path.join(tempdir_name, ".coverage.*")):
+                shutil.move(coverage_file, ".")
+
+        records_per_type: dict[str, list[dict]] = {}
+        for record in records:
+            records_per_type.setdefault(record["type"], []).append(record)
+        (file_record,) = records_per_type["file"]
+        assert set(file_record["stages"]) == {
+            timing.FILE_LOAD,
+            timing.VOID_MASK,
+            timing.TILING,
+        }
+        tiles_records = records_per_type["tile"]
+        assert len(tiles_records) == file_record["nb_tiles"]
+        expected_stages = {
+            timing.CONTOUR_TRACING,
+            timing.SIMPLIFICATION,
+            timing.SPLIT,
+            timing.NODE_WRITE,
+            timing.WAY_WRITE,
+        }
+        if max_nodes_per_tile:
+            expected_stages.add(timing.FINALIZE)
+            assert "output" not in records_per_type
+        else:
+            (output_record,) = records_per_type["output"]
+            assert set(output_record["stages"]) == {timing.FINALIZE}
+        for tile_record in tiles_records:
+            assert set(tile_record["stages"]) == expected_stages
+            assert tile_record["nb_nodes"] > 0
+            assert all(duration >= 0 for duration in tile_record["stages"].values())
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        ("nb_jobs", "max_nodes_per_tile"),
+        [
+            (1, 500000),  # Single process mode
+            (4, 500000),  # Multi-processes mode
+            (4, 0),  # Multi-processes mode, single output
+        ],
+    )
+    def test_process_files_trace(
+        nb_jobs: int, max_nodes_per_tile: int, default_options: Configuration
+    ) -> None:
+        """Spans of all processes are merged into a single trace."""
+        run_in_spawned_process(
+            TestHgtFilesProcessor._test_process_files_trace,
+            nb_jobs,
+            max_nodes_per_tile,
+            default_options,
+        )
+
+    @staticmethod
+    def _test_process_files_trace(
+        nb_jobs: int, max_nodes_per_tile: int, options: Configuration
+    ) -> None:
+        options.contourStepSize = "100"
+        options.maxNodesPerTile = max_nodes_per_tile
+        options.trace_file = "trace.json"
+        options.area = "6:43:7:44"
+        files_list: list[tuple[str, bool]] = [
+            (os.path.join(TEST_DATA_PATH, "N43E006.hgt"), False),
+        ]
+        with tempfile.TemporaryDirectory() as tempdir_name:
+            with cwd(tempdir_name):
+                processor = HgtFilesProcessor(nb_jobs, 100, 200, options)
+                processor.process_files(files_list)
+                with open("trace.json") as trace_file:
+                    trace = json.load(trace_file)
+            assert tracing.active_tracer() is None
+
+            # Move coverage files of child process back to root
+            for coverage_file in glob.glob(os.path.join(tempdir_name, ".coverage.*")):
+                shutil.move(coverage_file, ".")
+
+        spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+        names = {event["name"] for event in spans}
+        assert {"process files", "load file", timing.TILING} <= names
+        assert {timing.NODE_WRITE, timing.WAY_WRITE} <= names
+        tiles_spans = [event for event in spans if event["cat"] == "tile"]
+        assert tiles_spans
+        assert all(event["args"]["tile"] for event in tiles_spans)
+        assert all(event["dur"] >= 0 for event in spans)
+        processes = {
+            event["pid"]
+            for event in trace["traceEvents"]
+            if event["name"] == "process_name"
+        }
+        if nb_jobs == 1:
+            assert processes == {os.getpid()}
+            assert "process tile" in names
+        else:
+            # Tiles are computed in workers
+            assert len(processes) > 1
+            assert {event["pid"] for event in spans} == processes
+            assert "compute tile" in names
+            assert "wait for contours" in names
+            if max_nodes_per_tile:
+                assert "write tile" in names
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        ("nb_jobs", "max_nodes_per_tile"),
+        [
+            (1, 500000),  # Single process mode
+            (4, 500000),  # Multi-processes mode
+            (4, 0),  # Multi-processes mode, single output
+        ],
+    )
+    def test_process_files_profile(
+        nb_jobs: int, max_nodes_per_tile: int, default_options: Configuration
+    ) -> None:
+        """Profiles of tiles are merged across workers."""
+        run_in_spawned_process(
+            TestHgtFilesProcessor._test_process_files_profile,
+            nb_jobs,
+            max_nodes_per_tile,
+            default_options,
+        )
+
+    @staticmethod
+    def _test_process_files_profile(
+        nb_jobs: int, max_nodes_per_tile: int, options: Configuration
+    ) -> None:
+        options.contourStepSize = "500"
+        options.maxNodesPerTile = max_nodes_per_tile
+        options.profile_file = "profile.pstats"
+        options.profile_memory = True
+        options.area = "6:43:7:44"
+        files_list: list[tuple[str, bool]] = [
+            (os.path.join(TEST_DATA_PATH, "N43E006.hgt"), False),
+        ]
+        with tempfile.TemporaryDirectory() as tempdir_name:
+            with cwd(tempdir_name):
+                processor = HgtFilesProcessor(nb_jobs, 100, 200, options)
+                with (
+                    redirect_stdout(io.StringIO()) as stdout,
+                    redirect_stderr(io.StringIO()) as stderr,
+                ):
+                    processor.process_files(files_list)
+                # Summary is kept out of stdout
+                assert not stdout.getvalue()
+                assert "cumulative" in stderr.getvalue()
+                assert processor.profiles is None
+                stats = pstats.Stats("profile.pstats")
+                with open("profile_allocations.txt") as report_file:
+                    report = report_file.read()
+
+            # Move coverage files of child process back to root
+            for coverage_file in glob.glob(os.path.join(tempdir_name, ".coverage.*")):
+                shutil.move(coverage_file, ".")
+
+        functions = {
+            function
+            for _, _, function in stats.stats  # type: ignore[attr-defined]
+        }
+        # Both contours computation and writing are profiled
+        assert {"trace", "write_nodes"} <= functions
+        tiles_lines = report.split("Peak traced memory per tile\n")[1].splitlines()
+        assert tiles_lines
+        assert all(line.endswith("N43E006.hgt") for line in tiles_lines)
+
     @staticmethod
     @pytest.mark.parametrize(
         "nb_jobs",
@@ -278,9 +737,14 @@ class TestHgtFilesProcessor:
                     "lon6.00_8.00lat43.00_44.00_local-source.osm.pbf",
                 ], f"out_files_names mismatch; {out_files_names}"
 
-                # process_tile_internal called in main process when parallelization is not used
-                # (and no per-tile parallelization is used in single output mode)
-                assert processor.process_tile_internal.call_count == len(files_list)
+                if nb_jobs == 1:
+                    # process_tile_internal called in main process when parallelization is not used
+                    assert processor.process_tile_internal.call_count == len(files_list)
+                else:
+                    # Contours are computed by children, and written by parent process
+                    processor.process_tile_internal.assert_not_called()
+                # No manifest without --resume or --incremental
+                assert not os.path.exists("pyhgtmap_manifest.jsonl")
 
                 # Ensure nodes and ways IDs do not overlap between generated files
                 # (they should actually be continuous, but we really only care about overlapping)
@@ -389,3 +853,174 @@ class TestHgtFilesProcessor:
                 "Tile (28.00, 42.50, 29.00, 43.00) doesn't contain any node, skipping."
                 in caplog.text
             )
+
+    @staticmethod
+    def test_compute_contours_in_worker_error(
+        default_options: Configuration,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Errors raised while processing a tile are reported as result."""
+        monkeypatch.setattr(processor_module, "_worker_processor", None)
+        init_worker(default_options)
+        tile = HgtTile(
+            BBox(28, 42.5, 29, 43),
+            numpy.ma.array(numpy.zeros((3, 3), dtype=numpy.int16)),
+            (0.5, 0.25),
+            None,
+            None,
+            None,
+        )
+        with mock.patch.object(
+            HgtTile, "_get_contours", side_effect=RuntimeError("contours failure")
+        ):
+            segment, shared_tile = share_tile(tile)
+            try:
+                result: TileResult = compute_contours_in_worker("file.hgt", shared_tile)
+            finally:
+                segment.close()
+                segment.unlink()
+        assert (result.file_name, result.tile, result.nb_nodes, result.nb_ways) == (
+            "file.hgt",
+            "Tile (28.00, 42.50, 29.00, 43.00)",
+            0,
+            0,
+        )
+        assert result.error is not None
+        assert "RuntimeError: contours failure" in result.error
+
+    @staticmethod
+    def test_dispatch_tiles(default_options: Configuration) -> None:
+        """Tiles are submitted largest first, but queued for writing in order."""
+        processor = HgtFilesProcessor(
+            2,
+            node_start_id=100,
+            way_start_id=200,
+            options=default_options,
+        )
+        processor.executor = MagicMock()
+        estimated_nb_nodes = [10.0, 1000.0, 100.0, 1000.0]
+        for index, nb_nodes in enumerate(estimated_nb_nodes):
+            processor.scheduled_tiles.append(
+                (
+                    "file.hgt",
+                    HgtTile(
+                        BBox(index, 43, index + 1, 44),
+                        numpy.ma.array(numpy.zeros((3, 3), dtype=numpy.int16)),
+                        (0.5, 0.5),
+                        None,
+                        None,
+                        None,
+                        estimated_nb_nodes=nb_nodes,
+                    ),
+                )
+            )
+        processor.dispatch_tiles()
+        try:
+            assert not processor.scheduled_tiles
+            submitted_tiles = [
+                submit_call.args[2].tile.minLon
+                for submit_call in processor.executor.submit.call_args_list
+            ]
+            assert submitted_tiles == [1, 3, 2, 0]
+            assert [
+                pending.bounding_box[0] for pending in processor.pending_contours
+            ] == [0, 1, 2, 3]
+        finally:
+            for pending in processor.pending_contours:
+                assert pending.segment is not None
+                pending.segment.close()
+                pending.segment.unlink()
+
+    @staticmethod
+    def test_process_files_aborted(default_options: Configuration) -> None:
+        """Shared memory segments of pending tiles are released on abort."""
+        default_options.schedule_window = 2
+        processor = HgtFilesProcessor(
+            2,
+            node_start_id=100,
+            way_start_id=200,
+            options=default_options,
+        )
+        executor = processor.executor = MagicMock()
+        tiles = [
+            HgtTile(
+                BBox(index, 43, index + 1, 44),
+                numpy.ma.array(numpy.zeros((3, 3), dtype=numpy.int16)),
+                (0.5, 0.5),
+                None,
+                None,
+                None,
+            )
+            for index in range(3)
+        ]
+        segments_names: list[str] = []
+
+        def share_tile_spy(tile: HgtTile):
+            segment, shared_tile = share_tile(tile)
+            segments_names.append(segment.name)
+            return segment, shared_tile
+
+        processor.load_files = Mock(  # type: ignore[method-assign]
+            return_value=iter([("file.hgt", tiles)])
+        )
+        processor.write_next_computed_tile = Mock(  # type: ignore[method-assign]
+            side_effect=KeyboardInterrupt
+        )
+        with (
+            mock.patch.object(processor_module, "share_tile", share_tile_spy),
+            pytest.raises(KeyboardInterrupt),
+        ):
+            processor.process_files([("file.hgt", False)])
+        assert len(segments_names) == 2
+        assert not processor.pending_contours
+        executor.shutdown.assert_called_once_with(cancel_futures=True)
+        assert processor.executor is None
+        for segment_name in segments_names:
+            with pytest.raises(FileNotFoundError):
+                shared_memory.SharedMemory(name=segment_name)
+
+    @staticmethod
+    @pytest.mark.parametrize(
+        ("prefetch_files", "prefetch_memory", "max_loaded"),
+        [
+            (0, 2048, 1),  # No prefetching
+            (5, 2048, 6),  # Bounded by number of files
+            (5, 3, 3),  # Bounded by memory budget (1 MiB per file)
+        ],
+    )
+    def test_load_files_prefetch(
+        default_options: Configuration,
+        prefetch_files: int,
+        prefetch_memory: int,
+        max_loaded: int,
+    ) -> None:
+        """Files are yielded in order, prefetching within limits."""
+        default_options.prefetch_files = prefetch_files
+        default_options.prefetch_memory = prefetch_memory
+        processor = HgtFilesProcessor(
+            1,
+            node_start_id=100,
+            way_start_id=200,
+            options=default_options,
+        )
+        files: list[tuple[str, bool]] = [(f"file{i}.hgt", False) for i in range(10)]
+        loaded_files: list[str] = []
+
+        def load_file(file_name: str, check_poly: bool) -> list[HgtTile]:
+            loaded_files.append(file_name)
+            return []
+
+        processor.load_file = Mock(  # type: ignore[method-assign]
+            side_effect=load_file
+        )
+        with mock.patch(
+            "pyhgtmap.hgt.processor.get_file_nb_points", return_value=256 * 1024
+        ):
+            files_iter = processor.load_files(files)
+            assert next(files_iter) == ("file0.hgt", [])
+            # Loading is never started beyond limits
+            assert processor.load_file.call_count <= max_loaded
+            assert [file_name for file_name, _ in files_iter] == [
+                f"file{i}.hgt" for i in range(1, 10)
+            ]
+        assert sorted(loaded_files) == sorted(file_name for file_name, _ in files)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import sys
+from concurrent.futures import Future
+
+import pytest
+
+from pyhgtmap.hgt.scheduler import (
+    MemoryAdmissionController,
+    TileCostFeatures,
+    TileCostModel,
+    TileMemoryFeatures,
+    get_peak_rss,
+    lpt_order,
+    reset_peak_rss,
+)
+
+
+def test_lpt_order() -> None:
+    """Tasks are sorted by decreasing cost, ties kept in original order."""
+    assert lpt_order([1.0, 5.0, 2.0, 5.0, 0.0]) == [1, 3, 2, 0, 4]
+    assert lpt_order([]) == []
+
+
+def test_cost_model_default() -> None:
+    """Default coefficients are used until enough measures are available."""
+    model = TileCostModel()
+    features = TileCostFeatures(1000, 100.0)
+    default_estimate = model.estimate(features)
+    assert default_estimate > 0
+    model.update(features, 10.0)
+    assert model.estimate(features) == default_estimate
+
+
+def test_cost_model_refined() -> None:
+    """Coefficients are fitted on measured durations."""
+    model = TileCostModel()
+    for nb_points, nb_nodes in ((1000, 10), (2000, 500), (500, 1000), (4000, 20)):
+        model.update(
+            TileCostFeatures(nb_points, nb_nodes), nb_points * 1e-6 + nb_nodes * 1e-3
+        )
+    assert model.estimate(TileCostFeatures(3000, 300)) == pytest.approx(0.303)
+
+
+def test_cost_model_degenerated() -> None:
+    """Degenerated or inconsistent measures don't break the model."""
+    model = TileCostModel()
+    features = TileCostFeatures(1000, 100.0)
+    default_estimate = model.estimate(features)
+    # Singular system
+    for _ in range(TileCostModel.MIN_MEASURES):
+        model.update(features, 1.0)
+    assert model.estimate(features) == default_estimate
+    # Negative coefficient
+    model = TileCostModel()
+    for nb_points, nb_nodes, duration in (
+        (1000, 10, 1.0),
+        (2000, 10, 0.1),
+        (1000, 20, 1.0),
+        (2000, 20, 0.1),
+    ):
+        model.update(TileCostFeatures(nb_points, nb_nodes), duration)
+    assert model.estimate(features) == default_estimate
+
+
+def test_memory_admission() -> None:
+    """Tiles are admitted while their estimated memory fits in the budget."""
+    features = TileMemoryFeatures(1024 * 1024, 10, 10000.0)
+    controller = MemoryAdmissionController(0)
+    estimate = controller.estimate(features)
+    assert estimate > 0
+    controller = MemoryAdmissionController(int(estimate * 2.5))
+    futures: list[Future] = [Future() for _ in range(3)]
+    # A single tile is always admitted, whatever its size
+    assert controller.can_admit(estimate * 10)
+    controller.admit(futures[0], features)
+    controller.admit(futures[1], features)
+    assert controller.used == 2 * estimate
+    assert not controller.can_admit(estimate)
+    controller.release(futures[0])
+    assert controller.can_admit(estimate)
+    # Releasing twice is harmless
+    controller.release(futures[0])
+    assert controller.used == estimate
+
+
+def test_memory_admission_lower_concurrency() -> None:
+    """Concurrency is halved whenever a worker dies, down to a single tile."""
+    features = TileMemoryFeatures(1024 * 1024, 10, 10000.0)
+    controller = MemoryAdmissionController(0)
+    futures: list[Future] = [Future() for _ in range(3)]
+    for future in futures:
+        assert controller.can_admit(controller.estimate(features))
+        controller.admit(future, features)
+    controller.lower_concurrency(5)
+    assert controller.max_in_flight == 2
+    assert not controller.can_admit(0)
+    controller.release(futures[0])
+    assert not controller.can_admit(0)
+    controller.release(futures[1])
+    assert controller.can_admit(0)
+    # Limit never raised
+    controller.lower_concurrency(8)
+    assert controller.max_in_flight == 1
+    controller.lower_concurrency(1)
+    assert controller.max_in_flight == 1
+    # A single tile is always admitted
+    controller.release(futures[2])
+    assert controller.can_admit(0)
+
+
+def test_memory_admission_feedback() -> None:
+    """Estimates are corrected with measured peak memory."""
+    features = TileMemoryFeatures(1024 * 1024, 10, 10000.0)
+    controller = MemoryAdmissionController(1024**3)
+    raw_estimate = controller.estimate(features)
+    for _ in range(20):
+        future: Future = Future()
+        controller.admit(future, features)
+        controller.release(future, raw_estimate // 2)
+    assert controller.estimate(features) == pytest.approx(raw_estimate / 2, rel=0.01)
+    # Unknown peak memory doesn't change estimates
+    future = Future()
+    controller.admit(future, features)
+    controller.release(future, 0)
+    assert controller.estimate(features) == pytest.approx(raw_estimate / 2, rel=0.01)
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Linux only")
+def test_peak_rss() -> None:
+    """Peak RSS increase of current process is measured."""
+    start_rss = reset_peak_rss()
+    assert start_rss is not None
+    data = b"\x01" * (64 * 1024 * 1024)
+    peak_rss = get_peak_rss()
+    del data
+    assert peak_rss is not None
+    assert peak_rss - start_rss >= 60 * 1024 * 1024
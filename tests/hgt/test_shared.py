@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import numpy
+import pytest
+
+from pyhgtmap import BBox
+from pyhgtmap.hgt.shared import attach_tile, release_tile, share_tile
+from pyhgtmap.hgt.tile import HgtTile
+
+
+@pytest.mark.parametrize("with_polygon_mask", [False, True])
+def test_share_tile(with_polygon_mask: bool) -> None:
+    """Tile arrays are handed over through shared memory, other attributes kept."""
+    data = numpy.ma.array(
+        numpy.arange(12, dtype=numpy.int16).reshape((3, 4)),
+        mask=numpy.arange(12).reshape((3, 4)) % 5 == 0,
+    )
+    polygon_mask = numpy.arange(12).reshape((3, 4)) % 2 == 0
+    tile = HgtTile(
+        BBox(6, 43, 7, 44),
+        data,
+        (0.25, 0.5),
+        None,
+        polygon_mask if with_polygon_mask else None,
+        None,
+    )
+    segment, shared_tile = share_tile(tile)
+    try:
+        # Arrays are NOT pickled along with the tile
+        assert shared_tile.tile.zData is None
+        assert shared_tile.tile.mask is None
+        worker_segment, worker_tile = attach_tile(shared_tile)
+        numpy.testing.assert_array_equal(worker_tile.zData.data, data.data)
+        numpy.testing.assert_array_equal(worker_tile.zData.mask, data.mask)
+        assert worker_tile.zData.dtype == numpy.int16
+        if with_polygon_mask:
+            numpy.testing.assert_array_equal(worker_tile.mask, polygon_mask)
+        else:
+            assert worker_tile.mask is None
+        assert worker_tile.bbox() == tile.bbox()
+        assert (worker_tile.minEle, worker_tile.maxEle) == (tile.minEle, tile.maxEle)
+        release_tile(worker_segment, worker_tile)
+        assert worker_tile.zData is None
+    finally:
+        segment.close()
+        segment.unlink()
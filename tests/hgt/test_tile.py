@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import pickle
 from typing import TYPE_CHECKING
 from unittest.mock import Mock
 
@@ -136,6 +137,16 @@ class TestHgtTile:
         # contourLines must be called only once thanks to caching
         tile.contourLines.assert_called_once_with(20, 0, False, None, None, None)
 
+    @staticmethod
+    def test_pickle(toulon_tiles_raw: list[HgtTile]) -> None:
+        """Tiles are sent to worker processes, and must be picklable."""
+        tile = toulon_tiles_raw[0]
+        unpickled: HgtTile = pickle.loads(pickle.dumps(tile))  # noqa: S301
+        numpy.testing.assert_array_equal(unpickled.zData, tile.zData)
+        assert (unpickled.minEle, unpickled.maxEle) == (tile.minEle, tile.maxEle)
+        # Contours cache is rebuilt
+        assert unpickled.get_contours().nb_nodes == tile.get_contours().nb_nodes
+
     @staticmethod
     # Test contours generation with several rdp_epsilon values
     # Results must be close enough not to trigger an exception with mpl plugin
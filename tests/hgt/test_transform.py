@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import math
+import pickle
+import sys
+from unittest.mock import MagicMock, patch
+
+import numpy
+import pytest
+
+from pyhgtmap.hgt import transformLonLats
+from pyhgtmap.hgt.file import get_transform, polygon_mask
+from pyhgtmap.hgt.transform import AffineTransform, ProjTransform
+
+# ruff: noqa: SLF001
+
+
+class TestAffineTransform:
+    @staticmethod
+    def test_transform_array() -> None:
+        transform = AffineTransform(2.0, 1.0, 0.5, -1.0)
+        points = numpy.array([[0.0, 0.0], [1.0, 2.0], [-3.0, 4.0]])
+        numpy.testing.assert_allclose(
+            transform.transform_array(points),
+            [[1.0, -1.0], [3.0, 0.0], [-5.0, 1.0]],
+        )
+        # List based API
+        numpy.testing.assert_allclose(transform([(1.0, 2.0)]), [[3.0, 0.0]])
+
+    @staticmethod
+    def test_inverse() -> None:
+        transform = AffineTransform(0.9, 2.3372, 0.9, 0)
+        points = numpy.array([[5.0, 43.0], [7.5, 44.25]])
+        numpy.testing.assert_allclose(
+            transform.inverse().transform_array(transform.transform_array(points)),
+            points,
+        )
+
+    @staticmethod
+    def test_transformLonLats() -> None:
+        assert transformLonLats(
+            0, 10, 1, 11, AffineTransform(-2.0, 0, 1.0, 1)
+        ) == pytest.approx((-2, 11, 0, 12))
+
+    @staticmethod
+    def test_polygon_mask() -> None:
+        """Affine transformed grids are rasterized as regular ones."""
+        transform = AffineTransform(2.0, 1.0, 0.5, 0.0)
+        x_data = numpy.linspace(0, 1, 50)
+        y_data = numpy.linspace(0, 4, 80)
+        polygons = [[(1.0, 0.0), (3.0, 0.0), (1.0, 2.0), (1.0, 0.0)]]
+        x_transformed, y_transformed = transform.transform_axes(x_data, y_data)
+        numpy.testing.assert_array_equal(
+            polygon_mask(x_data, y_data, polygons, transform),
+            polygon_mask(x_transformed, y_transformed, polygons, None),
+        )
+
+    @staticmethod
+    def test_polygon_mask_negative_scale() -> None:
+        """Grids with decreasing transformed x values are rasterized too."""
+        transform = AffineTransform(-2.0, 3.0, 0.5, 0.0)
+        x_data = numpy.linspace(0, 1, 50)
+        y_data = numpy.linspace(0, 4, 80)
+        polygons = [[(1.0, 0.0), (3.0, 0.0), (1.0, 2.0), (1.0, 0.0)]]
+        x_transformed, y_transformed = transform.transform_axes(x_data, y_data)
+        mask = polygon_mask(x_data, y_data, polygons, transform)
+        assert not mask.all()
+        numpy.testing.assert_array_equal(
+            mask[:, ::-1],
+            polygon_mask(x_transformed[::-1], y_transformed, polygons, None),
+        )
+
+
+def make_osr_mock(
+    file_proj_attributes: dict[str, str | None],
+) -> tuple[MagicMock, MagicMock]:
+    """Mock osgeo.osr, EPSG:4326 and a geographic projection of given attributes
+    (GDAL being optional)."""
+    wgs84 = MagicMock()
+    wgs84.GetAttrValue.side_effect = lambda name, index=0: {
+        "AUTHORITY": "4326",
+        "DATUM": "WGS_1984",
+    }[name]
+    wgs84.GetAngularUnits.return_value = math.pi / 180
+    osr = MagicMock()
+    osr.SpatialReference.return_value = wgs84
+    file_proj = MagicMock()
+    file_proj.IsGeographic.return_value = True
+    file_proj.GetAttrValue.side_effect = lambda name, index=0: file_proj_attributes[
+        name
+    ]
+    file_proj.GetAngularUnits.return_value = math.pi / 200
+    return osr, file_proj
+
+
+def test_get_transform_affine() -> None:
+    """Geographic projection in grads, with Paris prime meridian in degrees."""
+    osr, file_proj = make_osr_mock(
+        {"AUTHORITY": None, "DATUM": "WGS_1984", "PRIMEM": "2.33722917"}
+    )
+    with patch.dict(sys.modules, {"osgeo": MagicMock(osr=osr), "osgeo.osr": osr}):
+        transform = get_transform(file_proj)
+        reverse_transform = get_transform(file_proj, reverse=True)
+    assert isinstance(transform, AffineTransform)
+    assert isinstance(reverse_transform, AffineTransform)
+    points = numpy.array([[0.0, 50.0], [-1.0, 48.0]])
+    numpy.testing.assert_allclose(
+        transform.transform_array(points), [[2.33722917, 45.0], [1.43722917, 43.2]]
+    )
+    numpy.testing.assert_allclose(
+        reverse_transform.transform_array(transform.transform_array(points)), points
+    )
+
+
+def test_get_transform_same_projection() -> None:
+    osr, file_proj = make_osr_mock({"AUTHORITY": "4326"})
+    with patch.dict(sys.modules, {"osgeo": MagicMock(osr=osr), "osgeo.osr": osr}):
+        assert get_transform(file_proj) is None
+
+
+def test_proj_transform_pickle() -> None:
+    """Underlying transformer isn't pickled, but re-created on demand."""
+    transform = ProjTransform("source", "target")
+    transform._transformer = object()
+    unpickled = pickle.loads(pickle.dumps(transform))  # noqa: S301
+    assert unpickled._transformer is None
+    assert (unpickled.source_wkt, unpickled.target_wkt) == ("source", "target")
@@ -6,6 +6,7 @@ import os
 import tempfile
 from contextlib import suppress
 from typing import TYPE_CHECKING, Any, Callable
+from unittest.mock import MagicMock
 
 import npyosmium
 import npyosmium.io
@@ -14,6 +15,7 @@ import numpy
 import numpy.typing
 import pytest
 
+import pyhgtmap.output
 from pyhgtmap import BBox
 from pyhgtmap.hgt.tile import TileContours
 from pyhgtmap.output import make_elev_classifier, o5mUtil, osmUtil, pbfUtil
@@ -303,3 +305,95 @@ class TestOutputO5m:
 
             # Check file with osmium
             check_osmium_result(osm_file_name)
+
+    @staticmethod
+    @pytest.mark.parametrize("write_timestamp", [False, True])
+    def test_write_nodes_o5m(
+        elev_classifier, bounding_box: BBox, write_timestamp: bool
+    ) -> None:
+        """Nodes written at once must match nodes written one by one."""
+        nodes = numpy.array(
+            [[70000000, 430000000], [70000100, 429999900], [-5, 8], [1 << 40, -1]],
+            dtype=numpy.int64,
+        )
+        with tempfile.TemporaryDirectory() as tempdir:
+            osm_output = o5mUtil.Output(
+                os.path.join(tempdir, "output.osm.o5m"),
+                osmVersion=0.6,
+                pyhgtmap_version="123",
+                bbox=bounding_box,
+                elevClassifier=elev_classifier,
+                writeTimestamp=write_timestamp,
+            )
+            osm_output.outf.close()
+            written: list[bytes] = []
+            osm_output.outf = MagicMock(write=written.append)
+            osm_output.writeNodesO5m(nodes, 1000)
+            vectorized = b"".join(written)
+            written.clear()
+            # Reset and first node
+            osm_output.writeReset()
+            osm_output.writeNode(tuple(nodes[0].tolist()), lastNode=None, idDelta=1000)
+            for previous, node in zip(nodes[:-1].tolist(), nodes[1:].tolist()):
+                osm_output.writeNode(node, lastNode=previous, idDelta=1)
+            assert vectorized == b"".join(written)
+
+    @staticmethod
+    def test_write_ways_o5m(elev_classifier, bounding_box: BBox) -> None:
+        """Ways written in several blocks, with timestamps, decode as expected."""
+        nodes = numpy.array([[i, i] for i in range(10)], dtype=numpy.int64) * 10**7
+        ways = [
+            pyhgtmap.output.WayType(1000, 3, False, 100),
+            pyhgtmap.output.WayType(1003, 4, True, 100),
+            pyhgtmap.output.WayType(1007, 2, False, 150),
+            pyhgtmap.output.WayType(1008, 2, False, 100),
+        ]
+        with tempfile.TemporaryDirectory() as tempdir:
+            osm_file_name = os.path.join(tempdir, "output.osm.o5m")
+            osm_output = o5mUtil.Output(
+                osm_file_name,
+                osmVersion=0.6,
+                pyhgtmap_version="123",
+                bbox=bounding_box,
+                elevClassifier=elev_classifier,
+                writeTimestamp=True,
+            )
+            osm_output.writeNodesO5m(nodes, 1000)
+            osm_output.write_ways(pyhgtmap.output.build_efficient_ways(ways), 2000)
+            osm_output.write_ways(pyhgtmap.output.build_efficient_ways(ways[2:]), 3000)
+            osm_output.done()
+
+            osm_decoder = OSMDecoder()
+            osm_decoder.apply_file(osm_file_name)
+
+        def tags(elevation: int, category: str) -> list[npyosmium.osm.Tag]:
+            return [
+                npyosmium.osm.Tag(k="ele", v=str(elevation)),
+                npyosmium.osm.Tag(k="contour", v="elevation"),
+                npyosmium.osm.Tag(k="contour_ext", v=f"elevation_{category}"),
+            ]
+
+        assert osm_decoder.ways == {
+            2000: ([1000, 1001, 1002], tags(100, "major")),
+            2001: ([1003, 1004, 1005, 1006, 1003], tags(100, "major")),
+            2002: ([1007, 1008], tags(150, "medium")),
+            2003: ([1008, 1009], tags(100, "major")),
+            3000: ([1007, 1008], tags(150, "medium")),
+            3001: ([1008, 1009], tags(100, "major")),
+        }
+
+
+def test_join_fields() -> None:
+    data = o5mUtil.join_fields(
+        3,
+        [
+            b"\x10",
+            (
+                numpy.array([1, 2, 3, 4, 5, 6], dtype=numpy.uint8),
+                numpy.array([1, 2, 3]),
+            ),
+            b"ab",
+        ],
+    )
+    assert data == b"\x10\x01ab\x10\x02\x03ab\x10\x04\x05\x06ab"
+    assert o5mUtil.join_fields(0, [b"\x10"]) == b""
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+
+from pyhgtmap import main, planner
+from pyhgtmap.cli import parse_command_line
+from pyhgtmap.hgt.file import calc_hgt_area
+from pyhgtmap.planner import FileEstimate
+
+from . import TEST_DATA_PATH
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pyhgtmap.configuration import Configuration
+
+HGT_FILE = os.path.join(TEST_DATA_PATH, "N43E006.hgt")
+
+
+def make_options(sys_args: list[str]) -> Configuration:
+    opts, args = parse_command_line(sys_args)
+    opts.area = ":".join(
+        str(value)
+        for value in calc_hgt_area(
+            [(name, False) for name in args], opts.srtmCorrx, opts.srtmCorry
+        )
+    )
+    return opts
+
+
+def make_estimate(
+    load_seconds: float, compute_seconds: float, write_seconds: float
+) -> FileEstimate:
+    return FileEstimate(
+        "N00E000.hgt",
+        10,
+        1000.0,
+        10.0,
+        {"osm": 1e5, "gzip": 1e4, "pbf": 3e3, "o5m": 1e4},
+        100 * 1024 * 1024,
+        10 * 1024 * 1024,
+        load_seconds,
+        compute_seconds,
+        write_seconds,
+        max_tile_seconds=1.0,
+    )
+
+
+def test_estimate_job() -> None:
+    opts = make_options(["--step=100", "--max-nodes-per-tile=100000", HGT_FILE])
+    (estimate,) = planner.estimate_job(opts, [(HGT_FILE, False)])
+    assert estimate.file_name == HGT_FILE
+    assert estimate.nb_tiles > 1
+    assert estimate.nb_nodes > 0
+    assert estimate.nb_ways == pytest.approx(
+        estimate.nb_nodes * planner.DEFAULT_CALIBRATION.ways_per_node
+    )
+    assert set(estimate.output_bytes) == {"osm", "gzip", "pbf", "o5m"}
+    assert estimate.output_bytes["pbf"] < estimate.output_bytes["osm"]
+    assert estimate.worker_memory > 0
+    assert estimate.file_memory > 0
+    assert estimate.load_seconds > 0
+    assert (
+        0
+        < estimate.max_tile_seconds
+        <= (estimate.compute_seconds + estimate.write_seconds)
+    )
+
+
+def test_calibration_roundtrip(tmp_path: Path) -> None:
+    filename = str(tmp_path / "calibration.json")
+    planner.save_calibration(filename, planner.DEFAULT_CALIBRATION)
+    assert planner.load_calibration(filename) == planner.DEFAULT_CALIBRATION
+
+
+def test_projected_wall_time() -> None:
+    estimates = [make_estimate(1.0, 8.0, 4.0), make_estimate(1.0, 8.0, 4.0)]
+    opts = make_options(["--pbf", "-j4", HGT_FILE])
+    with patch("os.cpu_count", return_value=1):
+        # Capped to one job
+        assert planner.projected_wall_time(opts, estimates) == (26.0, 26.0)
+    with patch("os.cpu_count", return_value=8):
+        # Loading is serial, the rest is shared by workers
+        assert planner.projected_wall_time(opts, estimates) == (26.0, 8.0)
+        # Single output: writing is serial too
+        opts.maxNodesPerTile = 0
+        assert planner.projected_wall_time(opts, estimates) == (26.0, 14.0)
+        assert planner.projected_wall_time(opts, []) == (0.0, 0.0)
+
+
+def test_format_size() -> None:
+    assert planner.format_size(10) == "10.0 B"
+    assert planner.format_size(1536) == "1.5 KiB"
+    assert planner.format_size(3 * 1024**3) == "3.0 GiB"
+    assert planner.format_size(2 * 1024**5) == "2048.0 TiB"
+
+
+def test_report() -> None:
+    opts = make_options(["--o5m", HGT_FILE])
+    lines = planner.report(opts, [make_estimate(1.0, 8.0, 4.0)]).splitlines()
+    assert lines[0].split() == [
+        "File",
+        "Tiles",
+        "Nodes",
+        "Ways",
+        "osm",
+        "gzip",
+        "pbf",
+        "o5m",
+        "Worker",
+        "mem",
+        "Time",
+        "(s)",
+    ]
+    assert lines[1].split()[:4] == ["N00E000.hgt", "10", "1000", "10"]
+    assert lines[2].split()[:4] == ["Total", "10", "1000", "10"]
+    assert lines[3] == (
+        "Peak memory: 100.0 MiB per loaded file (main process), 10.0 MiB per worker"
+    )
+    assert lines[4].startswith("Projected runtime (o5m output): ")
+
+
+def test_main_plan(
+    tmp_path: Path, capsys: pytest.CaptureFixture, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """--plan prints estimates without writing any output."""
+    monkeypatch.chdir(tmp_path)
+    calibration_filename = str(tmp_path / "calibration.json")
+    planner.save_calibration(
+        calibration_filename,
+        planner.DEFAULT_CALIBRATION._replace(ways_per_node=0.5),
+    )
+    with pytest.raises(SystemExit) as exit_info:
+        main.main_internal(
+            [
+                "--plan",
+                f"--plan-calibration={calibration_filename}",
+                "--step=100",
+                HGT_FILE,
+            ]
+        )
+    assert exit_info.value.code == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[1].split()[0] == "N43E006.hgt"
+    nb_nodes, nb_ways = (float(value) for value in lines[1].split()[2:4])
+    assert nb_ways == pytest.approx(nb_nodes / 2, abs=1)
+    assert lines[-1].startswith("Projected runtime (osm output): ")
+    assert os.listdir(tmp_path) == ["calibration.json"]
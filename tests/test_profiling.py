@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import pstats
+import tracemalloc
+from typing import TYPE_CHECKING
+
+from pyhgtmap import profiling
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def allocate() -> list[bytes]:
+    return [bytes(1000) for _ in range(100)]
+
+
+def profile_allocate(trace_memory: bool) -> tuple[profiling.TileProfile, list]:
+    with profiling.profiled_scope(trace_memory=trace_memory) as profiler:
+        data = allocate()
+    assert profiler is not None
+    assert profiler.profile is not None
+    return profiler.profile, data
+
+
+def test_profiled_scope_disabled() -> None:
+    with profiling.profiled_scope(enabled=False) as profiler:
+        assert profiler is None
+
+
+def test_profiled_scope() -> None:
+    profile, _ = profile_allocate(trace_memory=False)
+    assert [
+        stat[:2]
+        for (_, _, function), stat in profile.stats.items()
+        if function == "allocate"
+    ] == [(1, 1)]
+    assert profile.allocations == []
+    assert profile.peak_memory == 0
+
+
+def test_profiled_scope_memory() -> None:
+    profile, _ = profile_allocate(trace_memory=True)
+    # Tracing is stopped when not enabled before
+    assert not tracemalloc.is_tracing()
+    assert profile.peak_memory >= 100 * 1000
+    traceback, size, count = profile.allocations[0]
+    assert "allocate" in "\n".join(traceback)
+    assert size >= 100 * 1000
+    assert count >= 100
+
+
+def test_profile_recorder(tmp_path: Path) -> None:
+    profile_filename = str(tmp_path / "profile.pstats")
+    recorder = profiling.ProfileRecorder(profile_filename)
+    for tile_name in ("A", "B", "A"):
+        recorder.record(tile_name, profile_allocate(trace_memory=True)[0])
+    recorder.write()
+
+    stats = pstats.Stats(profile_filename)
+    ((calls, _, _, _, _),) = (
+        stat
+        for (_, _, function), stat in stats.stats.items()  # type: ignore[attr-defined]
+        if function == "allocate"
+    )
+    assert calls == 3
+    assert "allocate" in recorder.summary()
+
+    with open(profiling.make_allocations_filename(profile_filename)) as report_file:
+        report = report_file.read()
+    assert profiling.make_allocations_filename(profile_filename) == str(
+        tmp_path / "profile_allocations.txt"
+    )
+    assert report.startswith("Largest allocation sites")
+    # Tiles are reported once, with their highest peak
+    tiles_lines = report.split("Peak traced memory per tile\n")[1].splitlines()
+    assert sorted(line.split()[-1] for line in tiles_lines) == ["A", "B"]
+
+
+def test_profile_recorder_without_memory(tmp_path: Path) -> None:
+    profile_filename = str(tmp_path / "profile.pstats")
+    recorder = profiling.ProfileRecorder(profile_filename)
+    recorder.record("A", profile_allocate(trace_memory=False)[0])
+    recorder.write()
+    assert (tmp_path / "profile.pstats").exists()
+    assert not (tmp_path / "profile_allocations.txt").exists()
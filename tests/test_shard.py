@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import glob
+import os
+from typing import TYPE_CHECKING
+
+import npyosmium
+import pytest
+
+from pyhgtmap import BBox, shard
+from pyhgtmap.shard import ShardResult, check_shards, split_area, split_files
+from tests import TEST_DATA_PATH
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class OSMCounter(npyosmium.SimpleHandler):
+    """Count objects of an OSM file, checking ways only refer to previous nodes."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.nodes: set[int] = set()
+        self.nb_ways = 0
+        self.nb_dangling_refs = 0
+
+    def node(self, n: npyosmium.osm.Node) -> None:
+        self.nodes.add(n.id)
+
+    def way(self, w: npyosmium.osm.Way) -> None:
+        self.nb_ways += 1
+        self.nb_dangling_refs += sum(node.ref not in self.nodes for node in w.nodes)
+
+
+def count_objects(file_name: str) -> OSMCounter:
+    counter = OSMCounter()
+    counter.apply_file(file_name)
+    return counter
+
+
+@pytest.mark.parametrize(
+    ("area", "nb_shards", "expected_edges"),
+    [
+        # Aligned on integer degrees
+        (BBox(6, 43, 10, 44), 2, [6, 8, 10]),
+        (BBox(6.5, 43, 10, 44), 3, [6.5, 7, 9, 10]),
+        # Too narrow to be aligned
+        (BBox(6, 43, 7, 44), 4, [6, 6.25, 6.5, 6.75, 7]),
+    ],
+)
+def test_split_area(area: BBox, nb_shards: int, expected_edges: list[float]) -> None:
+    bands = split_area(area, nb_shards)
+    assert [band.min_lon for band in bands] + [bands[-1].max_lon] == expected_edges
+    assert all(
+        (band.min_lat, band.max_lat) == (area.min_lat, area.max_lat) for band in bands
+    )
+
+
+def test_split_area_antimeridian() -> None:
+    with pytest.raises(ValueError, match="180"):
+        split_area(BBox(179, 0, -179, 1), 2)
+
+
+def test_split_files() -> None:
+    files = [f"file{index}" for index in range(5)]
+    assert split_files(files, 3) == [
+        ["file0", "file1"],
+        ["file2", "file3"],
+        ["file4"],
+    ]
+
+
+def test_check_shards() -> None:
+    results = [
+        ShardResult(0, [], [], (100, 200), (10, 20)),
+        ShardResult(1, [], [], (200, 300), (20, 30)),
+    ]
+    check_shards(results)
+    with pytest.raises(ValueError, match="way_ids"):
+        check_shards([*results, ShardResult(2, [], [], (300, 400), (25, 40))])
+
+
+def test_make_plan_area() -> None:
+    plan = shard.make_plan(
+        ["--area=6.5:43:9:44", "--source=view1", "--start-node-id=1000"], 2, 100, 10
+    )
+    assert plan["area"] == "6.5:43.0:9.0:44.0"
+    assert [(s["area"], s["start_id"], s["start_way_id"]) for s in plan["shards"]] == [
+        ("6.5:43.0:8.0:44.0", 1000, 10000000),
+        ("8.0:43.0:9.0:44.0", 1100, 10000010),
+    ]
+
+
+def test_make_plan_files() -> None:
+    hgt_file = os.path.join(TEST_DATA_PATH, "N43E006.hgt")
+    plan = shard.make_plan(["-o", hgt_file, "--pbf", hgt_file], 2)
+    # Only the input file is removed, not the option value
+    assert plan["args"] == ["-o", hgt_file, "--pbf"]
+    assert [s["files"] for s in plan["shards"]] == [[hgt_file]]
+    assert plan["area"] == "6.0:43.0:7.0:44.0"
+
+
+@pytest.mark.parametrize(
+    ("output_format", "max_nodes_per_tile"),
+    [("--o5m", 5000), ("--o5m", 0), ("--pbf", 5000), ("--gzip=6", 5000), ("", 0)],
+)
+def test_shards_merge(
+    tmp_path: Path, output_format: str, max_nodes_per_tile: int
+) -> None:
+    """Shards processed separately are merged into a single consistent file."""
+    plan_filename = str(tmp_path / "job.json")
+    shard.main_internal(
+        [
+            "plan",
+            "--shards=3",
+            plan_filename,
+            "--",
+            "--step=500",
+            f"--max-nodes-per-tile={max_nodes_per_tile}",
+            f"--output-prefix={tmp_path / 'contours'}",
+            *([output_format] if output_format else []),
+            os.path.join(TEST_DATA_PATH, "N43E006.hgt"),
+            os.path.join(TEST_DATA_PATH, "N43E007.hgt"),
+        ]
+    )
+    plan = shard.load_plan(plan_filename)
+    # Only one shard per input file
+    assert len(plan["shards"]) == 2
+
+    shard.main_internal(["run-shard", plan_filename, "0"])
+    with pytest.raises(ValueError, match="not processed"):
+        shard.merge_shards(plan_filename)
+    shard.main_internal(["run-shard", plan_filename, "1"])
+    merged_filename = shard.merge_shards(plan_filename)
+
+    assert os.path.dirname(merged_filename) == str(tmp_path)
+    assert os.path.basename(merged_filename).startswith(
+        "contours_lon6.00_8.00lat43.00_44.00"
+    )
+    merged = count_objects(merged_filename)
+    shards_outputs = [
+        file_name
+        for file_name in glob.glob(str(tmp_path / "job_shards" / "*" / "contours*"))
+        if not file_name.endswith(".jsonl")
+    ]
+    assert len(shards_outputs) > (2 if max_nodes_per_tile else 1)
+    shards_counts = [count_objects(file_name) for file_name in shards_outputs]
+    assert len(merged.nodes) == sum(len(counter.nodes) for counter in shards_counts)
+    assert merged.nb_ways == sum(counter.nb_ways for counter in shards_counts)
+    assert merged.nb_ways > 0
+    # All nodes are written before ways
+    assert merged.nb_dangling_refs == 0
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import threading
+from typing import TYPE_CHECKING
+
+from pyhgtmap import timing
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_stage_without_timer() -> None:
+    """Stages are silently ignored when no timer is active."""
+    assert timing.active_timer() is None
+    with timing.stage(timing.TILING):
+        pass
+    timing.add_stage(timing.TILING, 1.0)
+    with timing.timed_scope(enabled=False) as timer:
+        assert timer is None
+        assert timing.active_timer() is None
+
+
+def test_timed_scope() -> None:
+    """Durations are accumulated per stage in the innermost active timer."""
+    with timing.timed_scope() as outer_timer:
+        assert outer_timer is not None
+        timing.add_stage(timing.TILING, 1.0)
+        with timing.timed_scope() as inner_timer:
+            assert inner_timer is not None
+            timing.add_stage(timing.SPLIT, 2.0)
+            timing.add_stage(timing.SPLIT, 0.5)
+            with timing.stage(timing.NODE_WRITE):
+                pass
+        timing.add_stage(timing.TILING, 1.0)
+    assert timing.active_timer() is None
+    assert outer_timer.durations == {timing.TILING: 2.0}
+    assert inner_timer.durations[timing.SPLIT] == 2.5
+    assert inner_timer.durations[timing.NODE_WRITE] >= 0
+
+
+def test_timed_scope_per_thread() -> None:
+    """Timers are active only in the thread which started them."""
+    with timing.timed_scope() as timer:
+        thread = threading.Thread(target=timing.add_stage, args=(timing.TILING, 1.0))
+        thread.start()
+        thread.join()
+    assert timer is not None
+    assert timer.durations == {}
+
+
+def test_timings_recorder(tmp_path: Path) -> None:
+    recorder = timing.TimingsRecorder(str(tmp_path / "timings.jsonl"))
+    recorder.record("file", {timing.FILE_LOAD: 0.5}, file="N43E006.hgt")
+    recorder.record("tile", {timing.NODE_WRITE: 1.0, "custom": 0.5}, tile="A")
+    recorder.record("tile", {timing.NODE_WRITE: 2.0}, tile="B")
+    summary = recorder.summary()
+    recorder.close()
+
+    with open(tmp_path / "timings.jsonl") as timings_file:
+        records = [json.loads(line) for line in timings_file]
+    assert records[0] == {
+        "type": "file",
+        "file": "N43E006.hgt",
+        "stages": {timing.FILE_LOAD: 0.5},
+    }
+    assert [record["tile"] for record in records[1:]] == ["A", "B"]
+
+    lines = summary.splitlines()
+    assert lines[0].split()[0] == "Stage"
+    # Known stages in processing order, then others
+    assert [line[:16].strip() for line in lines[1:-1]] == [
+        timing.FILE_LOAD,
+        timing.NODE_WRITE,
+        "custom",
+    ]
+    assert lines[2].split()[2:] == ["3.000", "75.0%", "2", "1500.00", "2000.00"]
+    assert lines[-1].split()[2] == "4.000;"
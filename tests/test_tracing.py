@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import TYPE_CHECKING
+
+from pyhgtmap import tracing
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_span_without_tracer() -> None:
+    """Spans are silently ignored when tracing is disabled."""
+    assert tracing.active_tracer() is None
+    with tracing.span("tile", "tile", tile="A"):
+        pass
+    assert tracing.drain_events() is None
+    tracing.add_events([{"name": "other"}])
+
+
+def record_span() -> None:
+    with tracing.span("thread"):
+        pass
+
+
+def test_span() -> None:
+    tracer = tracing.start_tracing("main")
+    try:
+        assert tracing.active_tracer() is tracer
+        with tracing.span("outer", "tile", tile="A"), tracing.span("inner"):
+            pass
+        with tracing.span("outer", "tile", tile="B"):
+            pass
+        thread = threading.Thread(target=record_span, name="loader")
+        thread.start()
+        thread.join()
+    finally:
+        assert tracing.stop_tracing() is tracer
+    assert tracing.active_tracer() is None
+
+    metadata = [event for event in tracer.events if event["ph"] == "M"]
+    assert metadata[0]["args"]["name"] == f"main ({os.getpid()})"
+    # Each thread is named once
+    assert [event["name"] for event in metadata[1:]] == ["thread_name"] * 2
+    assert metadata[2]["args"]["name"] == "loader"
+    spans = [event for event in tracer.events if event["ph"] == "X"]
+    # Spans are recorded when they end
+    inner, outer, _, thread_span = spans
+    assert thread_span["tid"] == metadata[2]["tid"] != metadata[1]["tid"]
+    assert (inner["name"], inner["cat"]) == ("inner", "")
+    assert (outer["name"], outer["args"]) == ("outer", {"tile": "A"})
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert inner["tid"] == outer["tid"] == metadata[1]["tid"]
+
+
+def test_drain_and_write(tmp_path: Path) -> None:
+    tracer = tracing.start_tracing("worker")
+    try:
+        with tracing.span("compute"):
+            pass
+        events = tracing.drain_events()
+        assert events is not None
+        assert [event["ph"] for event in events] == ["M", "M", "X"]
+        assert tracing.drain_events() == []
+    finally:
+        tracing.stop_tracing()
+
+    parent = tracing.start_tracing("main")
+    try:
+        tracing.add_events(events)
+    finally:
+        tracing.stop_tracing()
+    parent.write(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json") as trace_file:
+        trace = json.load(trace_file)
+    assert trace["traceEvents"] == [parent.events[0], *events]
+    assert tracer.events == []
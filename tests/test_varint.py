@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import numpy
+import pytest
+
+from pyhgtmap import varint
+
+UNSIGNED_VALUES = [0, 1, 127, 128, 300, 16383, 16384, 2**35, 2**63, 2**64 - 1]
+SIGNED_VALUES = [0, -1, 1, -64, 63, -65, 64, 300, -300, 2**62, -(2**63), 2**63 - 1]
+
+
+@pytest.mark.parametrize(
+    ("value", "encoded"),
+    [
+        (0, b"\x00"),
+        (1, b"\x01"),
+        (127, b"\x7f"),
+        (128, b"\x80\x01"),
+        (300, b"\xac\x02"),
+        (2**64 - 1, b"\xff" * 9 + b"\x01"),
+    ],
+)
+def test_int2str(value: int, encoded: bytes) -> None:
+    assert varint.int2str(value) == encoded
+    assert varint.str2int(encoded) == (value, len(encoded))
+
+
+@pytest.mark.parametrize(
+    ("value", "encoded"),
+    [(0, b"\x00"), (-1, b"\x01"), (1, b"\x02"), (-65, b"\x81\x01"), (64, b"\x80\x01")],
+)
+def test_sint2str(value: int, encoded: bytes) -> None:
+    assert varint.sint2str(value) == encoded
+
+
+def test_str2int_position() -> None:
+    data = b"\x05" + varint.int2str(300) + varint.int2str(2**40)
+    value, pos = varint.str2int(data, 1)
+    assert (value, pos) == (300, 3)
+    assert varint.str2int(data, pos) == (2**40, len(data))
+
+
+def test_zigzag() -> None:
+    values = numpy.array(SIGNED_VALUES, dtype=numpy.int64)
+    zigzagged = varint.zigzag(values)
+    assert zigzagged.dtype == numpy.uint64
+    assert zigzagged[:5].tolist() == [0, 1, 2, 127, 126]
+    assert varint.unzigzag(zigzagged).tolist() == SIGNED_VALUES
+
+
+def test_int_array2str() -> None:
+    encoded, lengths = varint.int_array2str(
+        numpy.array(UNSIGNED_VALUES, dtype=numpy.uint64)
+    )
+    assert encoded.dtype == numpy.uint8
+    assert encoded.tobytes() == b"".join(map(varint.int2str, UNSIGNED_VALUES))
+    assert lengths.tolist() == [len(varint.int2str(v)) for v in UNSIGNED_VALUES]
+    assert (
+        lengths.tolist()
+        == varint.varint_lengths(
+            numpy.array(UNSIGNED_VALUES, dtype=numpy.uint64)
+        ).tolist()
+    )
+
+
+def test_sint_array2str() -> None:
+    encoded, lengths = varint.sint_array2str(numpy.array(SIGNED_VALUES))
+    assert encoded.tobytes() == b"".join(map(varint.sint2str, SIGNED_VALUES))
+    assert lengths.tolist() == [len(varint.sint2str(v)) for v in SIGNED_VALUES]
+
+
+def test_empty_arrays() -> None:
+    encoded, lengths = varint.int_array2str(numpy.array([], dtype=numpy.int64))
+    assert encoded.size == lengths.size == 0
+    values, lengths = varint.str2int_array(b"")
+    assert values.dtype == numpy.uint64
+    assert values.size == lengths.size == 0
+
+
+def test_str2int_array() -> None:
+    data = b"".join(map(varint.int2str, UNSIGNED_VALUES))
+    values, lengths = varint.str2int_array(data)
+    assert values.dtype == numpy.uint64
+    assert values.tolist() == UNSIGNED_VALUES
+    assert lengths.tolist() == [len(varint.int2str(v)) for v in UNSIGNED_VALUES]
+    # Array input, as returned by encoders
+    values, _ = varint.str2int_array(numpy.frombuffer(data, dtype=numpy.uint8))
+    assert values.tolist() == UNSIGNED_VALUES
+    # Offsets of values allow scalar decoding
+    pos = int(lengths[:3].sum())
+    assert varint.str2int(data, pos) == (UNSIGNED_VALUES[3], pos + lengths[3])
+
+
+def test_str2sint_array_roundtrip() -> None:
+    values = numpy.random.default_rng(0).integers(
+        -(2**63), 2**63 - 1, size=1000, dtype=numpy.int64, endpoint=True
+    )
+    values[::3] //= 2**50
+    encoded, lengths = varint.sint_array2str(values)
+    decoded, decoded_lengths = varint.str2sint_array(encoded)
+    assert decoded.dtype == numpy.int64
+    assert numpy.array_equal(decoded, values)
+    assert numpy.array_equal(decoded_lengths, lengths)
+
+
+def test_str2int_array_invalid() -> None:
+    with pytest.raises(ValueError, match="Truncated varint"):
+        varint.str2int_array(b"\x01\x80")
+    with pytest.raises(ValueError, match="too long"):
+        varint.str2int_array(b"\xff" * 10 + b"\x01")
+    # 10 bytes, but more than 64 bits
+    with pytest.raises(ValueError, match="too long"):
+        varint.str2int_array(b"\x00" + b"\xff" * 9 + b"\x7f")
+    with pytest.raises(ValueError, match="too long"):
+        varint.str2int_array(b"\x80" * 9 + b"\x02")